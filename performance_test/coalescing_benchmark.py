@@ -0,0 +1,63 @@
+"""
+emulates a chatty application which writes a few bytes at a time to the TCP socket for data exchange; the writes are
+passed through the coalescer like in IPC.start_tcp_server_for_message_transfer and sent over emulated LoRa modules;
+compares coalescing with sending every write immediately (no delay)
+
+run from root path of this repository: PYTHONPATH=src python3 performance_test/coalescing_benchmark.py [writes] [bytes]
+"""
+import logging
+import sys
+import time
+from unittest.mock import patch
+
+from lora_multihop import coalescing, variables
+from tests.integration_tests.modem_emulator import EmulatedNetwork
+
+WRITE_INTERVAL = 0.01  # time in seconds between two writes of the application
+
+
+def run_benchmark(write_count, write_size, no_delay):
+    """
+    sends writes from one node to a neighbor
+    :param write_count: number of writes of the application
+    :param write_size: number of bytes per write
+    :param no_delay: True to send every write immediately
+    :return: dict with goodput in bytes per second and number of sent frames
+    """
+    network = EmulatedNetwork(['0131', '0132'], seed=1)
+    with patch.object(variables, 'SEND_WINDOW_SIZE', 8), patch.object(variables, 'ACK_DELAY', 0.5):
+        network.start()
+        try:
+            source = network.protocols['0131']
+            destination = network.protocols['0132']
+            source.connected_node = '0132'
+            destination.connected_node = '0131'
+            source.find_route('0132')
+            coalescer = coalescing.Coalescer(source.get_max_message_size(), no_delay=no_delay)
+            frames_before_writes = network.get_sent_frames()
+            start_time = time.perf_counter()
+            for i in range(write_count):
+                for data in (coalescer.add(bytes([i % 256]) * write_size), coalescer.poll()):
+                    if data is not None:
+                        source.send_message(data)
+                time.sleep(WRITE_INTERVAL)
+            data = coalescer.flush()
+            if data is not None:
+                source.send_message(data)
+            received_length = 0
+            while received_length < write_count * write_size:
+                received_length += len(destination.received_messages_queue.get(timeout=30))
+            duration = time.perf_counter() - start_time
+            return {'goodput': received_length / duration, 'frames': network.get_sent_frames() - frames_before_writes}
+        finally:
+            network.stop()
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    writes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    for no_delay_value in (True, False):
+        result = run_benchmark(writes, size, no_delay_value)
+        print(f'no delay: {no_delay_value}, {writes} writes of {size} bytes: {result["goodput"]:.0f} bytes/s, '
+              f'frames: {result["frames"]}')
@@ -0,0 +1,70 @@
+"""
+compares the encoded size and time on air of typical JSON and text messages sent uncompressed, compressed with zlib and
+compressed with a preset dictionary; uses the same encoding as Protocol.send_message without sending frames
+
+run from root path of this repository: PYTHONPATH=src python3 performance_test/compression_benchmark.py [messages]
+"""
+import json
+import logging
+import random
+import sys
+from unittest.mock import patch
+
+from lora_multihop import airtime, compression, protocol, variables
+
+WORDS = ['sensor', 'temperature', 'humidity', 'status', 'online', 'battery', 'node', 'value', 'alarm', 'ok']
+
+
+def create_messages(count, seed=1):
+    """
+    :param count: number of messages
+    :param seed: seed of the random number generator
+    :return: list of JSON and text messages as bytes
+    """
+    generator = random.Random(seed)
+    messages = []
+    for i in range(count):
+        if i % 2 == 0:
+            messages.append(json.dumps({'node': f'{131 + generator.randrange(10):04d}', 'type': 'measurement',
+                                        'temperature': round(generator.uniform(10, 30), 1),
+                                        'humidity': generator.randrange(100), 'battery': generator.randrange(100),
+                                        'status': generator.choice(['ok', 'warning', 'error'])}).encode())
+        else:
+            messages.append(' '.join(generator.choice(WORDS) for _ in range(12)).encode())
+    return messages
+
+
+def run_benchmark(messages, compress, dictionary=None):
+    """
+    encodes messages like Protocol.send_message
+    :param messages: list of messages as bytes
+    :param compress: True to compress the messages
+    :param dictionary: preset dictionary as bytes or None
+    :return: dict with sent frame bytes, time on air in seconds and compression statistics
+    """
+    protocol_obj = protocol.Protocol(address='0131')
+    protocol_obj.compressor = compression.Compressor(dictionary=dictionary)
+    configuration = airtime.parse_module_config(variables.MODULE_CONFIG)
+    frame_bytes = 0
+    time_on_air = 0
+    with patch.object(variables, 'COMPRESSION', compress):
+        for message in messages:
+            for payload in protocol_obj.encode_payload(message, '0132'):
+                frame_length = protocol_obj.get_message_header_length('0132') + len(payload)
+                frame_bytes += frame_length
+                time_on_air += configuration.get_time_on_air(frame_length)
+    return {'frame_bytes': frame_bytes, 'time_on_air': time_on_air,
+            'statistics': protocol_obj.get_compression_statistics()}
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    message_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    test_messages = create_messages(message_count)
+    preset_dictionary = b''.join(create_messages(20, seed=2))
+    for name, compress_messages, preset in (('uncompressed', False, None), ('zlib', True, None),
+                                            ('zlib with dictionary', True, preset_dictionary)):
+        result = run_benchmark(test_messages, compress_messages, preset)
+        ratio = result['statistics']['ratio'] if compress_messages else 1
+        print(f'{name}: {result["frame_bytes"]} frame bytes, time on air {result["time_on_air"]:.2f}s, '
+              f'compression ratio {ratio:.2f}')
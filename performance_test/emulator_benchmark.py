@@ -0,0 +1,57 @@
+"""
+end-to-end benchmark of serial_connection, module_config and Protocol using emulated LoRa modules on pseudo terminals;
+the nodes are arranged in a line, so messages from the first to the last node have to be forwarded
+
+run from root path of this repository: PYTHONPATH=src python3 performance_test/emulator_benchmark.py [hops] [messages]
+"""
+import logging
+import statistics
+import sys
+import time
+
+from lora_multihop import module_config, variables
+from tests.integration_tests.modem_emulator import EmulatedNetwork, create_line_topology
+
+
+def run_benchmark(hops, message_count, loss_probability=0.0):
+    """
+    sends messages from the first to the last node of a line
+    :param hops: number of hops between first and last node
+    :param message_count: number of messages
+    :param loss_probability: probability that a frame is lost
+    :return: dict with route discovery time, message latencies in seconds and number of sent frames
+    """
+    addresses = [f'{131 + i:04d}' for i in range(hops + 1)]
+    network = EmulatedNetwork(addresses, create_line_topology(addresses), loss_probability, seed=1)
+    network.start()
+    try:
+        source = network.protocols[addresses[0]]
+        destination = network.protocols[addresses[-1]]
+        if not module_config.config_module(variables.MODULE_CONFIG, driver=network.drivers[addresses[0]]):
+            raise RuntimeError('could not configure emulated LoRa module')
+        source.connected_node = addresses[-1]
+        destination.connected_node = addresses[0]
+        start_time = time.perf_counter()
+        source.find_route(addresses[-1])
+        route_discovery_time = time.perf_counter() - start_time
+        frames_before_messages = network.get_sent_frames()
+        latencies = []
+        for i in range(message_count):
+            start_time = time.perf_counter()
+            source.send_message(f'message {i}'.encode())
+            destination.received_messages_queue.get(timeout=30)
+            latencies.append(time.perf_counter() - start_time)
+        return {'route_discovery_time': route_discovery_time, 'latencies': latencies,
+                'frames_per_message': (network.get_sent_frames() - frames_before_messages) / message_count}
+    finally:
+        network.stop()
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    hop_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    result = run_benchmark(hop_count, messages)
+    print(f'hops: {hop_count}, route discovery: {result["route_discovery_time"] * 1000:.1f}ms')
+    print(f'message latency: median {statistics.median(result["latencies"]) * 1000:.1f}ms, '
+          f'max {max(result["latencies"]) * 1000:.1f}ms, frames per message: {result["frames_per_message"]:.1f}')
@@ -0,0 +1,76 @@
+"""
+compares the bytes on air per payload byte of the payload encodings (base64, ascii85 and escape) for JSON messages,
+text messages, random binary data (e.g. compressed or encrypted messages) and large messages which are fragmented;
+uses the same encoding as Protocol.send_message without sending frames
+
+run from root path of this repository: PYTHONPATH=src python3 performance_test/encoding_benchmark.py [messages]
+"""
+import json
+import logging
+import random
+import sys
+
+from lora_multihop import airtime, payload_encoding, protocol, variables
+
+WORDS = ['sensor', 'temperature', 'humidity', 'status', 'online', 'battery', 'node', 'value', 'alarm', 'ok']
+
+
+def create_messages(kind, count, seed=1):
+    """
+    :param kind: 'json', 'text', 'binary' or 'large'
+    :param count: number of messages
+    :param seed: seed of the random number generator
+    :return: list of messages as bytes
+    """
+    generator = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        if kind == 'json':
+            messages.append(json.dumps({'node': f'{131 + generator.randrange(10):04d}', 'type': 'measurement',
+                                        'temperature': round(generator.uniform(10, 30), 1),
+                                        'humidity': generator.randrange(100)}).encode())
+        elif kind == 'text':
+            messages.append(' '.join(generator.choice(WORDS) for _ in range(12)).encode())
+        elif kind == 'binary':
+            messages.append(bytes(generator.randrange(256) for _ in range(100)))
+        else:
+            messages.append(' '.join(generator.choice(WORDS) for _ in range(200)).encode())
+    return messages
+
+
+def run_benchmark(messages, encoding_name):
+    """
+    encodes messages like Protocol.send_message
+    :param messages: list of messages as bytes
+    :param encoding_name: name of the payload encoding
+    :return: dict with number of frames, sent payload bytes, sent frame bytes and time on air in seconds
+    """
+    protocol_obj = protocol.Protocol(address='0131')
+    protocol_obj.set_payload_encoding('0132', encoding_name)
+    configuration = airtime.parse_module_config(variables.MODULE_CONFIG)
+    frames = 0
+    payload_bytes = 0
+    frame_bytes = 0
+    time_on_air = 0
+    for message in messages:
+        for payload in protocol_obj.encode_payload(message, '0132'):
+            frame_length = protocol_obj.get_message_header_length('0132') + len(payload.encode(variables.ENCODING))
+            frames += 1
+            payload_bytes += len(payload.encode(variables.ENCODING))
+            frame_bytes += frame_length
+            time_on_air += configuration.get_time_on_air(frame_length)
+    return {'frames': frames, 'payload_bytes': payload_bytes, 'frame_bytes': frame_bytes, 'time_on_air': time_on_air}
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    message_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    for message_kind in ('json', 'text', 'binary', 'large'):
+        test_messages = create_messages(message_kind, message_count)
+        message_bytes = sum(len(message) for message in test_messages)
+        print(f'{message_kind} messages ({message_bytes} bytes):')
+        for name in payload_encoding.ENCODINGS:
+            result = run_benchmark(test_messages, name)
+            print(f'  {name}: {result["payload_bytes"] / message_bytes:.3f} payload bytes per message byte, '
+                  f'{result["frames"]} frames, {result["frame_bytes"]} frame bytes, '
+                  f'time on air {result["time_on_air"]:.2f}s')
@@ -0,0 +1,59 @@
+"""
+sends large application writes over emulated LoRa modules arranged in a line; the writes are split into fragments
+sized from the frame limit of the module configuration; measures goodput and how much of each frame is used for
+application data
+
+run from root path of this repository: PYTHONPATH=src python3 performance_test/fragmentation_benchmark.py [hops] [kb]
+"""
+import logging
+import sys
+import time
+from unittest.mock import patch
+
+from lora_multihop import variables
+from tests.integration_tests.modem_emulator import EmulatedNetwork, create_line_topology
+
+
+def run_benchmark(hops, data_length, write_size=variables.MESSAGE_READ_SIZE):
+    """
+    sends data from the first to the last node of a line
+    :param hops: number of hops between first and last node
+    :param data_length: number of bytes to send
+    :param write_size: number of bytes passed to send_message at once
+    :return: dict with goodput in bytes per second, data frames and share of frame bytes used for application data
+    """
+    addresses = [f'{131 + i:04d}' for i in range(hops + 1)]
+    network = EmulatedNetwork(addresses, create_line_topology(addresses), seed=1)
+    data = bytes(i % 256 for i in range(data_length))
+    with patch.object(variables, 'SEND_WINDOW_SIZE', 8), patch.object(variables, 'ACK_DELAY', 0.5):
+        network.start()
+        try:
+            source = network.protocols[addresses[0]]
+            destination = network.protocols[addresses[-1]]
+            source.connected_node = addresses[-1]
+            destination.connected_node = addresses[0]
+            source.find_route(addresses[-1])
+            frame_bytes_before = network.modems[addresses[0]].sent_bytes
+            start_time = time.perf_counter()
+            for offset in range(0, data_length, write_size):
+                source.send_message(data[offset:offset + write_size])
+            received_data = b''
+            while len(received_data) < data_length:
+                received_data += destination.received_messages_queue.get(timeout=30)
+            duration = time.perf_counter() - start_time
+            if received_data != data:
+                raise RuntimeError('received data differs from sent data')
+            sent_frame_bytes = network.modems[addresses[0]].sent_bytes - frame_bytes_before
+            return {'goodput': data_length / duration, 'messages': source.message_counters[addresses[-1]],
+                    'efficiency': data_length / sent_frame_bytes}
+        finally:
+            network.stop()
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    hop_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    kilobytes = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    result = run_benchmark(hop_count, kilobytes * 1024)
+    print(f'hops: {hop_count}, {kilobytes} KB: {result["goodput"]:.0f} bytes/s, messages: {result["messages"]}, '
+          f'application data per sent frame byte: {result["efficiency"]:.2f}')
@@ -0,0 +1,53 @@
+"""
+compares the length and time on air of the ASCII and the binary header format for every header type and for small
+messages, whose frames are dominated by the header
+
+run from root path of this repository: PYTHONPATH=src python3 performance_test/header_benchmark.py
+"""
+import logging
+from unittest.mock import patch
+
+from lora_multihop import airtime, header, protocol, variables
+
+HEADERS = [header.MessageHeader(None, '0131', 5, '0132', '0133', 4711, ''),
+           header.MessageAcknowledgeHeader(None, '0131', 5, '0132', 4711),
+           header.CumulativeAcknowledgeHeader(None, '0131', 5, '0132', 4711, 0x5),
+           header.RouteRequestHeader(None, '0131', 5, 0, '0132'),
+           header.RouteReplyHeader(None, '0131', 5, 2, '0132', '0133'),
+           header.RouteErrorHeader(None, '0131', 5, '0132'),
+           header.RegistrationHeader(None, '0131', 5, True, 'alice'),
+           header.ConnectRequestHeader(None, '0131', 5, '0132', '0133', 'alice', 'bob', '60'),
+           header.DisconnectRequestHeader(None, '0131', 5, '0132', '0133', 'alice', 'bob')]
+
+
+def get_small_message_time_on_air(header_format, message_length=10, count=100):
+    """
+    :param header_format: header.ASCII or header.BINARY
+    :param message_length: length of every message in bytes
+    :param count: number of messages
+    :return: tuple (sent frame bytes, time on air in seconds) of count messages and their acknowledgements
+    """
+    protocol_obj = protocol.Protocol(address='0131')
+    configuration = airtime.parse_module_config(variables.MODULE_CONFIG)
+    frame_bytes = 0
+    time_on_air = 0
+    with patch.object(variables, 'HEADER_FORMAT', header_format):
+        for message_id in range(1, count + 1):
+            for payload in protocol_obj.encode_payload(bytes(message_length), '0132'):
+                frames = [header.MessageHeader(None, '0131', 5, '0132', '0132', message_id, payload).get_frame_str(),
+                          header.MessageAcknowledgeHeader(None, '0132', 5, '0131', message_id).get_frame_str()]
+                for frame in frames:
+                    frame_bytes += header.get_frame_length(frame)
+                    time_on_air += configuration.get_time_on_air(header.get_frame_length(frame))
+    return frame_bytes, time_on_air
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    for header_obj in HEADERS:
+        print(f'{type(header_obj).__name__}: {len(header_obj.get_header_str())} bytes ascii, '
+              f'{len(header_obj.encode())} bytes binary')
+    for name in (header.ASCII, header.BINARY):
+        sent_bytes, seconds = get_small_message_time_on_air(name)
+        print(f'100 messages of 10 bytes with acknowledgements, {name} headers: {sent_bytes} frame bytes, '
+              f'time on air {seconds:.2f}s')
@@ -0,0 +1,72 @@
+"""
+compares a fixed ack timeout with ack timeouts adapted to the measured round-trip times using emulated LoRa modules
+arranged in a line with lost frames; a fixed timeout is emulated by setting the bounds of the adaptive timeout to the
+initial timeout; measures goodput, number of sent frames per message and the estimated round-trip times
+
+run from root path of this repository: PYTHONPATH=src python3 performance_test/rtt_benchmark.py [messages] [loss]
+"""
+import logging
+import sys
+import time
+from unittest.mock import patch
+
+from lora_multihop import variables
+from tests.integration_tests.modem_emulator import EmulatedNetwork, create_line_topology
+
+
+def run_benchmark(hops, message_count, ack_timeout, adaptive, loss_probability=0.0):
+    """
+    sends messages with stop-and-wait from the first to the last node of a line
+    :param hops: number of hops between first and last node
+    :param message_count: number of messages
+    :param ack_timeout: initial ack timeout in seconds
+    :param adaptive: True to adapt the ack timeout to the measured round-trip times, False to keep ack_timeout
+    :param loss_probability: probability that a frame is lost
+    :return: dict with messages per second, delivered messages, number of sent frames per message and rtt statistics
+    """
+    addresses = [f'{131 + i:04d}' for i in range(hops + 1)]
+    network = EmulatedNetwork(addresses, create_line_topology(addresses), loss_probability, seed=1)
+    min_timeout = variables.MIN_ACK_TIMEOUT if adaptive else ack_timeout
+    max_timeout = variables.MAX_ACK_TIMEOUT if adaptive else ack_timeout
+    with patch.object(variables, 'ACK_TIMEOUT', ack_timeout), patch.object(variables, 'MIN_ACK_TIMEOUT', min_timeout), \
+            patch.object(variables, 'MAX_ACK_TIMEOUT', max_timeout):
+        network.start()
+        try:
+            source = network.protocols[addresses[0]]
+            destination = network.protocols[addresses[-1]]
+            source.connected_node = addresses[-1]
+            destination.connected_node = addresses[0]
+            source.find_route(addresses[-1])
+            frames_before_messages = network.get_sent_frames()
+            start_time = time.perf_counter()
+            for i in range(message_count):
+                source.send_message(f'message {i}'.encode())
+            delivered_messages = 0
+            for _ in range(message_count):
+                try:
+                    destination.received_messages_queue.get(timeout=10)
+                    delivered_messages += 1
+                except Exception:
+                    break
+            duration = time.perf_counter() - start_time
+            return {'messages_per_second': delivered_messages / duration, 'delivered_messages': delivered_messages,
+                    'frames_per_message': (network.get_sent_frames() - frames_before_messages) / message_count,
+                    'rtt': source.get_rtt_statistics().get(addresses[-1])}
+        finally:
+            network.stop()
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    loss = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    for hop_count in (1, 3):
+        for timeout, adaptive_timeout in ((5, False), (5, True), (0.005, False), (0.005, True)):
+            result = run_benchmark(hop_count, messages, timeout, adaptive_timeout, loss)
+            rtt = result['rtt'] or {'smoothed_rtt': None, 'timeout': timeout}
+            smoothed_rtt = 'n/a' if rtt['smoothed_rtt'] is None else f'{rtt["smoothed_rtt"]:.3f}s'
+            print(f'hops: {hop_count}, initial timeout: {timeout}s, adaptive: {adaptive_timeout}, '
+                  f'{result["messages_per_second"]:.2f} messages/s, '
+                  f'delivered: {result["delivered_messages"]}/{messages}, '
+                  f'frames per message: {result["frames_per_message"]:.1f}, smoothed rtt: {smoothed_rtt}, '
+                  f'timeout: {rtt["timeout"]:.2f}s')
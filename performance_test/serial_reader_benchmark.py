@@ -0,0 +1,71 @@
+"""
+benchmark for the threads of serial_connection; a pseudo terminal is used instead of a LoRa modem, so no hardware is
+required
+
+run from root path of this repository: PYTHONPATH=src python3 performance_test/serial_reader_benchmark.py
+"""
+import os
+import statistics
+import time
+import tty
+
+import serial
+
+from lora_multihop import serial_connection
+
+
+class SerialReaderBenchmark:
+    RECEIVED_MESSAGE = b'LR,0136,11,|0137|3|8|4|0138|\r\n'
+
+    def __init__(self):
+        self.master_fd, slave_fd = os.openpty()
+        tty.setraw(self.master_fd)
+        self.ser = serial.serial_for_url(os.ttyname(slave_fd), baudrate=115200, timeout=1)
+        os.close(slave_fd)
+        self.driver = serial_connection.ModemDriver(self.ser, name='benchmark')
+        self.driver.start()
+
+    def measure_idle_cpu(self, duration_in_sec):
+        """
+        measures cpu time consumed by the process while the serial port is silent
+        :param duration_in_sec: duration of measurement
+        :return: consumed cpu time relative to wall clock time (1.0 == one core fully used)
+        """
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        time.sleep(duration_in_sec)
+        return (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+
+    def measure_receive_latency(self, count):
+        """
+        measures the time between writing a message to the pseudo terminal and getting it from response_q
+        :param count: number of messages
+        :return: list of latencies in seconds
+        """
+        latencies = []
+        for _ in range(count):
+            start_time = time.perf_counter()
+            os.write(self.master_fd, self.RECEIVED_MESSAGE)
+            self.driver.response_q.get(timeout=5)
+            latencies.append(time.perf_counter() - start_time)
+            time.sleep(0.05)
+        return latencies
+
+    def stop(self):
+        self.driver.stop()
+        self.driver.reading_thread.join()
+        self.driver.writing_thread.join()
+        self.ser.close()
+        os.close(self.master_fd)
+
+
+if __name__ == '__main__':
+    benchmark = SerialReaderBenchmark()
+    try:
+        print(f'idle cpu usage: {benchmark.measure_idle_cpu(5) * 100:.2f}% of one core')
+        result = benchmark.measure_receive_latency(100)
+        print(f'receive latency: median {statistics.median(result) * 1000:.3f}ms, '
+              f'max {max(result) * 1000:.3f}ms')
+        print(f'frame statistics: {benchmark.driver.get_frame_statistics()}')
+    finally:
+        benchmark.stop()
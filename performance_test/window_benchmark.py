@@ -0,0 +1,66 @@
+"""
+compares stop-and-wait (window size 1) with sliding window reliable delivery and one acknowledgement per message with
+delayed cumulative acknowledgements using emulated LoRa modules arranged in a line; measures goodput and number of sent
+frames per message
+
+run from root path of this repository: PYTHONPATH=src python3 performance_test/window_benchmark.py [messages] [loss]
+"""
+import logging
+import sys
+import time
+from unittest.mock import patch
+
+from lora_multihop import variables
+from tests.integration_tests.modem_emulator import EmulatedNetwork, create_line_topology
+
+
+def run_benchmark(hops, message_count, window_size, loss_probability=0.0, ack_delay=None):
+    """
+    sends messages from the first to the last node of a line
+    :param hops: number of hops between first and last node
+    :param message_count: number of messages
+    :param window_size: max number of unacknowledged messages
+    :param loss_probability: probability that a frame is lost
+    :param ack_delay: max delay of acknowledgements in seconds; None sends one acknowledgement per message
+    :return: dict with messages per second, delivered messages and number of sent frames per message
+    """
+    addresses = [f'{131 + i:04d}' for i in range(hops + 1)]
+    network = EmulatedNetwork(addresses, create_line_topology(addresses), loss_probability, seed=1)
+    with patch.object(variables, 'SEND_WINDOW_SIZE', window_size), patch.object(variables, 'ACK_TIMEOUT', 2), \
+            patch.object(variables, 'ACK_DELAY', ack_delay):
+        network.start()
+        try:
+            source = network.protocols[addresses[0]]
+            destination = network.protocols[addresses[-1]]
+            source.connected_node = addresses[-1]
+            destination.connected_node = addresses[0]
+            source.find_route(addresses[-1])
+            frames_before_messages = network.get_sent_frames()
+            start_time = time.perf_counter()
+            for i in range(message_count):
+                source.send_message(f'message {i}'.encode())
+            delivered_messages = 0
+            for _ in range(message_count):
+                try:
+                    destination.received_messages_queue.get(timeout=10)
+                    delivered_messages += 1
+                except Exception:
+                    break
+            duration = time.perf_counter() - start_time
+            return {'messages_per_second': delivered_messages / duration, 'delivered_messages': delivered_messages,
+                    'frames_per_message': (network.get_sent_frames() - frames_before_messages) / message_count}
+        finally:
+            network.stop()
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    loss = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    for hop_count in range(1, 5):
+        for window, delay in ((1, None), (4, None), (8, None), (8, 0.5)):
+            result = run_benchmark(hop_count, messages, window, loss, delay)
+            print(f'hops: {hop_count}, window: {window}, ack delay: {delay}, '
+                  f'{result["messages_per_second"]:.2f} messages/s, '
+                  f'delivered: {result["delivered_messages"]}/{messages}, '
+                  f'frames per message: {result["frames_per_message"]:.1f}')
@@ -0,0 +1,175 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+from lora_multihop import variables
+
+__author__ = "Marvin Rausch"
+
+# bandwidth in Hz for the bandwidth index used in the AT+CFG command
+BANDWIDTHS = (7800, 10400, 15600, 20800, 31250, 41700, 62500, 125000, 250000, 500000)
+# low data rate optimization is switched on by the LoRa module if the symbol time exceeds 16 ms
+LOW_DATA_RATE_OPTIMIZE_SYMBOL_TIME = 0.016
+
+
+class LoRaConfiguration:
+    """
+    radio parameters of the LoRa module which determine the time on air of a frame
+    """
+
+    def __init__(self, bandwidth, spreading_factor, coding_rate, crc=True, implicit_header=False, preamble_length=8,
+                 payload_length=None):
+        """
+        constructor of LoRaConfiguration class
+        :param bandwidth: bandwidth in Hz
+        :param spreading_factor: spreading factor (6 - 12)
+        :param coding_rate: coding rate index (1 - 4 for 4/5 - 4/8)
+        :param crc: True if a CRC is appended to the payload
+        :param implicit_header: True if the LoRa header is omitted
+        :param preamble_length: number of preamble symbols
+        :param payload_length: fixed payload length in bytes used in implicit header mode
+        """
+        self.bandwidth = bandwidth
+        self.spreading_factor = spreading_factor
+        self.coding_rate = coding_rate
+        self.crc = crc
+        self.implicit_header = implicit_header
+        self.preamble_length = preamble_length
+        self.payload_length = payload_length
+
+    def get_symbol_time(self):
+        """
+        :return: duration of one symbol in seconds
+        """
+        return (2 ** self.spreading_factor) / self.bandwidth
+
+    def get_time_on_air(self, payload_length):
+        """
+        computes time on air of a frame (see Semtech SX1276 datasheet, chapter 4.1.1.7)
+        :param payload_length: length of the payload in bytes
+        :return: time on air in seconds
+        """
+        symbol_time = self.get_symbol_time()
+        low_data_rate_optimize = 1 if symbol_time > LOW_DATA_RATE_OPTIMIZE_SYMBOL_TIME else 0
+        preamble_time = (self.preamble_length + 4.25) * symbol_time
+        numerator = (8 * payload_length - 4 * self.spreading_factor + 28 + 16 * int(self.crc) -
+                     20 * int(self.implicit_header))
+        denominator = 4 * (self.spreading_factor - 2 * low_data_rate_optimize)
+        payload_symbols = 8 + max(math.ceil(numerator / denominator) * (self.coding_rate + 4), 0)
+        return preamble_time + payload_symbols * symbol_time
+
+    def get_max_frame_length(self):
+        """
+        :return: max payload length in bytes of a frame; in implicit header mode the configured payload length
+        """
+        if self.implicit_header and self.payload_length is not None:
+            return min(self.payload_length, variables.MAX_FRAME_LENGTH)
+        return variables.MAX_FRAME_LENGTH
+
+    def __str__(self):
+        return f'{self.__dict__}'
+
+
+def parse_module_config(configuration):
+    """
+    creates LoRaConfiguration from AT+CFG command
+    AT+CFG=<frequency>,<power>,<bandwidth>,<spreading factor>,<coding rate>,<crc>,<implicit header>,<rx single>,
+    <frequency hopping>,<hop period>,<rx timeout>,<payload length>,<preamble length>
+    :param configuration: AT+CFG command as str (e.g. variables.MODULE_CONFIG)
+    :return: object of class LoRaConfiguration
+    """
+    if not configuration.startswith('AT+CFG='):
+        raise ValueError(f"'{configuration}' is not a AT+CFG command")
+    values = configuration[len('AT+CFG='):].split(variables.LORA_MODULE_DELIMITER)
+    if len(values) != 13:
+        raise ValueError(f"AT+CFG command '{configuration}' has {len(values)} values instead of 13")
+    try:
+        bandwidth_index = int(values[2])
+        if not 0 <= bandwidth_index < len(BANDWIDTHS):
+            raise ValueError(f'invalid bandwidth index {bandwidth_index}')
+        return LoRaConfiguration(BANDWIDTHS[bandwidth_index], int(values[3]), int(values[4]), values[5] == '1',
+                                 values[6] == '1', int(values[12]), int(values[11]))
+    except ValueError as e:
+        raise ValueError(f"could not parse AT+CFG command '{configuration}': {e}")
+
+
+class DutyCycleScheduler:
+    """
+    keeps track of the time on air used within a sliding window to comply with a regulatory duty cycle; frames are
+    sent back to back as long as the budget is not exhausted
+    """
+
+    def __init__(self, duty_cycle=variables.DUTY_CYCLE, window=variables.DUTY_CYCLE_WINDOW):
+        """
+        constructor of DutyCycleScheduler class
+        :param duty_cycle: max share of time on air (e.g. 0.01 for 1 %); None disables the duty cycle limitation
+        :param window: length of the sliding window in seconds
+        """
+        self.duty_cycle = duty_cycle
+        self.window = window
+        self.transmissions = deque()  # tuples (start time, time on air)
+        self.used_airtime = 0
+        self.lock = threading.Lock()
+
+    def get_budget(self):
+        """
+        :return: time on air in seconds which can be used within the window or None if duty cycle is disabled
+        """
+        if self.duty_cycle is None:
+            return None
+        return self.duty_cycle * self.window
+
+    def get_remaining_budget(self):
+        """
+        :return: time on air in seconds which can be used now or None if duty cycle is disabled
+        """
+        if self.duty_cycle is None:
+            return None
+        with self.lock:
+            self._remove_old_transmissions(time.monotonic())
+            return max(self.get_budget() - self.used_airtime, 0)
+
+    def get_delay(self, airtime):
+        """
+        computes how long a frame has to be deferred to stay within the duty cycle budget
+        :param airtime: time on air of the frame in seconds
+        :return: delay in seconds; 0 if the frame can be sent immediately
+        """
+        if self.duty_cycle is None:
+            return 0
+        now = time.monotonic()
+        with self.lock:
+            self._remove_old_transmissions(now)
+            budget = self.get_budget()
+            if airtime > budget:
+                logging.warning(f'time on air of frame ({airtime}s) exceeds duty cycle budget ({budget}s)')
+            used_airtime = self.used_airtime
+            delay = 0
+            # frames are deferred until enough old transmissions left the window
+            for start, transmission_airtime in self.transmissions:
+                if used_airtime + airtime <= budget:
+                    break
+                used_airtime -= transmission_airtime
+                delay = start + self.window - now
+            return max(delay, 0)
+
+    def record_transmission(self, airtime):
+        """
+        stores a transmission; must be called when a frame is passed to the LoRa module
+        :param airtime: time on air of the frame in seconds
+        """
+        if self.duty_cycle is None:
+            return
+        with self.lock:
+            self.transmissions.append((time.monotonic(), airtime))
+            self.used_airtime += airtime
+
+    def _remove_old_transmissions(self, now):
+        """
+        removes transmissions which are not within the window anymore; must be called while holding the lock
+        :param now: current time (time.monotonic)
+        """
+        while len(self.transmissions) > 0 and self.transmissions[0][0] + self.window <= now:
+            self.used_airtime -= self.transmissions.popleft()[1]
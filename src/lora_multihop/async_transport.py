@@ -0,0 +1,637 @@
+import asyncio
+import logging
+import random
+import time
+
+from lora_multihop import coalescing, header, ipc, module_config, serial_connection, variables
+from lora_multihop.header import RegistrationHeader, ConnectRequestHeader, DisconnectRequestHeader
+from lora_multihop.protocol import Protocol, get_requested_payload_encoding
+
+__author__ = "Marvin Rausch"
+
+
+class AsyncModemDriver(serial_connection.ModemDriver):
+    """
+    driver for one LoRa module which runs inside an asyncio event loop instead of a reading and a writing thread;
+    the serial port is read via loop.add_reader and commands are written as soon as the command engine allows it;
+    all methods have to be called from the thread running the event loop
+    """
+
+    def __init__(self, serial_conn=None, name='modem', loop=None):
+        """
+        constructor of AsyncModemDriver class
+        :param serial_conn: object for serial connection from pyserial library; can also be passed to start
+        :param name: name of the driver
+        :param loop: asyncio event loop; if None the event loop of the calling thread is used when start is called
+        """
+        super(AsyncModemDriver, self).__init__(serial_conn, name)
+        self.loop = loop
+        # function which is called with every received frame; if None frames are put into response_q
+        self.frame_handler = None
+        self.frame_demultiplexer.frame_consumer = self._process_frame
+        self.watchdog_handle = None
+
+    def start(self, serial_conn=None):
+        """
+        registers the file descriptor of the serial port at the event loop
+        :param serial_conn: object for serial connection from pyserial library; if None the connection passed to the
+        constructor is used
+        """
+        if serial_conn is not None:
+            self.ser = serial_conn
+        if self.loop is None:
+            self.loop = asyncio.get_event_loop()
+        self.loop.add_reader(self.ser.fileno(), self._read_from_serial_port)
+        self._write_pending_commands()
+
+    def stop(self):
+        """
+        removes the file descriptor of the serial port from the event loop
+        """
+        if self.watchdog_handle is not None:
+            self.watchdog_handle.cancel()
+            self.watchdog_handle = None
+        if self.loop is not None and self.ser is not None:
+            self.loop.remove_reader(self.ser.fileno())
+
+    def submit_command(self, command_as_str, verification_list=None):
+        """
+        submits AT-command without blocking the event loop
+        :param command_as_str: command which should be sent
+        :param verification_list: list of expected results
+        :return: future (concurrent.futures.Future) which resolves to True if the expected results were received
+        """
+        command = self.command_engine.submit(command_as_str, verification_list)
+        self._write_pending_commands()
+        return command.future
+
+    async def execute_command_async(self, command_as_str, verification_list=None):
+        """
+        sends AT-command to serial port and waits for the expected results
+        :param command_as_str: command which should be sent
+        :param verification_list: list of expected results; can also be empty if result of command should not be
+        verified
+        :return: True if expected results equal to results received from serial port, else False
+        """
+        future = self.submit_command(command_as_str, verification_list)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future, loop=self.loop),
+                                          variables.COMMAND_VERIFICATION_TIMEOUT)
+        except asyncio.TimeoutError:
+            return False
+
+    async def query_async(self, command_as_str):
+        """
+        sends AT-command which reads a value from the LoRa module and waits for the answer
+        :param command_as_str: command which should be sent (e.g. 'AT+ADDR?')
+        :return: answer of the LoRa module as str or None if the LoRa module did not answer or answered with an error
+        """
+        command = self.command_engine.submit_query(command_as_str)
+        self._write_pending_commands()
+        answer = await asyncio.wrap_future(command.future, loop=self.loop)
+        if answer is False:
+            return None
+        return answer
+
+    def send_frame(self, payload):
+        """
+        sends a message over the LoRa network
+        :param payload: message which should be sent as str
+        :return: future which resolves to True if the LoRa module has confirmed sending the message, else to False
+        """
+        future = super(AsyncModemDriver, self).send_frame(payload)
+        self._write_pending_commands()
+        return future
+
+    async def send_frame_async(self, payload, timeout=None):
+        """
+        sends a message over the LoRa network and waits until the LoRa module has confirmed sending the message
+        :param payload: message which should be sent as str
+        :param timeout: max time in seconds to wait for the confirmation; None waits until the command engine gives up
+        :return: True if the LoRa module has confirmed sending the message, else False
+        """
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self.send_frame(payload), loop=self.loop), timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    def _read_from_serial_port(self):
+        """
+        callback of the event loop; reads available bytes from serial port and passes them to the frame demultiplexer
+        """
+        received_data = self.ser.read(max(self.ser.in_waiting, 1))
+        logging.debug('received: {}'.format(received_data))
+        self.frame_demultiplexer.feed(received_data)
+        self._write_pending_commands()
+
+    def _process_frame(self, message):
+        """
+        passes a received frame to frame_handler or puts it into response_q if no handler is set
+        :param message: received frame as str
+        """
+        if self.frame_handler is not None:
+            self.frame_handler(message)
+        else:
+            self.response_q.put(message)
+
+    def _write_pending_commands(self):
+        """
+        writes commands to serial port as long as the command engine does not wait for a response; schedules a check
+        of the deadline of the current command
+        """
+        while True:
+            command = self.command_engine.next_command(timeout=0)
+            if command is None:
+                break
+            logging.debug("sending command '{}'".format(command))
+            self.ser.write(command.get_bytes())
+            self.command_engine.command_written(command)
+        self._schedule_watchdog()
+
+    def _schedule_watchdog(self):
+        """
+        schedules _write_pending_commands for the deadline of the current command, so a command without response does
+        not block the command engine, or for the time the next command is deferred because of the duty cycle
+        """
+        if self.watchdog_handle is not None:
+            self.watchdog_handle.cancel()
+            self.watchdog_handle = None
+        command = self.command_engine.current_command
+        if command is not None and command.deadline is not None:
+            delay = max(command.deadline - time.monotonic(), 0) + variables.SERIAL_POLL_INTERVAL
+            self.watchdog_handle = self.loop.call_later(delay, self._write_pending_commands)
+        else:
+            # next command is deferred to comply with the duty cycle
+            transmit_delay = self.command_engine.get_transmit_delay()
+            if transmit_delay > 0:
+                self.watchdog_handle = self.loop.call_later(transmit_delay, self._write_pending_commands)
+
+
+class LoopQueue:
+    """
+    queue for the event loop thread; put does not block, so it can be used by the message handlers of Protocol
+    """
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    def put(self, item):
+        self.queue.put_nowait(item)
+
+    def get_nowait(self):
+        return self.queue.get_nowait()
+
+    def empty(self):
+        return self.queue.empty()
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class AsyncProtocol(Protocol):
+    """
+    protocol which processes received frames as callbacks of the event loop; sending headers and waiting for
+    acknowledgements, route replies and registration messages does not block, so one node needs only one thread
+    """
+    MAX_ATTEMPTS = variables.MAX_SEND_ATTEMPTS
+    ACK_TIMEOUT = variables.ACK_TIMEOUT
+
+    def __init__(self, driver, address=None):
+        """
+        constructor of AsyncProtocol class; must be called from the thread running the event loop
+        :param driver: object of class AsyncModemDriver
+        :param address: address of the LoRa module; if None variables.MY_ADDRESS is used
+        """
+        super(AsyncProtocol, self).__init__(driver=driver, address=address)
+        self.received_messages_queue = LoopQueue()
+        self.sending_queue = LoopQueue()
+        self.state_changed = asyncio.Event()
+        self.sending_tasks = set()
+
+    def start_protocol_thread(self):
+        """
+        starts processing of received frames; no thread is started, frames are processed by the event loop
+        """
+        self.driver.frame_handler = self.process_raw_message
+
+    def stop(self):
+        """
+        stops processing of received frames and cancels headers which are not sent yet
+        """
+        self.driver.frame_handler = None
+        for ack_aggregator in self.ack_aggregators.values():
+            ack_aggregator.stop()
+        for task in list(self.sending_tasks):
+            task.cancel()
+        self.driver.stop()
+
+    def process_raw_message(self, raw_message):
+        """
+        processes received frame and wakes up coroutines which wait for a change of the protocol state
+        :param raw_message: received message as str
+        """
+        super(AsyncProtocol, self).process_raw_message(raw_message)
+        self._notify_state_changed()
+
+    def send_header(self, header_str):
+        """
+        schedules sending of a header; returns immediately, so it can be called by the message handlers
+        @param header_str: message to send
+        """
+        task = asyncio.ensure_future(self.send_header_async(header_str), loop=self.driver.loop)
+        self.sending_tasks.add(task)
+        task.add_done_callback(self.sending_tasks.discard)
+
+    async def send_header_async(self, header_str):
+        """
+        sends a string to LoRa network after a random time
+        @param header_str: message to send
+        @return: True if the LoRa module has confirmed sending the header, else False
+        """
+        await asyncio.sleep(random.uniform(0, variables.MAX_SLEEP_TIME))
+        if await self.driver.send_frame_async(header_str, 2 * self.VERIFICATION_TIMEOUT):
+            logging.debug("sent header '{}'.".format(header_str))
+            return True
+        logging.debug("could not send header '{}', because got invalid status from lora module".format(header_str))
+        return False
+
+    def schedule(self, delay, callback):
+        """
+        calls a function after a delay in the event loop
+        :param delay: delay in seconds
+        :param callback: function without parameters
+        :return: asyncio.TimerHandle
+        """
+        return self.driver.loop.call_later(delay, callback)
+
+    def delete_from_ack_list(self, ack_id):
+        """
+        remove message id from list of pending acknowledgements
+        :param ack_id: message id which should be deleted
+        """
+        super(AsyncProtocol, self).delete_from_ack_list(ack_id)
+        self._notify_state_changed()
+
+    async def wait_until(self, predicate, timeout):
+        """
+        waits until predicate is fulfilled; predicate is checked every time the protocol state changes
+        :param predicate: function without parameters returning a bool
+        :param timeout: max time to wait in seconds
+        :return: True if predicate was fulfilled before timeout, else False
+        """
+        end_time = self.driver.loop.time() + timeout
+        while not predicate():
+            remaining_time = end_time - self.driver.loop.time()
+            if remaining_time <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self.state_changed.wait(), remaining_time)
+            except asyncio.TimeoutError:
+                return predicate()
+        return True
+
+    async def send_message_async(self, payload):
+        """
+        sends message to currently connected peer and waits for the acknowledgement; messages which do not fit into one
+        frame are split into fragments
+        @param payload: message to send as bytes
+        @return: True if the message was acknowledged, else False
+        """
+        if self.connected_node is None:
+            return False
+        destination = self.connected_node
+        best_route = await self.find_route_async(destination)
+        if len(best_route) == 0:
+            return False
+        for encoded_payload in self.encode_payload(payload, destination):
+            if not await self.send_message_payload_async(destination, best_route['next_node'], encoded_payload):
+                return False
+        return True
+
+    async def send_message_payload_async(self, destination, next_node, payload):
+        """
+        sends one message header to a destination and waits for the acknowledgement
+        :param destination: address of destination node
+        :param next_node: address of next hop
+        :param payload: payload of the message header as str
+        :return: True if the message was acknowledged, else False
+        """
+        header_obj = header.MessageHeader(None, self.my_address, variables.DEFAULT_TTL, destination, next_node,
+                                          self.get_next_message_id(destination), payload)
+        rtt_estimator = self.get_rtt_estimator(destination, self.ACK_TIMEOUT)
+        self.add_message_to_waiting_acknowledgement_list(header_obj)
+        for attempt in range(self.MAX_ATTEMPTS):
+            logging.debug(f'attempt: {attempt}')
+            await self.send_header_async(header_obj.get_frame_str())
+            sent_at = time.monotonic()
+            if await self.wait_until(lambda: header_obj.message_id not in self.messages_acknowledgment,
+                                     rtt_estimator.get_timeout()):
+                if attempt == 0:
+                    # acknowledgements of retransmitted messages are ambiguous and not measured (Karn's rule)
+                    rtt_estimator.add_sample(time.monotonic() - sent_at)
+                logging.debug('message was acknowledged by receiver')
+                return True
+            rtt_estimator.back_off()
+        logging.debug(f'message was not acknowledged by receiver. Current ack_list: {self.messages_acknowledgment}'
+                      f'\nSending route error message')
+        self.routing_table.delete_all_entries_of_destination(destination)
+        self.delete_from_ack_list(header_obj.message_id)
+        await self.send_header_async(header.RouteErrorHeader(None, self.my_address, variables.DEFAULT_TTL,
+                                                             header_obj.destination).get_frame_str())
+        return False
+
+    async def find_route_async(self, end_node):
+        """
+        returns best route to passed node; sends a route request if there is no routing table entry for the node
+        :param end_node: address of destination node
+        :return: routing table entry as dict or empty dict if no route was found
+        """
+        route = self.routing_table.get_best_route_for_destination(end_node)
+        if len(route) == 0:
+            logging.info(f'could not find a route to {end_node}. Sending route request...')
+            if await self.send_route_request_message_async(end_node):
+                route = self.routing_table.get_best_route_for_destination(end_node)
+            else:
+                logging.info(f'Got no answer on route requested for end node: {end_node}')
+        return route
+
+    async def send_route_request_message_async(self, end_node):
+        """
+        sends route request and waits for the route reply
+        @param end_node: node for which a route is required
+        @return: True, if route request was confirmed, else False
+        """
+        route_request_header_obj = header.RouteRequestHeader(None, self.my_address, variables.DEFAULT_TTL, 0,
+                                                             end_node)
+        for attempt in range(self.MAX_ATTEMPTS):
+            logging.debug('attempt: {}'.format(attempt))
+            await self.send_header_async(route_request_header_obj.get_frame_str())
+            if await self.wait_until(lambda: len(self.routing_table.get_best_route_for_destination(end_node)) != 0,
+                                     self.ROUTE_REPLY_TIMEOUT):
+                logging.debug('new route for {} found'.format(end_node))
+                return True
+        return False
+
+    async def send_registration_message_async(self, subscribe, peer_id):
+        """
+        registers/unregisters a peer and waits until the registration message was forwarded by a neighbor
+        :param subscribe: if True peer will be registered on network; else the peer will be unregistered
+        :param peer_id: id of peer
+        :return: True if own registration message was received, else False
+        """
+        if subscribe:
+            self.routing_table.add_peer(peer_id, self.my_address)
+        else:
+            self.routing_table.delete_peer(peer_id, self.my_address)
+        self.received_own_registration_message = False
+        for _ in range(self.MAX_ATTEMPTS):
+            await self.send_header_async(RegistrationHeader(None, self.my_address, variables.DEFAULT_TTL, subscribe,
+                                                            peer_id).get_frame_str())
+            if await self.wait_until(lambda: self.received_own_registration_message, self.REGISTRATION_TIMEOUT):
+                return True
+        return False
+
+    async def send_connect_request_header_async(self, source_peer_id, target_peer_id, timeout_in_sec):
+        """
+        sends connect request
+        :param source_peer_id: peer id of source peer
+        :param target_peer_id: peer id of target peer
+        :param timeout_in_sec: timeout in seconds
+        """
+        self.check_peers(source_peer_id, target_peer_id)
+        if not self.routing_table.check_connect_request_entry_already_exists(source_peer_id, target_peer_id):
+            self.routing_table.add_connect_request(source_peer_id, target_peer_id)
+            end_node = self.routing_table.get_address_of_peer(target_peer_id)
+            route = await self.find_route_async(end_node)
+            if len(route) == 0:
+                return
+            await self.send_header_async(ConnectRequestHeader(None, self.my_address, variables.DEFAULT_TTL, end_node,
+                                                              route['next_node'], source_peer_id, target_peer_id,
+                                                              timeout_in_sec,
+                                                              get_requested_payload_encoding()).get_frame_str())
+
+    async def send_disconnect_request_header_async(self, source_peer_id, target_peer_id):
+        """
+        sends disconnect request
+        :param source_peer_id: peer id of source peer
+        :param target_peer_id: peer id of target peer
+        """
+        self.check_peers(source_peer_id, target_peer_id)
+        end_node = self.routing_table.get_address_of_peer(target_peer_id)
+        route = await self.find_route_async(end_node)
+        if len(route) == 0:
+            return
+        await self.send_header_async(DisconnectRequestHeader(None, self.my_address, variables.DEFAULT_TTL, end_node,
+                                                             route['next_node'], source_peer_id,
+                                                             target_peer_id).get_frame_str())
+
+    def _notify_state_changed(self):
+        """
+        wakes up all coroutines waiting in wait_until
+        """
+        self.state_changed.set()
+        self.state_changed = asyncio.Event()
+
+
+class AsyncIPC:
+    """
+    counterpart of ipc.IPC for the asyncio mode; both TCP servers are served by the event loop
+    """
+
+    def __init__(self, ipc_port, message_port, protocol_obj):
+        """
+        constructor of AsyncIPC class
+        :param ipc_port: port of TCP socket for administration
+        :param message_port: port of TCP socket for data exchange
+        :param protocol_obj: object of class AsyncProtocol
+        """
+        self.ipc_port = ipc_port
+        self.message_port = message_port
+        self.protocol = protocol_obj
+        self.servers = []
+        self.no_delay = variables.COALESCING_NO_DELAY
+        self.coalescers = set()
+
+    async def start_ipc(self):
+        """
+        starts processing of received frames and both TCP servers
+        """
+        self.protocol.start_protocol_thread()
+        self.servers = [await asyncio.start_server(self.handle_ipc_connection, port=self.ipc_port),
+                        await asyncio.start_server(self.handle_message_connection, port=self.message_port)]
+
+    def stop_ipc_instance(self):
+        """
+        closes TCP servers and stops the protocol
+        """
+        for server in self.servers:
+            server.close()
+        self.protocol.stop()
+
+    async def handle_message_connection(self, reader, writer):
+        """
+        received data from TCP socket is sent over LoRa network; received messages from LoRa network are sent to the
+        TCP client
+        :param reader: asyncio.StreamReader of the connection
+        :param writer: asyncio.StreamWriter of the connection
+        """
+        print('client for message transfer connected')
+        forwarding_task = asyncio.ensure_future(
+            forward_queue(self.protocol.received_messages_queue, writer, lambda message: message))
+        coalescer = coalescing.Coalescer(self.protocol.get_max_message_size(), no_delay=self.no_delay)
+        self.coalescers.add(coalescer)
+        try:
+            while True:
+                try:
+                    data = await asyncio.wait_for(reader.read(variables.MESSAGE_READ_SIZE), coalescer.get_timeout())
+                except asyncio.TimeoutError:
+                    await self.send_data(coalescer.poll())
+                    continue
+                logging.debug(f'data: {data}')
+                if not data:
+                    await self.send_data(coalescer.flush())
+                    print('closed message socket')
+                    break
+                await self.send_data(coalescer.add(data))
+        finally:
+            self.coalescers.discard(coalescer)
+            forwarding_task.cancel()
+            writer.close()
+
+    async def send_data(self, data):
+        """
+        sends data released by a coalescer over the LoRa network
+        :param data: data as bytes or None if there is nothing to send
+        """
+        if data is not None:
+            await self.protocol.send_message_async(data)
+
+    async def handle_ipc_connection(self, reader, writer):
+        """
+        processes received commands to control routing protocol; requests received from LoRa network are forwarded
+        to the TCP client
+        :param reader: asyncio.StreamReader of the connection
+        :param writer: asyncio.StreamWriter of the connection
+        """
+        logging.debug(f"connected to java ipc with address {writer.get_extra_info('peername')}")
+        forwarding_task = asyncio.ensure_future(forward_queue(
+            self.protocol.sending_queue, writer,
+            lambda payload: (payload + variables.HEADER_DELIMITER).encode(variables.ENCODING)))
+        try:
+            while True:
+                data = await reader.read(1024)
+                if not data:
+                    print('closed')
+                    break
+                for message in data.decode().split(variables.HEADER_DELIMITER):
+                    await self.process_ipc_message(message, writer)
+        except ConnectionResetError:
+            logging.debug('Connection reset by client. Wait for new connection')
+        finally:
+            forwarding_task.cancel()
+            writer.close()
+
+    async def process_ipc_message(self, message, writer):
+        """
+        processes one command received from the connected application
+        :param message: command as str
+        :param writer: asyncio.StreamWriter of the connection
+        """
+        if message == 'registeredPeers?':
+            registered_peers = self.protocol.routing_table.get_peers()
+            logging.debug(f'send registered peer to java: {registered_peers}')
+            writer.write(ipc.create_registered_peers_message(registered_peers).encode(variables.ENCODING))
+            await writer.drain()
+        elif len(message) != 0:
+            logging.debug(f'request from java side: {message}')
+            message_values = message.split(variables.JAVA_IPC_MESSAGE_VALUES_DELIMITER)
+            message_type = message_values[0]
+            if message_type == 'Registration':
+                await self.protocol.send_registration_message_async(message_values[2].lower() == 'true',
+                                                                    message_values[1])
+            elif message_type == 'ConnectRequest':
+                await self.protocol.send_connect_request_header_async(message_values[1], message_values[2],
+                                                                      message_values[3])
+            elif message_type == 'DisconnectRequest':
+                await self.protocol.send_disconnect_request_header_async(message_values[1], message_values[2])
+            elif message_type == 'NoDelay':
+                self.no_delay = message_values[1].lower() == 'true'
+                for coalescer in list(self.coalescers):
+                    await self.send_data(coalescer.set_no_delay(self.no_delay))
+
+
+async def forward_queue(loop_queue, writer, encode):
+    """
+    writes all items of a LoopQueue to a TCP connection
+    :param loop_queue: object of class LoopQueue
+    :param writer: asyncio.StreamWriter of the connection
+    :param encode: function which converts an item to bytes
+    """
+    while True:
+        item = await loop_queue.get()
+        logging.debug(f'sending: {item}')
+        writer.write(encode(item))
+        await writer.drain()
+
+
+async def config_module(driver, configuration=variables.MODULE_CONFIG):
+    """
+    sets configuration of LoRa module (see module_config.config_module)
+    :param driver: object of class AsyncModemDriver
+    :param configuration: AT+CFG command
+    :return: True if configuration was set successfully, else False
+    """
+    if await driver.execute_command_async(configuration, [variables.STATUS_OK]):
+        driver.set_lora_configuration(configuration)
+        await driver.execute_command_async('AT+SEND=1', [variables.STATUS_OK])
+        await driver.execute_command_async('a', ['AT,SENDING', 'AT,SENDED'])
+        logging.debug('module config successfully set')
+        return True
+    logging.warning("could not set module config")
+    return False
+
+
+async def set_address(driver, address):
+    """
+    sets address of LoRa module
+    :param driver: object of class AsyncModemDriver
+    :param address: address as str (e.g. '0137')
+    :return: True if address was set successfully, else False
+    """
+    if await driver.execute_command_async(f'AT+ADDR={address}', [variables.STATUS_OK]):
+        logging.debug(f'module address successfully set to: {address}')
+        return True
+    logging.warning("could not set module address")
+    return False
+
+
+async def get_current_address(driver):
+    """
+    reads address of LoRa module
+    :param driver: object of class AsyncModemDriver
+    :return: address as str
+    """
+    answer = await driver.query_async(variables.GET_ADDR)
+    if answer is None:
+        raise ValueError('could not get address of module')
+    return module_config.parse_address_answer(answer)
+
+
+async def start_node(serial_conn, ipc_port, message_port, module_address=None, name='modem'):
+    """
+    starts a node in asyncio mode: driver, protocol and both TCP servers run in the calling event loop
+    :param serial_conn: object for serial connection from pyserial library
+    :param ipc_port: port of TCP socket for administration
+    :param message_port: port of TCP socket for data exchange
+    :param module_address: address of the LoRa module; if None the address is read from the LoRa module
+    :param name: name of the driver
+    :return: object of class AsyncIPC
+    """
+    driver = AsyncModemDriver(serial_conn, name=name, loop=asyncio.get_event_loop())
+    driver.start()
+    if module_address is None:
+        module_address = await get_current_address(driver)
+        logging.info('loaded address of module: {}'.format(module_address))
+    async_ipc = AsyncIPC(ipc_port, message_port, AsyncProtocol(driver, address=module_address))
+    await async_ipc.start_ipc()
+    return async_ipc
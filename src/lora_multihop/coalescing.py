@@ -0,0 +1,96 @@
+import time
+
+from lora_multihop import variables
+
+__author__ = "Marvin Rausch"
+
+
+class Coalescer:
+    """
+    collects small writes of an application to send them as few full frames (like Nagle's algorithm of TCP); the
+    buffered data are released if they fill a frame or if the oldest buffered byte waited longer than the latency bound;
+    the coalescer does not send data itself, so it can be used by threads and coroutines
+    """
+
+    def __init__(self, max_size, delay=variables.COALESCING_DELAY, no_delay=False):
+        """
+        constructor of Coalescer class
+        :param max_size: number of bytes which fill a frame; buffered data are released as soon as they reach this size
+        :param delay: max time in seconds data are buffered (latency bound)
+        :param no_delay: True to release every write immediately
+        """
+        self.max_size = max_size
+        self.delay = delay
+        self.no_delay = no_delay
+        self.buffered_writes = []
+        self.buffered_length = 0
+        self.deadline = None
+        self.writes = 0
+        self.flushes = 0
+
+    def add(self, data):
+        """
+        adds data written by the application
+        :param data: data as bytes
+        :return: data to send as bytes or None if the data are buffered
+        """
+        self.writes += 1
+        self.buffered_writes.append(data)
+        self.buffered_length += len(data)
+        if self.no_delay or self.buffered_length >= self.max_size:
+            return self.flush()
+        if self.deadline is None:
+            self.deadline = time.monotonic() + self.delay
+        return None
+
+    def poll(self):
+        """
+        checks the latency bound; must be called regularly by the caller
+        :return: data to send as bytes or None if no data have to be sent now
+        """
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return self.flush()
+        return None
+
+    def get_timeout(self):
+        """
+        :return: time in seconds until buffered data have to be sent or None if the buffer is empty
+        """
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0)
+
+    def flush(self):
+        """
+        releases all buffered data (e.g. before the connection is closed)
+        :return: data to send as bytes or None if the buffer is empty
+        """
+        self.deadline = None
+        if len(self.buffered_writes) == 0:
+            return None
+        if len(self.buffered_writes) == 1:
+            # a single write is released without copying it
+            data = self.buffered_writes[0]
+        else:
+            data = b''.join(self.buffered_writes)
+        self.buffered_writes = []
+        self.buffered_length = 0
+        self.flushes += 1
+        return data
+
+    def set_no_delay(self, no_delay):
+        """
+        switches coalescing off or on
+        :param no_delay: True to release every write immediately
+        :return: buffered data which have to be sent now as bytes or None
+        """
+        self.no_delay = no_delay
+        if no_delay:
+            return self.flush()
+        return None
+
+    def get_statistics(self):
+        """
+        :return: number of writes of the application and number of released blocks as dict
+        """
+        return {'writes': self.writes, 'flushes': self.flushes}
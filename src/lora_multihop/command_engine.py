@@ -0,0 +1,287 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from lora_multihop import variables
+
+__author__ = "Marvin Rausch"
+
+STATUS_ERROR_PREFIX = 'AT,ERR'
+
+
+class Command:
+
+    def __init__(self, command, expected_responses=None, depends_on=None, airtime=None, query=False):
+        """
+        constructor of Command class
+        :param command: AT-command or payload which should be written to the LoRa module (str or bytes)
+        :param expected_responses: list of status lines the LoRa module answers with, if command was successful; can be
+        empty if the result of the command should not be verified
+        :param depends_on: command which has to be successful before this command is written to the LoRa module
+        :param airtime: time on air in seconds of the frame sent by this command (and the commands depending on it);
+        used to check the duty cycle before the command is issued
+        :param query: True if the command reads a value from the LoRa module (e.g. 'AT+ADDR?'); the future of a query
+        resolves to the answer of the LoRa module
+        """
+        if expected_responses is None:
+            expected_responses = []
+        self.command = command
+        self.expected_responses = list(expected_responses)
+        self.depends_on = depends_on
+        self.airtime = airtime
+        self.query = query
+        self.received_responses = []
+        self.deadline = None
+        self.future = Future()
+        # timestamps (time.monotonic) used by command_statistics.CommandStatistics
+        self.submitted_at = time.monotonic()
+        self.issued_at = None
+        self.written_at = None
+        self.response_times = []
+        self.finished_at = None
+
+    def get_bytes(self):
+        """
+        :return: command terminated by variables.TERMINATOR as bytes which can be written to serial port
+        """
+        command = self.command
+        if isinstance(command, str):
+            # binary headers contain surrogates for bytes which are not valid UTF-8
+            command = command.encode(variables.ENCODING, 'surrogateescape')
+        return command + variables.TERMINATOR.encode(variables.ENCODING)
+
+    def __str__(self):
+        return str(self.command)
+
+
+class CommandEngine:
+    """
+    state machine which issues the commands for the LoRa module one after another; the next command is issued as soon
+    as all expected responses of the current command were received, so there is no fixed pause between two commands
+    """
+    STATE_IDLE = 'idle'
+    STATE_WAITING_FOR_RESPONSE = 'waiting_for_response'
+
+    def __init__(self, timeout=variables.COMMAND_VERIFICATION_TIMEOUT, statistics=None, transmit_scheduler=None):
+        """
+        constructor of CommandEngine class
+        :param timeout: max time in seconds to wait for the expected responses of a command
+        :param statistics: object with method record_command(command, successful) which is called for every finished
+        command (e.g. command_statistics.CommandStatistics); can be None
+        :param transmit_scheduler: object of class airtime.DutyCycleScheduler which defers commands with airtime to
+        comply with the duty cycle; can be None
+        """
+        self.timeout = timeout
+        self.statistics = statistics
+        self.transmit_scheduler = transmit_scheduler
+        self.state = self.STATE_IDLE
+        self.current_command = None
+        self.pending_commands = deque()
+        self.condition = threading.Condition()
+
+    def submit(self, command, expected_responses=None, depends_on=None):
+        """
+        adds a command to the queue of pending commands
+        :param command: AT-command or payload as str or bytes
+        :param expected_responses: list of expected status lines
+        :param depends_on: command which has to be successful before this command is issued
+        :return: object of class Command; its future resolves to True if the expected responses were received, else
+        to False
+        """
+        command_obj = Command(command, expected_responses, depends_on)
+        with self.condition:
+            self.pending_commands.append(command_obj)
+            self.condition.notify_all()
+        return command_obj
+
+    def submit_query(self, command):
+        """
+        adds a command which reads a value from the LoRa module to the queue of pending commands; the answer is
+        captured by the command engine, so it can not be mixed up with received frames
+        :param command: AT-command as str or bytes (e.g. 'AT+ADDR?')
+        :return: object of class Command; its future resolves to the answer (e.g. 'AT,0137,OK') or to False if the
+        LoRa module answered with an error or did not answer
+        """
+        command_obj = Command(command, query=True)
+        with self.condition:
+            self.pending_commands.append(command_obj)
+            self.condition.notify_all()
+        return command_obj
+
+    def submit_sequence(self, command_list, airtime=None):
+        """
+        adds several commands to the queue of pending commands; a command of the sequence is only issued if the
+        previous one was successful
+        :param command_list: list of tuples (command, expected_responses)
+        :param airtime: time on air in seconds of the frame sent by the sequence; the first command of the sequence is
+        deferred until the duty cycle allows sending the frame
+        :return: list of Command objects
+        """
+        command_objects = []
+        previous_command = None
+        for command, expected_responses in command_list:
+            previous_command = Command(command, expected_responses, previous_command)
+            command_objects.append(previous_command)
+        if len(command_objects) > 0:
+            command_objects[0].airtime = airtime
+        with self.condition:
+            self.pending_commands.extend(command_objects)
+            self.condition.notify_all()
+        return command_objects
+
+    def next_command(self, timeout=None):
+        """
+        blocks until the LoRa module is ready to receive the next command; the returned command has to be written to
+        the serial port and confirmed by calling command_written
+        :param timeout: max time in seconds to wait for a command
+        :return: object of class Command or None if timeout was reached
+        """
+        end_time = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                self._check_timeout()
+                transmit_delay = 0
+                if self.state == self.STATE_IDLE:
+                    transmit_delay = self._get_transmit_delay()
+                    command = self._pop_pending_command() if transmit_delay == 0 else None
+                    if command is not None:
+                        self.current_command = command
+                        self.state = self.STATE_WAITING_FOR_RESPONSE
+                        command.issued_at = time.monotonic()
+                        command.deadline = command.issued_at + self.timeout
+                        if command.airtime is not None and self.transmit_scheduler is not None:
+                            self.transmit_scheduler.record_transmission(command.airtime)
+                        return command
+                wait_time = self._get_wait_time(end_time, transmit_delay)
+                if wait_time is not None and wait_time <= 0:
+                    return None
+                self.condition.wait(wait_time)
+
+    def command_written(self, command):
+        """
+        must be called after a command was written to the serial port; commands without expected responses are
+        finished immediately
+        :param command: object of class Command which was returned by next_command
+        """
+        with self.condition:
+            command.written_at = time.monotonic()
+            if command is self.current_command and len(command.expected_responses) == 0 and not command.query:
+                self._finish(True)
+
+    def process_response(self, response):
+        """
+        processes a line received from the LoRa module
+        :param response: received line as str
+        :return: True if the line was a status line of the current command, else False
+        """
+        response = response.strip()
+        with self.condition:
+            if self.state != self.STATE_WAITING_FOR_RESPONSE or not response.startswith('AT'):
+                return False
+            command = self.current_command
+            if command.query:
+                command.received_responses.append(response)
+                command.response_times.append(time.monotonic())
+                self._finish(False if response.startswith(STATUS_ERROR_PREFIX) else response)
+                return True
+            if len(command.expected_responses) == 0:
+                # answer of a command which is not verified (e.g. 'AT+ADDR?'), arrived before command_written
+                return False
+            expected_response = command.expected_responses[len(command.received_responses)]
+            command.received_responses.append(response)
+            command.response_times.append(time.monotonic())
+            if response != expected_response:
+                logging.warning(f'could not verify {expected_response} != {response}')
+                self._finish(False)
+            elif len(command.received_responses) == len(command.expected_responses):
+                logging.debug(f'verified {response}')
+                self._finish(True)
+            else:
+                logging.debug(f'verified {response}')
+            return True
+
+    def get_transmit_delay(self):
+        """
+        :return: time in seconds the next pending command is deferred to comply with the duty cycle
+        """
+        with self.condition:
+            if self.state != self.STATE_IDLE:
+                return 0
+            return self._get_transmit_delay()
+
+    def is_waiting_for_response(self):
+        """
+        :return: True if the engine waits for the status of a command, else False
+        """
+        with self.condition:
+            return self.state == self.STATE_WAITING_FOR_RESPONSE
+
+    def _pop_pending_command(self):
+        """
+        gets next command from queue; commands which depend on a failed command are finished without being issued
+        :return: object of class Command or None if there is no pending command
+        """
+        while len(self.pending_commands) > 0:
+            command = self.pending_commands.popleft()
+            if command.depends_on is None or command.depends_on.future.result():
+                return command
+            logging.debug(f"command '{command}' not issued, because previous command failed")
+            if self.statistics is not None:
+                self.statistics.record_command(command, False)
+            command.future.set_result(False)
+        return None
+
+    def _check_timeout(self):
+        """
+        finishes current command unsuccessfully if its expected responses were not received in time
+        """
+        command = self.current_command
+        if command is not None and command.deadline is not None and time.monotonic() > command.deadline:
+            logging.warning(f"no response for command '{command}' received. Received: {command.received_responses}")
+            self._finish(False)
+
+    def _get_transmit_delay(self):
+        """
+        computes how long the next pending command has to be deferred to comply with the duty cycle
+        :return: delay in seconds
+        """
+        if self.transmit_scheduler is None or len(self.pending_commands) == 0:
+            return 0
+        airtime = self.pending_commands[0].airtime
+        if airtime is None:
+            return 0
+        return self.transmit_scheduler.get_delay(airtime)
+
+    def _get_wait_time(self, end_time, transmit_delay=0):
+        """
+        computes how long next_command can wait before it has to check the deadline of the current command again
+        :param end_time: time (time.monotonic) when next_command has to return
+        :param transmit_delay: time in seconds the next pending command is deferred to comply with the duty cycle
+        :return: time to wait in seconds or None to wait without timeout
+        """
+        wait_times = []
+        if transmit_delay > 0:
+            wait_times.append(transmit_delay)
+        if end_time is not None:
+            wait_times.append(end_time - time.monotonic())
+        if self.current_command is not None and self.current_command.deadline is not None:
+            wait_times.append(max(self.current_command.deadline - time.monotonic(), 0.001))
+        if len(wait_times) == 0:
+            return None
+        return min(wait_times)
+
+    def _finish(self, successful):
+        """
+        finishes the current command and switches to idle state; must be called while holding the condition lock
+        :param successful: result of the command; for queries the answer of the LoRa module or False
+        """
+        command = self.current_command
+        self.current_command = None
+        self.state = self.STATE_IDLE
+        command.finished_at = time.monotonic()
+        if self.statistics is not None:
+            self.statistics.record_command(command, successful)
+        command.future.set_result(successful)
+        self.condition.notify_all()
@@ -0,0 +1,162 @@
+import json
+import math
+import threading
+from collections import deque
+
+from lora_multihop import variables
+
+__author__ = "Marvin Rausch"
+
+PAYLOAD_COMMAND_TYPE = 'payload'
+STATUS_SENDING = 'AT,SENDING'
+STATUS_SENDED = 'AT,SENDED'
+PERCENTILES = (50, 95, 99)
+
+
+def get_command_type(command):
+    """
+    returns the type of a command used to group the measured latencies
+    :param command: AT-command or payload as str or bytes
+    :return: command without parameters (e.g. 'AT+SEND' for 'AT+SEND=12', 'AT+ADDR?') or 'payload' for data which is
+    not an AT-command
+    """
+    if isinstance(command, bytes):
+        command = command.decode(variables.ENCODING, errors='replace')
+    if not command.startswith('AT'):
+        return PAYLOAD_COMMAND_TYPE
+    return command.split('=')[0]
+
+
+class RollingHistogram:
+    """
+    keeps the last window_size samples and computes percentiles of them
+    """
+
+    def __init__(self, window_size):
+        """
+        constructor of RollingHistogram class
+        :param window_size: max number of samples
+        """
+        self.samples = deque(maxlen=window_size)
+        self.count = 0
+
+    def add(self, value):
+        """
+        adds a sample
+        :param value: measured value
+        """
+        self.samples.append(value)
+        self.count += 1
+
+    def get_percentile(self, percentile):
+        """
+        computes percentile of the stored samples using the nearest-rank method
+        :param percentile: percentile between 0 and 100
+        :return: percentile or None if there are no samples
+        """
+        if len(self.samples) == 0:
+            return None
+        sorted_samples = sorted(self.samples)
+        rank = max(math.ceil(percentile / 100 * len(sorted_samples)) - 1, 0)
+        return sorted_samples[min(rank, len(sorted_samples) - 1)]
+
+    def get_summary(self):
+        """
+        :return: dict containing number of samples, mean, max and percentiles (e.g. 'p95') of the stored samples
+        """
+        if len(self.samples) == 0:
+            return {'count': self.count}
+        summary = {'count': self.count, 'mean': sum(self.samples) / len(self.samples), 'max': max(self.samples)}
+        for percentile in PERCENTILES:
+            summary[f'p{percentile}'] = self.get_percentile(percentile)
+        return summary
+
+
+class CommandStatistics:
+    """
+    collects latencies of the commands handled by the command engine; for every command type the time a command waited
+    in the queue is stored separately from the time the LoRa module needed to answer; for payloads the time between
+    'AT,SENDING' and 'AT,SENDED' (time on air) is also stored
+    """
+
+    def __init__(self, window_size=variables.STATISTICS_WINDOW_SIZE):
+        """
+        constructor of CommandStatistics class
+        :param window_size: number of recent commands per command type used to compute percentiles
+        """
+        self.window_size = window_size
+        self.lock = threading.Lock()
+        self.command_types = {}
+
+    def record_command(self, command, successful):
+        """
+        stores the timestamps of a finished command; is called by the command engine
+        :param command: object of class command_engine.Command
+        :param successful: result of the command
+        """
+        command_type = get_command_type(command.command)
+        with self.lock:
+            entry = self.command_types.get(command_type)
+            if entry is None:
+                entry = {'successful': 0, 'failed': 0, 'skipped': 0,
+                         'queue_wait': RollingHistogram(self.window_size),
+                         'modem_time': RollingHistogram(self.window_size),
+                         'first_response': RollingHistogram(self.window_size),
+                         'airtime': RollingHistogram(self.window_size)}
+                self.command_types[command_type] = entry
+            if command.issued_at is None:
+                # command was not issued, because the command it depends on failed
+                entry['skipped'] += 1
+                return
+            entry['successful' if successful else 'failed'] += 1
+            entry['queue_wait'].add(command.issued_at - command.submitted_at)
+            if command.written_at is None:
+                return
+            if successful:
+                entry['modem_time'].add(command.finished_at - command.written_at)
+            if len(command.response_times) > 0:
+                entry['first_response'].add(command.response_times[0] - command.written_at)
+            airtime = get_airtime(command)
+            if airtime is not None:
+                entry['airtime'].add(airtime)
+
+    def get_statistics(self):
+        """
+        :return: dict containing counters and latency summaries (in seconds) per command type
+        """
+        with self.lock:
+            statistics = {}
+            for command_type, entry in self.command_types.items():
+                statistics[command_type] = {key: value.get_summary() if isinstance(value, RollingHistogram) else value
+                                            for key, value in entry.items()}
+            return statistics
+
+    def dump_json(self, file_path):
+        """
+        writes statistics to a JSON file
+        :param file_path: path of the file
+        """
+        with open(file_path, 'w') as json_file:
+            json.dump(self.get_statistics(), json_file, indent=2, sort_keys=True)
+
+    def reset(self):
+        """
+        deletes all collected statistics
+        """
+        with self.lock:
+            self.command_types = {}
+
+
+def get_airtime(command):
+    """
+    computes time between 'AT,SENDING' and 'AT,SENDED' of a payload
+    :param command: object of class command_engine.Command
+    :return: time in seconds or None if the command did not receive both status lines
+    """
+    responses = command.received_responses
+    if STATUS_SENDING in responses and STATUS_SENDED in responses:
+        sending_index = responses.index(STATUS_SENDING)
+        sended_index = responses.index(STATUS_SENDED)
+        if sended_index > sending_index:
+            return command.response_times[sended_index] - command.response_times[sending_index]
+    return None
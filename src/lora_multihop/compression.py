@@ -0,0 +1,96 @@
+import logging
+import threading
+import zlib
+
+from lora_multihop import fragmentation, variables
+
+__author__ = "Marvin Rausch"
+
+# raw deflate stream without zlib header and checksum; every byte counts on a LoRa link
+WBITS = -zlib.MAX_WBITS
+
+
+def load_dictionary(file_path):
+    """
+    loads a preset dictionary for the compression; sender and receiver must use the same dictionary
+    :param file_path: path of a file containing typical payloads (e.g. JSON messages); only the last 32 KB are used
+    :return: dictionary as bytes
+    """
+    with open(file_path, 'rb') as dictionary_file:
+        return dictionary_file.read()[-32768:]
+
+
+class Compressor:
+    """
+    compresses messages with zlib (deflate) and an optional preset dictionary; messages are sent uncompressed if the
+    compression does not save at least min_saving bytes
+    """
+
+    def __init__(self, level=variables.COMPRESSION_LEVEL, dictionary=None, min_saving=variables.COMPRESSION_MIN_SAVING,
+                 max_length=fragmentation.MAX_DATAGRAM_SIZE):
+        """
+        constructor of Compressor class
+        :param level: compression level (1 - 9)
+        :param dictionary: preset dictionary as bytes or None
+        :param min_saving: min number of saved bytes to send a message compressed
+        :param max_length: max length of a decompressed message in bytes
+        """
+        self.level = level
+        self.dictionary = dictionary
+        self.min_saving = min_saving
+        self.max_length = max_length
+        self.lock = threading.Lock()
+        self.compressed_messages = 0
+        self.skipped_messages = 0
+        self.original_bytes = 0
+        self.compressed_bytes = 0
+
+    def compress(self, data):
+        """
+        compresses a message if it pays off
+        :param data: message as bytes
+        :return: tuple (data to send as bytes, True if the data are compressed)
+        """
+        if self.dictionary is None:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, WBITS)
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, WBITS, zdict=self.dictionary)
+        compressed_data = compressor.compress(data) + compressor.flush()
+        with self.lock:
+            if len(compressed_data) + self.min_saving > len(data):
+                self.skipped_messages += 1
+                self.original_bytes += len(data)
+                self.compressed_bytes += len(data)
+                return data, False
+            self.compressed_messages += 1
+            self.original_bytes += len(data)
+            self.compressed_bytes += len(compressed_data)
+        logging.debug(f'compressed message from {len(data)} to {len(compressed_data)} bytes')
+        return compressed_data, True
+
+    def decompress(self, data):
+        """
+        :param data: compressed message as bytes
+        :return: decompressed message as bytes
+        :raises ValueError if the data can not be decompressed or exceed max_length
+        """
+        if self.dictionary is None:
+            decompressor = zlib.decompressobj(WBITS)
+        else:
+            decompressor = zlib.decompressobj(WBITS, zdict=self.dictionary)
+        try:
+            decompressed_data = decompressor.decompress(data, self.max_length)
+        except zlib.error as e:
+            raise ValueError(f'could not decompress message: {e}')
+        if decompressor.unconsumed_tail:
+            raise ValueError(f'decompressed message exceeds {self.max_length} bytes')
+        return decompressed_data
+
+    def get_statistics(self):
+        """
+        :return: counters and achieved compression ratio (sent bytes / original bytes of all messages) as dict
+        """
+        with self.lock:
+            ratio = self.compressed_bytes / self.original_bytes if self.original_bytes > 0 else None
+            return {'compressed_messages': self.compressed_messages, 'skipped_messages': self.skipped_messages,
+                    'original_bytes': self.original_bytes, 'compressed_bytes': self.compressed_bytes, 'ratio': ratio}
@@ -0,0 +1,218 @@
+import logging
+import struct
+import time
+
+from lora_multihop import payload_encoding, variables
+
+__author__ = "Marvin Rausch"
+
+# payloads of message headers starting with this character contain a fragment followed by the prefix of its encoding
+# (see payload_encoding); other payloads contain an unfragmented message
+FRAGMENT_MARKER = '#'
+# datagram id, offset of the data in the datagram, flags
+FRAGMENT_HEADER = struct.Struct('>HHB')
+FLAG_MORE_FRAGMENTS = 0x01
+FLAG_COMPRESSED = 0x02
+MAX_DATAGRAM_ID = 0xFFFF
+MAX_DATAGRAM_SIZE = 0xFFFF
+
+
+class Fragment:
+
+    def __init__(self, datagram_id, offset, more_fragments, data, compressed=False):
+        """
+        constructor of Fragment class
+        :param datagram_id: id of the datagram the fragment belongs to
+        :param offset: position of the data in the datagram in bytes
+        :param more_fragments: True if the fragment is not the last fragment of the datagram
+        :param data: data as bytes
+        :param compressed: True if the datagram is compressed (see compression.Compressor)
+        """
+        self.datagram_id = datagram_id
+        self.offset = offset
+        self.more_fragments = more_fragments
+        self.data = data
+        self.compressed = compressed
+
+    def encode(self, encoding=payload_encoding.ENCODINGS[payload_encoding.BASE64]):
+        """
+        :param encoding: payload encoding object (see payload_encoding)
+        :return: fragment as str which can be used as payload of a message header
+        """
+        flags = FLAG_MORE_FRAGMENTS if self.more_fragments else 0
+        if self.compressed:
+            flags |= FLAG_COMPRESSED
+        fragment_bytes = FRAGMENT_HEADER.pack(self.datagram_id, self.offset, flags) + self.data
+        return FRAGMENT_MARKER + payload_encoding.encode(fragment_bytes, encoding)
+
+    def __str__(self):
+        return f'datagram: {self.datagram_id}, offset: {self.offset}, more fragments: {self.more_fragments}, ' \
+               f'length: {len(self.data)}'
+
+
+def is_fragment(payload):
+    """
+    :param payload: payload of a message header as str
+    :return: True if the payload contains a fragment, else False
+    """
+    return payload.startswith(FRAGMENT_MARKER)
+
+
+def decode_fragment(payload):
+    """
+    creates fragment object from payload of a message header
+    :param payload: payload of a message header as str starting with FRAGMENT_MARKER
+    :return: object of class Fragment
+    :raises ValueError if the payload does not contain a valid fragment
+    """
+    try:
+        fragment_bytes = payload_encoding.decode(payload[len(FRAGMENT_MARKER):])
+    except ValueError as e:
+        raise ValueError(f'fragment is not encoded correctly: {e}')
+    if len(fragment_bytes) < FRAGMENT_HEADER.size:
+        raise ValueError(f'fragment is too short: {len(fragment_bytes)} bytes')
+    datagram_id, offset, flags = FRAGMENT_HEADER.unpack_from(fragment_bytes)
+    return Fragment(datagram_id, offset, bool(flags & FLAG_MORE_FRAGMENTS), fragment_bytes[FRAGMENT_HEADER.size:],
+                    bool(flags & FLAG_COMPRESSED))
+
+
+def decode_payload(payload):
+    """
+    decodes payload of a received message header
+    :param payload: payload of a message header as str or bytes
+    :return: object of class Fragment if the payload contains a fragment, else the message as bytes
+    :raises ValueError if the payload can not be decoded
+    """
+    if isinstance(payload, bytes):
+        payload = payload.decode(variables.ENCODING)
+    if is_fragment(payload):
+        return decode_fragment(payload)
+    return payload_encoding.decode(payload)
+
+
+def get_max_payload_length(max_frame_length, header_length):
+    """
+    computes how many bytes fit into the base64 encoded payload of a message header
+    :param max_frame_length: max length of a frame in bytes
+    :param header_length: length of a message header without payload
+    :return: max number of bytes sent in one message header without fragmentation
+    """
+    return max((max_frame_length - header_length) // 4 * 3, 0)
+
+
+def get_fragment_size(max_frame_length, header_length):
+    """
+    computes how many bytes of a datagram fit into one fragment
+    :param max_frame_length: max length of a frame in bytes
+    :param header_length: length of a message header without payload
+    :return: max number of data bytes per fragment
+    """
+    fragment_size = get_max_payload_length(max_frame_length, header_length + len(FRAGMENT_MARKER)) - \
+        FRAGMENT_HEADER.size
+    if fragment_size <= 0:
+        raise ValueError(f'frame length {max_frame_length} is too small for fragments')
+    return fragment_size
+
+
+class Fragmenter:
+    """
+    splits datagrams into fragments; every datagram gets its own id
+    """
+
+    def __init__(self):
+        self.next_datagram_id = 0
+
+    def fragment(self, data, fragment_size, compressed=False, encoding=None):
+        """
+        splits a datagram into fragments
+        :param data: datagram as bytes
+        :param fragment_size: max number of data bytes per fragment; if an encoding is given, max length of an encoded
+        fragment in bytes instead, so the number of data bytes of every fragment depends on its data
+        :param compressed: True if the datagram is compressed
+        :param encoding: payload encoding object (see payload_encoding) used to fill every fragment up to fragment_size
+        :return: list of objects of class Fragment
+        """
+        if len(data) > MAX_DATAGRAM_SIZE:
+            raise ValueError(f'datagram is too large: {len(data)} bytes (max {MAX_DATAGRAM_SIZE} bytes)')
+        datagram_id = self.next_datagram_id
+        self.next_datagram_id = (self.next_datagram_id + 1) % (MAX_DATAGRAM_ID + 1)
+        fragments = []
+        offset = 0
+        while offset < len(data):
+            if encoding is None:
+                chunk_length = fragment_size
+            else:
+                # the flags do not change the length of the encoded header
+                fragment_header = FRAGMENT_HEADER.pack(datagram_id, offset, FLAG_MORE_FRAGMENTS)
+                chunk_length = encoding.get_max_data_length(fragment_header + data[offset:offset + fragment_size],
+                                                            fragment_size) - FRAGMENT_HEADER.size
+                if chunk_length <= 0:
+                    raise ValueError(f'fragment length {fragment_size} is too small for fragments')
+            chunk = data[offset:offset + chunk_length]
+            fragments.append(Fragment(datagram_id, offset, offset + len(chunk) < len(data), chunk, compressed))
+            offset += len(chunk)
+        return fragments
+
+
+class Reassembler:
+    """
+    reassembles datagrams of one source; the number of incomplete datagrams is bounded and incomplete datagrams are
+    dropped after a timeout
+    """
+
+    def __init__(self, max_datagrams=variables.REASSEMBLY_BUFFER_SIZE, timeout=variables.REASSEMBLY_TIMEOUT):
+        """
+        constructor of Reassembler class
+        :param max_datagrams: max number of incomplete datagrams; the oldest datagram is dropped if the limit is reached
+        :param timeout: time in seconds after which an incomplete datagram is dropped
+        """
+        self.max_datagrams = max_datagrams
+        self.timeout = timeout
+        # datagram id -> dict with received fragments (offset -> data), total length and time of first fragment
+        self.datagrams = {}
+        self.completed_datagrams = 0
+        self.dropped_datagrams = 0
+
+    def add(self, fragment):
+        """
+        adds a received fragment
+        :param fragment: object of class Fragment
+        :return: datagram as bytes if the fragment completed it, else None
+        """
+        now = time.monotonic()
+        self.remove_expired_datagrams(now)
+        datagram = self.datagrams.get(fragment.datagram_id)
+        if datagram is None:
+            if len(self.datagrams) >= self.max_datagrams:
+                oldest_datagram_id = min(self.datagrams, key=lambda key: self.datagrams[key]['created_at'])
+                logging.debug(f'reassembly buffer is full, drop datagram {oldest_datagram_id}')
+                del self.datagrams[oldest_datagram_id]
+                self.dropped_datagrams += 1
+            datagram = {'fragments': {}, 'total_length': None, 'received_length': 0, 'created_at': now}
+            self.datagrams[fragment.datagram_id] = datagram
+        if fragment.offset in datagram['fragments']:
+            return None
+        if fragment.offset + len(fragment.data) > MAX_DATAGRAM_SIZE:
+            raise ValueError(f'fragment exceeds max datagram size: {fragment}')
+        datagram['fragments'][fragment.offset] = fragment.data
+        datagram['received_length'] += len(fragment.data)
+        if not fragment.more_fragments:
+            datagram['total_length'] = fragment.offset + len(fragment.data)
+        if datagram['total_length'] is None or datagram['received_length'] < datagram['total_length']:
+            return None
+        del self.datagrams[fragment.datagram_id]
+        self.completed_datagrams += 1
+        return b''.join(data for _, data in sorted(datagram['fragments'].items()))
+
+    def remove_expired_datagrams(self, now=None):
+        """
+        drops incomplete datagrams whose first fragment was received more than timeout seconds ago
+        :param now: current time (time.monotonic)
+        """
+        if now is None:
+            now = time.monotonic()
+        for datagram_id in [datagram_id for datagram_id, datagram in self.datagrams.items()
+                            if now - datagram['created_at'] >= self.timeout]:
+            logging.debug(f'reassembly of datagram {datagram_id} timed out')
+            del self.datagrams[datagram_id]
+            self.dropped_datagrams += 1
@@ -0,0 +1,155 @@
+import logging
+
+from lora_multihop import header, variables
+
+__author__ = "Marvin Rausch"
+
+RECEIVED_FRAME_PREFIX = b'LR,'
+RECEIVED_FRAME_FIELD_COUNT = 3  # LR,{address},{length in hex},{payload}
+
+
+class FrameDemultiplexer:
+    """
+    incremental parser for the byte stream received from the LoRa module; the stream is split into status lines of
+    commands (e.g. 'AT,OK') and frames received over the LoRa network ('LR,...'); received frames are parsed using
+    their length field, so payloads can also contain line terminators
+    """
+
+    def __init__(self, status_consumer, frame_consumer, is_verifying_command=None):
+        """
+        constructor of FrameDemultiplexer class
+        :param status_consumer: function which is called with every status line as str; returns True if the status
+        line was processed, else the status line is passed to frame_consumer (e.g. answer on 'AT+ADDR?')
+        :param frame_consumer: function which is called with every received frame as str
+        :param is_verifying_command: function returning True while the status of a command is verified; used to
+        count frames which were dumped by the former implementation of the reading thread
+        """
+        self.status_consumer = status_consumer
+        self.frame_consumer = frame_consumer
+        self.is_verifying_command = is_verifying_command
+        self.buffer = bytearray()
+        self.terminator = variables.TERMINATOR.encode(variables.ENCODING)
+        self.received_frames = 0
+        self.received_status_lines = 0
+        self.rescued_frames = 0
+        self.dumped_messages = 0
+
+    def feed(self, data):
+        """
+        adds received bytes to the buffer and passes all complete messages to the consumers
+        :param data: bytes received from serial port
+        """
+        self.buffer.extend(data)
+        position = 0
+        while True:
+            message_end, next_position = self._find_message_end(position)
+            if message_end is None:
+                break
+            self._process_message(bytes(self.buffer[position:message_end]))
+            position = next_position
+        if position > 0:
+            del self.buffer[:position]
+
+    def get_statistics(self):
+        """
+        :return: counters of the parser as dict
+        """
+        return {'received_frames': self.received_frames, 'received_status_lines': self.received_status_lines,
+                'rescued_frames': self.rescued_frames, 'dumped_messages': self.dumped_messages,
+                'buffered_bytes': len(self.buffer)}
+
+    def _find_message_end(self, position):
+        """
+        searches the end of the message starting at passed position in buffer
+        :param position: start of message in buffer
+        :return: tuple (end of message without terminator, start of next message) or (None, None) if the message is
+        incomplete
+        """
+        if self.buffer.startswith(RECEIVED_FRAME_PREFIX, position):
+            frame_end = self._get_frame_end(position)
+            if frame_end is not None:
+                if len(self.buffer) < frame_end + len(self.terminator):
+                    if not self._contains_next_message(position, len(self.buffer)):
+                        return None, None
+                elif self.buffer[frame_end:frame_end + len(self.terminator)] == self.terminator:
+                    return frame_end, frame_end + len(self.terminator)
+        # status line or frame with invalid length field
+        line_end = self.buffer.find(b'\n', position)
+        if line_end == -1:
+            return None, None
+        if line_end > position and self.buffer[line_end - 1] == ord('\r'):
+            return line_end - 1, line_end + 1
+        return line_end, line_end + 1
+
+    def _get_frame_end(self, position):
+        """
+        uses the length field of a received frame to compute where its payload ends
+        :param position: start of the frame in buffer
+        :return: position of the end of the payload or None if the length field is missing or invalid
+        """
+        field_end = position
+        for _ in range(RECEIVED_FRAME_FIELD_COUNT):
+            field_end = self.buffer.find(b',', field_end)
+            if field_end == -1:
+                return None
+            field_end += 1
+        length_field_start = self.buffer.rfind(b',', position, field_end - 1) + 1
+        try:
+            payload_length = int(bytes(self.buffer[length_field_start:field_end - 1]), 16)
+        except ValueError:
+            return None
+        if payload_length > variables.MAX_FRAME_LENGTH:
+            return None
+        return field_end + payload_length
+
+    def _contains_next_message(self, position, end):
+        """
+        checks whether a terminator followed by the beginning of another message (status line or received frame) was
+        received after the start of an incomplete frame; in this case the length field of the frame is wrong and the
+        frame must not hold back the following messages
+        :param position: start of the incomplete frame in buffer
+        :param end: end of the received data in buffer
+        :return: True if another message follows, else False
+        """
+        for prefix in (b'AT,', RECEIVED_FRAME_PREFIX):
+            if self.buffer.find(self.terminator + prefix, position, end) != -1:
+                return True
+        return False
+
+    def _process_message(self, message):
+        """
+        passes a complete message to the appropriate consumer
+        :param message: message without terminator as bytes
+        """
+        if len(message) == 0:
+            return
+        try:
+            message_str = message.decode(variables.ENCODING)
+        except UnicodeDecodeError:
+            if not is_binary_frame(message):
+                self.dumped_messages += 1
+                logging.debug(f"message '{message}' dumped. because it is not encoded in UTF-8")
+                return
+            # bytes of the binary header which are not valid UTF-8 are passed as surrogates
+            message_str = message.decode(variables.ENCODING, 'surrogateescape')
+        if message.startswith(RECEIVED_FRAME_PREFIX):
+            self.received_frames += 1
+            if self.is_verifying_command is not None and self.is_verifying_command():
+                self.rescued_frames += 1
+                logging.debug(f'received message while verifying command: {message_str}')
+            self.frame_consumer(message_str)
+        else:
+            self.received_status_lines += 1
+            if not self.status_consumer(message_str):
+                self.frame_consumer(message_str)
+
+
+def is_binary_frame(message):
+    """
+    :param message: message received from the LoRa module as bytes
+    :return: True if the message is a received frame with a binary header (see header.Header.encode), else False
+    """
+    if not message.startswith(RECEIVED_FRAME_PREFIX):
+        return False
+    fields = message.split(b',', RECEIVED_FRAME_FIELD_COUNT)
+    return len(fields) > RECEIVED_FRAME_FIELD_COUNT and header.is_binary_header(fields[RECEIVED_FRAME_FIELD_COUNT])
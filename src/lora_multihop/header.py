@@ -1,4 +1,4 @@
-from lora_multihop import variables
+from lora_multihop import fragmentation, variables
 
 __author__ = "Marvin Rausch"
 
@@ -6,6 +6,15 @@ EXPECTED_VALUE_COUNT_ROUTE_REQUEST_HEADER = 5
 EXPECTED_VALUE_COUNT_ROUTE_REPLY_HEADER = 6
 EXPECTED_VALUE_COUNT_MESSAGE_HEADER = 6
 
+ASCII = 'ascii'
+BINARY = 'binary'
+# first byte of a binary header: high nibble 0x8 (a UTF-8 continuation byte, which can not start a valid UTF-8 string,
+# so binary headers are never mistaken for ASCII headers), low nibble is the version of the binary format
+BINARY_HEADER_MARKER = 0x80
+BINARY_HEADER_VERSION = 1
+# message ids are sent with up to 6 digits; used to compute the max length of a message header
+MAX_MESSAGE_ID = 999999
+
 
 class Header:
 
@@ -22,6 +31,188 @@ class Header:
         self.flag = flag
         self.ttl = int(ttl)
 
+    def get_frame_str(self):
+        """
+        creates header in the format configured with variables.HEADER_FORMAT; binary headers are returned as str
+        containing the bytes which are not valid UTF-8 as surrogates (see get_frame_length)
+        :return: header as str which can be sent over LoRa network
+        """
+        if variables.HEADER_FORMAT == BINARY:
+            return self.encode().decode(variables.ENCODING, 'surrogateescape')
+        return self.get_header_str()
+
+    def encode(self):
+        """
+        creates compact binary header: version byte, flag and ttl as nibbles, packed source address and the fields of
+        the header type (see encode_fields)
+        :return: header as bytes
+        :raises ValueError if a field can not be represented in the binary format
+        """
+        ttl = int(self.ttl)
+        if not 0 <= ttl <= 0x0F:
+            raise ValueError(f'ttl {ttl} does not fit into binary header')
+        return bytes([BINARY_HEADER_MARKER | BINARY_HEADER_VERSION, int(self.flag) << 4 | ttl]) + \
+            encode_address(self.source) + self.encode_fields()
+
+    def encode_fields(self):
+        """
+        :return: fields following the source address in a binary header as bytes
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def decode_fields(cls, received_from, source, ttl, reader):
+        """
+        creates header object from the fields following the source address in a binary header
+        :param received_from: address of last node which has forwarded the message
+        :param source: address of source node
+        :param ttl: time to live
+        :param reader: object of class BinaryReader positioned behind the source address
+        :return: header object
+        """
+        raise NotImplementedError
+
+
+class BinaryReader:
+    """
+    reads the fields of a binary header
+    """
+
+    def __init__(self, data):
+        """
+        constructor of BinaryReader class
+        :param data: binary header as bytes
+        """
+        self.data = data
+        self.position = 0
+
+    def read_byte(self):
+        """
+        :return: next byte as int
+        """
+        if self.position >= len(self.data):
+            raise ValueError('binary header is too short')
+        self.position += 1
+        return self.data[self.position - 1]
+
+    def read_address(self):
+        """
+        :return: next address as str (e.g. '0131')
+        """
+        return f'{self.read_byte() << 8 | self.read_byte():04X}'
+
+    def read_varint(self):
+        """
+        :return: next unsigned int encoded with 7 bits per byte (see encode_varint)
+        """
+        value = 0
+        shift = 0
+        while True:
+            byte = self.read_byte()
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80 == 0:
+                return value
+            shift += 7
+
+    def read_str(self):
+        """
+        :return: next str prefixed with its length in bytes
+        """
+        length = self.read_varint()
+        if self.position + length > len(self.data):
+            raise ValueError('binary header is too short')
+        self.position += length
+        return self.data[self.position - length:self.position].decode(variables.ENCODING)
+
+    def read_remaining_str(self):
+        """
+        :return: all remaining bytes as str
+        """
+        remaining_data = self.data[self.position:]
+        self.position = len(self.data)
+        return remaining_data.decode(variables.ENCODING)
+
+    def has_remaining_data(self):
+        """
+        :return: True if not all bytes were read
+        """
+        return self.position < len(self.data)
+
+
+def encode_address(address):
+    """
+    :param address: address with 4 hex digits as str (e.g. '0131')
+    :return: address as 2 bytes
+    :raises ValueError if the address has an unexpected format
+    """
+    check_addr_field(address, 'address')
+    return bytes.fromhex(address)
+
+
+def encode_varint(value):
+    """
+    encodes an unsigned int with 7 bits per byte, least significant group first; the high bit marks following bytes
+    :param value: int >= 0
+    :return: value as bytes
+    """
+    value = int(value)
+    if value < 0:
+        raise ValueError(f'negative value {value} can not be encoded')
+    encoded_value = bytearray()
+    while value > 0x7F:
+        encoded_value.append(value & 0x7F | 0x80)
+        value >>= 7
+    encoded_value.append(value)
+    return bytes(encoded_value)
+
+
+def encode_str(value):
+    """
+    :param value: str
+    :return: value prefixed with its length in bytes
+    """
+    encoded_value = str(value).encode(variables.ENCODING)
+    return encode_varint(len(encoded_value)) + encoded_value
+
+
+def is_binary_header(data):
+    """
+    :param data: received header as bytes
+    :return: True if the header is a binary header, else False
+    """
+    return len(data) > 0 and data[0] & 0xF0 == BINARY_HEADER_MARKER
+
+
+def get_frame_length(frame_str):
+    """
+    :param frame_str: header as str created by Header.get_frame_str
+    :return: length of the header in bytes
+    """
+    return len(frame_str.encode(variables.ENCODING, 'surrogateescape'))
+
+
+def create_header_obj_from_binary(received_from, data):
+    """
+    creates a header object of appropriate header type from a binary header
+    :param received_from: address of last node which has forwarded the message
+    :param data: binary header as bytes
+    :return: header object
+    :raises ValueError if the binary header is invalid or uses an unsupported version
+    """
+    reader = BinaryReader(data)
+    version = reader.read_byte() & 0x0F
+    if version != BINARY_HEADER_VERSION:
+        raise ValueError(f'unsupported binary header version: {version}')
+    flag_and_ttl = reader.read_byte()
+    flag = flag_and_ttl >> 4
+    header_class = HEADER_CLASSES.get(flag)
+    if header_class is None:
+        raise ValueError(f"flag {flag} is not a valid flag")
+    header_obj = header_class.decode_fields(received_from, reader.read_address(), flag_and_ttl & 0x0F, reader)
+    if reader.has_remaining_data():
+        raise ValueError('binary header has an unexpected length')
+    return header_obj
+
 
 def __create_message_header_obj(received_from, header_str):
     """
@@ -51,6 +242,9 @@ def create_header_obj_from_raw_message(raw_message):
 
         header_str = raw_message_as_list[3]
         # header_str = header_str.strip()
+        if is_binary_header(header_str[:1].encode(variables.ENCODING, 'surrogateescape')):
+            return create_header_obj_from_binary(received_from, header_str.encode(variables.ENCODING,
+                                                                                  'surrogateescape'))
 
         header_as_list = header_str.split(variables.HEADER_DELIMITER)
         # remove first and last element, because they are empty strings (delimiter without values)
@@ -68,14 +262,15 @@ def create_header_obj_from_raw_message(raw_message):
         check_int_field(ttl)
         ttl = int(ttl)
 
-        if flag == MessageHeader.HEADER_TYPE or flag == MessageAcknowledgeHeader.HEADER_TYPE:
+        if flag == MessageHeader.HEADER_TYPE or flag == MessageAcknowledgeHeader.HEADER_TYPE or \
+                flag == CumulativeAcknowledgeHeader.HEADER_TYPE:
             destination = header_as_list[3]
-            if destination not in variables.AVAILABLE_NODES:
-                raise ValueError(
-                    "unknown destination: {destination} \n available destinations are {available_destinations}".format(
-                        destination=destination, available_destinations=str(variables.AVAILABLE_NODES)))
+            check_destination_field(destination)
             if flag == MessageAcknowledgeHeader.HEADER_TYPE:
                 return MessageAcknowledgeHeader(received_from, source, ttl, destination, header_as_list[4])
+            elif flag == CumulativeAcknowledgeHeader.HEADER_TYPE:
+                return CumulativeAcknowledgeHeader(received_from, source, ttl, destination, header_as_list[4],
+                                                   int(header_as_list[5], 16))
             else:
                 return __create_message_header_obj(received_from, header_str)
         elif flag == RouteRequestHeader.HEADER_TYPE or flag == RouteReplyHeader.HEADER_TYPE:
@@ -116,8 +311,9 @@ def create_header_obj_from_raw_message(raw_message):
             check_addr_field(end_node, 'end_node')
             next_node = header_as_list[4]
             check_addr_field(next_node, 'end_node')
+            payload_encoding = header_as_list[8] if len(header_as_list) > 8 else None
             return ConnectRequestHeader(received_from, source, ttl, end_node, next_node, header_as_list[5],
-                                        header_as_list[6], header_as_list[7])
+                                        header_as_list[6], header_as_list[7], payload_encoding)
         elif flag == DisconnectRequestHeader.HEADER_TYPE:
             end_node = header_as_list[3]
             check_addr_field(end_node, 'end_node')
@@ -156,6 +352,18 @@ def check_addr_field(addr_str, field_name=''):
                                                                                       addr_str=addr_str))
 
 
+def check_destination_field(destination):
+    """
+    helper function which checks whether the destination of a message or acknowledgement is a known node
+    :param destination: address of destination node
+    :raises ValueError if the destination is not in variables.AVAILABLE_NODES
+    """
+    if destination not in variables.AVAILABLE_NODES:
+        raise ValueError(
+            "unknown destination: {destination} \n available destinations are {available_destinations}".format(
+                destination=destination, available_destinations=str(variables.AVAILABLE_NODES)))
+
+
 def get_received_from_value(raw_message):
     """
     extracts address of last node which has forwarded received message from raw message
@@ -208,6 +416,13 @@ class RouteRequestHeader(Header):
         """
         return create_header_str(self.source, str(self.flag), str(self.ttl), str(self.hops), self.end_node)
 
+    def encode_fields(self):
+        return encode_varint(self.hops) + encode_address(self.end_node)
+
+    @classmethod
+    def decode_fields(cls, received_from, source, ttl, reader):
+        return cls(received_from, source, ttl, reader.read_varint(), reader.read_address())
+
 
 class RouteReplyHeader(Header):
     LENGTH = 15
@@ -235,6 +450,13 @@ class RouteReplyHeader(Header):
         return create_header_str(self.source, str(self.flag), str(self.ttl), str(self.hops), self.end_node,
                                  self.next_node)
 
+    def encode_fields(self):
+        return encode_varint(self.hops) + encode_address(self.end_node) + encode_address(self.next_node)
+
+    @classmethod
+    def decode_fields(cls, received_from, source, ttl, reader):
+        return cls(received_from, source, ttl, reader.read_varint(), reader.read_address(), reader.read_address())
+
 
 class MessageHeader(Header):
     LENGTH = 14
@@ -255,6 +477,30 @@ class MessageHeader(Header):
         return create_header_str(self.source, str(self.flag), str(self.ttl), self.destination, self.next_node,
                                  f'{self.message_id:06d}', self.payload)
 
+    def decode_payload(self):
+        """
+        decodes the payload, which can be encoded with every payload encoding (see payload_encoding)
+        :return: object of class fragmentation.Fragment if the payload contains a fragment, else the message as bytes
+        :raises ValueError if the payload can not be decoded
+        """
+        return fragmentation.decode_payload(self.payload)
+
+    def encode_fields(self):
+        # the payload is the rest of the frame, so it needs no length field
+        return encode_address(self.destination) + encode_address(self.next_node) + encode_varint(self.message_id) + \
+            self.payload.encode(variables.ENCODING)
+
+    @classmethod
+    def decode_fields(cls, received_from, source, ttl, reader):
+        destination = reader.read_address()
+        check_destination_field(destination)
+        next_node = reader.read_address()
+        message_id = reader.read_varint()
+        payload = reader.read_remaining_str()
+        if len(payload) == 0:
+            raise ValueError('payload missing')
+        return cls(received_from, source, ttl, destination, next_node, message_id, payload)
+
 
 class RouteErrorHeader(Header):
     HEADER_TYPE = 5
@@ -270,6 +516,13 @@ class RouteErrorHeader(Header):
         """
         return create_header_str(self.source, str(self.flag), str(self.ttl), self.broken_node)
 
+    def encode_fields(self):
+        return encode_address(self.broken_node)
+
+    @classmethod
+    def decode_fields(cls, received_from, source, ttl, reader):
+        return cls(received_from, source, ttl, reader.read_address())
+
 
 class MessageAcknowledgeHeader(Header):
     HEADER_TYPE = 2
@@ -289,6 +542,58 @@ class MessageAcknowledgeHeader(Header):
         """
         return create_header_str(str(self.source), str(self.flag), str(self.ttl), self.destination, self.message_id)
 
+    def encode_fields(self):
+        return encode_address(self.destination) + encode_varint(self.message_id)
+
+    @classmethod
+    def decode_fields(cls, received_from, source, ttl, reader):
+        destination = reader.read_address()
+        check_destination_field(destination)
+        return cls(received_from, source, ttl, destination, reader.read_varint())
+
+
+class CumulativeAcknowledgeHeader(Header):
+    HEADER_TYPE = 9
+
+    def __init__(self, received_from, source, ttl, destination, message_id, bitmap=0):
+        """
+        acknowledges all messages up to message_id and the messages marked in the bitmap; bit i of the bitmap stands for
+        message id message_id + 1 + i
+        :param message_id: highest message id up to which all messages were received
+        :param bitmap: int containing one bit for every received message following message_id
+        """
+        super().__init__(received_from, source, self.HEADER_TYPE, ttl)
+        self.destination = destination
+        self.message_id = int(message_id)
+        self.bitmap = bitmap
+
+    def is_acknowledged(self, message_id):
+        """
+        :param message_id: message id as int
+        :return: True if the message with the passed id was acknowledged by this header, else False
+        """
+        message_id = int(message_id)
+        if message_id <= self.message_id:
+            return True
+        return bool(self.bitmap >> (message_id - self.message_id - 1) & 1)
+
+    def get_header_str(self):
+        """
+        create header message from header object which can be sent over LoRa network
+        :return: header object as string (format like defined in routing protocol)
+        """
+        return create_header_str(str(self.source), str(self.flag), str(self.ttl), self.destination, self.message_id,
+                                 f'{self.bitmap:x}')
+
+    def encode_fields(self):
+        return encode_address(self.destination) + encode_varint(self.message_id) + encode_varint(self.bitmap)
+
+    @classmethod
+    def decode_fields(cls, received_from, source, ttl, reader):
+        destination = reader.read_address()
+        check_destination_field(destination)
+        return cls(received_from, source, ttl, destination, reader.read_varint(), reader.read_varint())
+
 
 class RegistrationHeader(Header):
     HEADER_TYPE = 6
@@ -311,17 +616,37 @@ class RegistrationHeader(Header):
             subscribe_str = 'false'
         return create_header_str(str(self.source), str(self.flag), str(self.ttl), subscribe_str, self.peer_id)
 
+    def encode_fields(self):
+        return bytes([1 if self.subscribe else 0]) + self.peer_id.encode(variables.ENCODING)
+
+    @classmethod
+    def decode_fields(cls, received_from, source, ttl, reader):
+        subscribe = reader.read_byte()
+        if subscribe > 1:
+            raise ValueError(f'invalid value for subscribe parameter: {subscribe}')
+        peer_id = reader.read_remaining_str()
+        if len(peer_id) == 0:
+            raise ValueError('peer id missing')
+        return cls(received_from, source, ttl, subscribe == 1, peer_id)
+
 
 class ConnectRequestHeader(Header):
     HEADER_TYPE = 7
 
-    def __init__(self, received_from, source, ttl, end_node, next_node, source_peer_id, target_peer_id, timeout):
+    def __init__(self, received_from, source, ttl, end_node, next_node, source_peer_id, target_peer_id, timeout,
+                 payload_encoding=None):
+        """
+        constructor of ConnectRequestHeader class
+        :param payload_encoding: name of the encoding the source wants to receive messages with (see
+        payload_encoding); None for base64, the field is omitted in this case
+        """
         super().__init__(received_from, source, self.HEADER_TYPE, ttl)
         self.end_node = end_node
         self.next_node = next_node
         self.source_peer_id = source_peer_id
         self.target_peer_id = target_peer_id
         self.timeout = timeout
+        self.payload_encoding = payload_encoding
 
     def __str__(self):
         """
@@ -336,8 +661,29 @@ class ConnectRequestHeader(Header):
         create header message from header object which can be sent over LoRa network
         :return: header object as string (format like defined in routing protocol)
         """
+        if self.payload_encoding is None:
+            return create_header_str(self.source, str(self.flag), str(self.ttl), self.end_node, self.next_node,
+                                     self.source_peer_id, self.target_peer_id, self.timeout)
         return create_header_str(self.source, str(self.flag), str(self.ttl), self.end_node, self.next_node,
-                                 self.source_peer_id, self.target_peer_id, self.timeout)
+                                 self.source_peer_id, self.target_peer_id, self.timeout, self.payload_encoding)
+
+    def encode_fields(self):
+        fields = encode_address(self.end_node) + encode_address(self.next_node) + encode_str(self.source_peer_id) + \
+            encode_str(self.target_peer_id) + encode_str(self.timeout)
+        if self.payload_encoding is None:
+            return fields
+        return fields + encode_str(self.payload_encoding)
+
+    @classmethod
+    def decode_fields(cls, received_from, source, ttl, reader):
+        end_node = reader.read_address()
+        next_node = reader.read_address()
+        source_peer_id = reader.read_str()
+        target_peer_id = reader.read_str()
+        timeout = reader.read_str()
+        payload_encoding = reader.read_str() if reader.has_remaining_data() else None
+        return cls(received_from, source, ttl, end_node, next_node, source_peer_id, target_peer_id, timeout,
+                   payload_encoding)
 
 
 class DisconnectRequestHeader(Header):
@@ -366,6 +712,15 @@ class DisconnectRequestHeader(Header):
         return create_header_str(self.source, str(self.flag), str(self.ttl), self.end_node, self.next_node,
                                  self.source_peer_id, self.target_peer_id)
 
+    def encode_fields(self):
+        return encode_address(self.end_node) + encode_address(self.next_node) + encode_str(self.source_peer_id) + \
+            encode_str(self.target_peer_id)
+
+    @classmethod
+    def decode_fields(cls, received_from, source, ttl, reader):
+        return cls(received_from, source, ttl, reader.read_address(), reader.read_address(), reader.read_str(),
+                   reader.read_str())
+
 
 def create_header_str(*args):
     """
@@ -377,3 +732,8 @@ def create_header_str(*args):
     for arg in args:
         header_str = header_str + str(arg) + '|'
     return header_str
+
+
+HEADER_CLASSES = {header_class.HEADER_TYPE: header_class for header_class in
+                  (MessageHeader, MessageAcknowledgeHeader, RouteRequestHeader, RouteReplyHeader, RouteErrorHeader,
+                   RegistrationHeader, ConnectRequestHeader, DisconnectRequestHeader, CumulativeAcknowledgeHeader)}
@@ -1,21 +1,40 @@
 import logging
 import socket
 import threading
+import time
 
-from lora_multihop import protocol, variables, module_config
+from lora_multihop import protocol, variables, module_config, coalescing
 
 
 class IPC:
 
-    def __init__(self, ipc_port, message_port, module_address=None):
+    def __init__(self, ipc_port, message_port, module_address=None, driver=None, module_setup=None):
+        """
+        constructor of IPC class
+        :param ipc_port: port of TCP socket for administration
+        :param message_port: port of TCP socket for data exchange
+        :param module_address: address of the LoRa module; if None the address is read from the LoRa module
+        :param driver: object of class serial_connection.ModemDriver; if None the default driver is used. To use
+        several LoRa modules in one process, create one IPC object per driver.
+        :param module_setup: function which prepares the LoRa module and returns its address (e.g. a call of
+        module_config.fast_config_module); it runs in a background thread, so the TCP sockets can be started while the
+        LoRa module is prepared. Received commands are processed as soon as the address is known.
+        """
         self.listen_for_data = True
-        if module_address is None:
-            variables.MY_ADDRESS = module_config.get_current_address()
-            logging.info('loaded address of module: {}'.format(variables.MY_ADDRESS))
+        self.driver = driver
+        self.start_time = time.monotonic()
+        self.time_to_ready = None
+        self.ready = threading.Event()
+        self.protocol = protocol.Protocol(driver=driver, address=module_address)
+        self.module_setup_thread = None
+        if module_setup is not None:
+            self.module_setup_thread = threading.Thread(target=self.run_module_setup, args=(module_setup,))
+            self.module_setup_thread.start()
         else:
-            variables.MY_ADDRESS = module_address
-        self.protocol = protocol.Protocol()
-        self.protocol.start_protocol_thread()
+            if module_address is None:
+                module_address = module_config.get_current_address(driver)
+                logging.info('loaded address of module: {}'.format(module_address))
+            self.set_module_address(module_address)
         self.connection = None
         self.ipc_port = ipc_port
         self.message_port = message_port
@@ -23,6 +42,31 @@ class IPC:
 
         self.message_transfer_thread = None
         self.ipc_tcp_server_thread = None
+        # coalescing of small writes on the data socket; can be switched off by the application ('NoDelay,true')
+        self.no_delay = variables.COALESCING_NO_DELAY
+        self.coalescer = None
+
+    def run_module_setup(self, module_setup):
+        """
+        runs function which prepares the LoRa module and sets the returned address
+        :param module_setup: function returning the address of the LoRa module
+        """
+        module_address = module_setup()
+        logging.info('loaded address of module: {}'.format(module_address))
+        self.set_module_address(module_address)
+
+    def set_module_address(self, module_address):
+        """
+        sets address of the LoRa module, starts processing of received messages and marks this object as ready
+        :param module_address: address as str
+        """
+        if self.driver is None:
+            variables.MY_ADDRESS = module_address
+        self.protocol.address = module_address
+        self.protocol.start_protocol_thread()
+        self.time_to_ready = time.monotonic() - self.start_time
+        logging.info(f'node ready after {self.time_to_ready:.3f}s')
+        self.ready.set()
 
     def start_tcp_server_for_message_transfer(self):
         """
@@ -35,23 +79,40 @@ class IPC:
         conn, addr = s.accept()
         print('client for message transfer connected')
         conn.setblocking(False)
+        self.ready.wait()
+        self.coalescer = coalescing.Coalescer(self.protocol.get_max_message_size(), no_delay=self.no_delay)
 
         while self.listen_for_data:
             try:
-                data = conn.recv(220)
+                data = conn.recv(variables.MESSAGE_READ_SIZE)
                 logging.debug(f'data: {data}')
                 if len(data) > 0:
-                    self.protocol.send_message(data)
+                    self.send_data(self.coalescer.add(data))
                 if not data:
+                    self.send_data(self.coalescer.flush())
                     conn.close()
                     print('closed message socket')
                     break
             except socket.error:
                 pass
+            if self.coalescer.no_delay != self.no_delay:
+                self.send_data(self.coalescer.set_no_delay(self.no_delay))
+            self.send_data(self.coalescer.poll())
             if not self.protocol.received_messages_queue.empty():
                 message = self.protocol.received_messages_queue.get()
                 logging.debug(f'send message via rpc to java side: {message}')
                 conn.send(message)
+        if self.protocol.PROCESS_INCOMING_MESSAGES:
+            # data buffered when the loop was left would be lost
+            self.send_data(self.coalescer.flush())
+
+    def send_data(self, data):
+        """
+        sends data released by the coalescer over the LoRa network
+        :param data: data as bytes or None if there is nothing to send
+        """
+        if data is not None:
+            self.protocol.send_message(data)
 
     def start_tcp_server(self):
         """
@@ -77,15 +138,14 @@ class IPC:
                                 conn.close()
                                 print('closed')
                                 break
+                            self.ready.wait()
                             received_data_as_list = data.decode().split(variables.HEADER_DELIMITER)
                             for message in received_data_as_list:
                                 if message == 'registeredPeers?':
                                     registered_peers = self.protocol.routing_table.get_peers()
-                                    message = 'RegisteredPeers'
-                                    for i in range(0, len(registered_peers)):
-                                        message = message + ',' + registered_peers[i]['peer_id']
                                     logging.debug(f'send registered peer to java: {registered_peers}')
-                                    conn.send((message + '|').encode(variables.ENCODING))
+                                    conn.send(create_registered_peers_message(registered_peers).encode(
+                                        variables.ENCODING))
                                 elif len(message) != 0:
                                     logging.debug(f'request from java side: {message}')
                                     message_values = message.split(variables.JAVA_IPC_MESSAGE_VALUES_DELIMITER)
@@ -103,6 +163,9 @@ class IPC:
                                     elif message_type == 'DisconnectRequest':
                                         self.protocol.send_disconnect_request_header(message_values[1],
                                                                                      message_values[2])
+                                    elif message_type == 'NoDelay':
+                                        # applied by the thread for message transfer
+                                        self.no_delay = message_values[1].lower() == 'true'
                         except socket.timeout:
                             while not self.protocol.sending_queue.empty():
                                 payload = self.protocol.sending_queue.get()
@@ -140,6 +203,18 @@ class IPC:
         self.protocol.stop()
 
 
+def create_registered_peers_message(registered_peers):
+    """
+    creates answer on 'registeredPeers?' request
+    :param registered_peers: list of registered peers (see RoutingTable.get_peers)
+    :return: message as string terminated by variables.HEADER_DELIMITER
+    """
+    message = 'RegisteredPeers'
+    for peer in registered_peers:
+        message = message + ',' + peer['peer_id']
+    return message + variables.HEADER_DELIMITER
+
+
 def create_connect_request_message(source_peer_id, target_peer_id, timeout):
     """
     creates a connect request message
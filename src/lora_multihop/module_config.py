@@ -1,32 +1,138 @@
 import logging
+import time
 
 from lora_multihop import serial_connection, variables
 
 
-def config_module(configuration=variables.MODULE_CONFIG):
-    if serial_connection.execute_command(configuration, [variables.STATUS_OK]):
-        serial_connection.execute_command('AT+SEND=1', [variables.STATUS_OK])
-        serial_connection.execute_command('a', ['AT,SENDING', 'AT,SENDED'])
+def config_module(configuration=variables.MODULE_CONFIG, driver=None):
+    """
+    sets configuration of LoRa module
+    :param configuration: AT+CFG command
+    :param driver: object of class serial_connection.ModemDriver; if None the default driver is used
+    :return: True if configuration was set successfully, else False
+    """
+    driver = get_driver(driver)
+    if driver.execute_command(configuration, [variables.STATUS_OK]):
+        driver.set_lora_configuration(configuration)
+        driver.execute_command('AT+SEND=1', [variables.STATUS_OK])
+        driver.execute_command('a', ['AT,SENDING', 'AT,SENDED'])
         logging.debug('module config successfully set')
         return True
     logging.warning("could not set module config")
     return False
 
 
-def set_address(address):
+def set_address(address, driver=None):
+    """
+    sets address of LoRa module
+    :param address: address as str (e.g. '0137')
+    :param driver: object of class serial_connection.ModemDriver; if None the default driver is used
+    :return: True if address was set successfully, else False
+    """
     cmd = f'AT+ADDR={address}'
-    if serial_connection.execute_command(serial_connection.str_to_bytes(cmd), [variables.STATUS_OK]):
+    if get_driver(driver).execute_command(serial_connection.str_to_bytes(cmd), [variables.STATUS_OK]):
         logging.debug(f'module address successfully set to: {address}')
         return True
     logging.warning("could not set module address")
     return False
 
 
-def get_current_address():
-    serial_connection.execute_command(serial_connection.str_to_bytes(variables.GET_ADDR))
-    addr = serial_connection.response_q.get(variables.COMMAND_VERIFICATION_TIMEOUT)
-    addr = serial_connection.bytes_to_str(addr)
-    addr_as_list = addr.split(variables.LORA_MODULE_DELIMITER)
-    if addr_as_list[0].strip() != 'AT' or addr_as_list[2].strip() != 'OK':
+def get_current_address(driver=None):
+    """
+    reads address of LoRa module
+    :param driver: object of class serial_connection.ModemDriver; if None the default driver is used
+    :return: address as str
+    """
+    answer = get_driver(driver).query(variables.GET_ADDR)
+    if answer is None:
+        raise ValueError('could not get address of module')
+    return parse_address_answer(answer)
+
+
+def get_current_config(driver=None):
+    """
+    reads configuration of LoRa module
+    :param driver: object of class serial_connection.ModemDriver; if None the default driver is used
+    :return: configuration as AT+CFG command or None if the configuration could not be read
+    """
+    answer = get_driver(driver).query(variables.GET_CONFIG)
+    if answer is None:
+        return None
+    values = answer.split(variables.LORA_MODULE_DELIMITER)
+    if len(values) < 3 or values[0].strip() != 'AT' or values[-1].strip() != 'OK':
+        logging.debug(f"unexpected answer on '{variables.GET_CONFIG}': {answer}")
+        return None
+    return 'AT+CFG=' + variables.LORA_MODULE_DELIMITER.join(value.strip() for value in values[1:-1])
+
+
+def fast_config_module(configuration=variables.MODULE_CONFIG, address=None, save=False, driver=None):
+    """
+    configures LoRa module without redundant commands: configuration and address are read from the LoRa module first
+    and only written if they differ from the passed values
+    :param configuration: AT+CFG command
+    :param address: address as str; if None the address of the LoRa module is kept
+    :param save: if True the settings are persisted with AT+SAVE if something was written
+    :param driver: object of class serial_connection.ModemDriver; if None the default driver is used
+    :return: dict containing the address of the LoRa module ('address'), which settings were written
+    ('configuration_written', 'address_written', 'saved') and the time needed in seconds ('time_to_ready')
+    """
+    start_time = time.monotonic()
+    driver = get_driver(driver)
+    report = {'configuration_written': False, 'address_written': False, 'saved': False}
+    if is_same_config(get_current_config(driver), configuration):
+        driver.set_lora_configuration(configuration)
+    else:
+        if not config_module(configuration, driver):
+            raise ValueError('could not set module config')
+        report['configuration_written'] = True
+    current_address = get_current_address(driver)
+    if address is not None and current_address != address:
+        if not set_address(address, driver):
+            raise ValueError('could not set module address')
+        current_address = address
+        report['address_written'] = True
+    if save and (report['configuration_written'] or report['address_written']):
+        report['saved'] = driver.execute_command(variables.SAVE_COMMAND, [variables.STATUS_OK])
+    report['address'] = current_address
+    report['time_to_ready'] = time.monotonic() - start_time
+    logging.info(f'LoRa module ready after {report["time_to_ready"]:.3f}s: {report}')
+    return report
+
+
+def is_same_config(first_configuration, second_configuration):
+    """
+    compares two AT+CFG commands value by value
+    :param first_configuration: AT+CFG command or None
+    :param second_configuration: AT+CFG command or None
+    :return: True if both commands contain the same values, else False
+    """
+    if first_configuration is None or second_configuration is None:
+        return False
+
+    def get_values(configuration):
+        return [value.strip() for value in configuration.split('=', 1)[-1].split(variables.LORA_MODULE_DELIMITER)]
+
+    return get_values(first_configuration) == get_values(second_configuration)
+
+
+def parse_address_answer(answer):
+    """
+    parses answer of LoRa module on variables.GET_ADDR command
+    :param answer: answer as str (e.g. 'AT,0137,OK')
+    :return: address as str
+    """
+    addr_as_list = answer.split(variables.LORA_MODULE_DELIMITER)
+    if len(addr_as_list) < 3 or addr_as_list[0].strip() != 'AT' or addr_as_list[2].strip() != 'OK':
         raise ValueError('could not get address of module')
     return addr_as_list[1]
+
+
+def get_driver(driver):
+    """
+    helper function which returns the default driver if no driver was passed
+    :param driver: object of class serial_connection.ModemDriver or None
+    :return: object of class serial_connection.ModemDriver
+    """
+    if driver is None:
+        return serial_connection.default_driver
+    return driver
@@ -0,0 +1,142 @@
+import base64
+import re
+
+from lora_multihop import variables
+
+__author__ = "Marvin Rausch"
+
+BASE64 = 'base64'
+ASCII85 = 'ascii85'
+ESCAPE = 'escape'
+
+# bytes which must not appear in an escaped payload: line terminators and the header delimiter
+RESERVED_BYTES = b'\r\n' + variables.HEADER_DELIMITER.encode(variables.ENCODING)
+ESCAPE_BYTE = 0x1B
+# an escaped byte is sent as ESCAPE_BYTE followed by the byte xor ESCAPE_MASK (e.g. '|' -> ESC '<')
+ESCAPE_MASK = 0x40
+ESCAPE_TABLE = {byte: chr(ESCAPE_BYTE) + chr(byte ^ ESCAPE_MASK) for byte in RESERVED_BYTES + bytes([ESCAPE_BYTE])}
+# number of bytes on the air for every byte value sent with the escape encoding
+ESCAPED_LENGTHS = bytes(2 if byte in ESCAPE_TABLE or byte >= 0x80 else 1 for byte in range(256))
+
+
+class Base64Encoding:
+    """
+    encoding of all nodes without negotiated encoding; 4 characters for 3 bytes
+    """
+    NAME = BASE64
+    PREFIX = ''
+
+    def encode(self, data):
+        """
+        :param data: data as bytes
+        :return: encoded data as str
+        """
+        return base64.b64encode(data).decode(variables.ENCODING)
+
+    def decode(self, encoded_data):
+        """
+        :param encoded_data: encoded data as str
+        :return: data as bytes
+        """
+        return base64.b64decode(encoded_data, validate=True)
+
+    def get_max_data_length(self, data, max_encoded_length):
+        """
+        :param data: data as bytes
+        :param max_encoded_length: max length of the encoded data in bytes
+        :return: number of leading bytes of data whose encoding fits into max_encoded_length
+        """
+        return min(len(data), max(max_encoded_length, 0) // 4 * 3)
+
+
+class Ascii85Encoding:
+    """
+    ascii85 encoding; 5 characters for 4 bytes, the alphabet ('!' - 'u' and 'z') contains no reserved character
+    """
+    NAME = ASCII85
+    PREFIX = '~'
+
+    def encode(self, data):
+        return base64.a85encode(data).decode(variables.ENCODING)
+
+    def decode(self, encoded_data):
+        return base64.a85decode(encoded_data)
+
+    def get_max_data_length(self, data, max_encoded_length):
+        max_encoded_length = max(max_encoded_length, 0)
+        # a last group of n < 4 bytes is encoded with n + 1 characters
+        return min(len(data), max_encoded_length // 5 * 4 + max(max_encoded_length % 5 - 1, 0))
+
+
+class EscapeEncoding:
+    """
+    passes every byte except the reserved bytes and the escape byte, which are escaped with two bytes; bytes >= 0x80
+    are sent as UTF-8 encoded characters (two bytes), because the LoRa modem driver drops frames which are not valid
+    UTF-8; text payloads are sent nearly without overhead
+    """
+    NAME = ESCAPE
+    PREFIX = '!'
+    ESCAPE_SEQUENCE_PATTERN = re.compile(chr(ESCAPE_BYTE) + '(.?)', re.DOTALL)
+
+    def encode(self, data):
+        return data.decode('latin-1').translate(ESCAPE_TABLE)
+
+    def decode(self, encoded_data):
+        return self.ESCAPE_SEQUENCE_PATTERN.sub(self._unescape, encoded_data).encode('latin-1')
+
+    def get_max_data_length(self, data, max_encoded_length):
+        encoded_length = 0
+        for length, byte in enumerate(data):
+            encoded_length += ESCAPED_LENGTHS[byte]
+            if encoded_length > max_encoded_length:
+                return length
+        return len(data)
+
+    def _unescape(self, match):
+        """
+        :param match: escape sequence matched by ESCAPE_SEQUENCE_PATTERN
+        :return: escaped byte as str
+        :raises ValueError if the escape sequence is invalid
+        """
+        escaped_character = match.group(1)
+        if len(escaped_character) == 0 or ord(escaped_character) ^ ESCAPE_MASK not in ESCAPE_TABLE:
+            raise ValueError(f'invalid escape sequence: {match.group(0)!r}')
+        return chr(ord(escaped_character) ^ ESCAPE_MASK)
+
+
+ENCODINGS = {encoding.NAME: encoding for encoding in (Base64Encoding(), Ascii85Encoding(), EscapeEncoding())}
+
+
+def get_encoding(name):
+    """
+    :param name: name of an encoding (BASE64, ASCII85 or ESCAPE)
+    :return: encoding object
+    :raises ValueError if the encoding is unknown
+    """
+    if name not in ENCODINGS:
+        raise ValueError(f'unknown payload encoding: {name}')
+    return ENCODINGS[name]
+
+
+def encode(data, encoding=ENCODINGS[BASE64]):
+    """
+    encodes data, so they can be sent in the payload of a message header
+    :param data: data as bytes
+    :param encoding: encoding object
+    :return: encoded data with prefix of the encoding as str
+    """
+    return encoding.PREFIX + encoding.encode(data)
+
+
+def decode(payload):
+    """
+    decodes data encoded by any of the encodings; the encoding is recognized by the first character, which is never
+    part of the base64 alphabet
+    :param payload: encoded data as str
+    :return: data as bytes
+    :raises ValueError if the payload can not be decoded
+    """
+    for encoding in ENCODINGS.values():
+        if len(encoding.PREFIX) > 0 and payload.startswith(encoding.PREFIX):
+            return encoding.decode(payload[len(encoding.PREFIX):])
+    return ENCODINGS[BASE64].decode(payload)
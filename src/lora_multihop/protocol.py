@@ -1,15 +1,17 @@
-import base64
+import concurrent.futures
 import logging
 import random
 import signal
 import threading
 import time
 import traceback
-from queue import Queue
+from queue import Queue, Empty
 from contextlib import contextmanager
 
-from lora_multihop import ipc, serial_connection, header, variables
+from lora_multihop import ipc, serial_connection, header, variables, fragmentation, compression, \
+    payload_encoding, waiters, transmit_scheduler
 from lora_multihop.header import RegistrationHeader, ConnectRequestHeader, DisconnectRequestHeader
+from lora_multihop.reliable_delivery import WindowedSender, ReorderBuffer, AckAggregator, RttEstimator, start_timer
 from lora_multihop.routing_table import RoutingTable
 
 __author__ = "Marvin Rausch"
@@ -19,125 +21,366 @@ class Protocol:
     PROCESS_INCOMING_MESSAGES = True
     VERIFICATION_TIMEOUT = 25
     PAUSE_PROCESSING_INCOMING_MESSAGES = False
-    MESSAGES_ACKNOWLEDGMENT = []
+    ROUTE_REPLY_TIMEOUT = 5
+    REGISTRATION_TIMEOUT = 2.5
 
-    def __init__(self):
+    def __init__(self, driver=None, address=None):
+        """
+        constructor of Protocol class
+        :param driver: object of class serial_connection.ModemDriver which is used to communicate with the LoRa module;
+        if None the default driver is used
+        :param address: address of the LoRa module; if None variables.MY_ADDRESS is used
+        """
         logging.info('created protocol obj: {}'.format(str(self)))
+        if driver is None:
+            driver = serial_connection.default_driver
+        self.driver = driver
+        self.address = address
         self.routing_table = RoutingTable()
         self.received_messages_queue = Queue()
         self.sending_messages_queue = Queue()
         self.sending_queue = Queue()
 
         self.connected_node = None
-        self.message_counter = 0
+        self.message_counters = {}
+        # senders for variables.SEND_WINDOW_SIZE > 1 and receive buffers, both stored per node
+        self.senders = {}
+        self.receive_buffers = {}
+        self.ack_aggregators = {}
+        self.reassemblers = {}
+        # round-trip time estimators per destination, which provide the ack timeouts
+        self.rtt_estimators = {}
+        self.fragmenter = fragmentation.Fragmenter()
+        dictionary = None
+        if variables.COMPRESSION_DICTIONARY_FILE is not None:
+            dictionary = compression.load_dictionary(variables.COMPRESSION_DICTIONARY_FILE)
+        self.compressor = compression.Compressor(dictionary=dictionary)
+        # payload encoding per node, negotiated by connect requests; nodes without entry receive base64
+        self.payload_encodings = {}
+        # pending acknowledgements are stored per object, so one process can drive several LoRa modules
+        self.messages_acknowledgment = []
         self.received_own_registration_message = False
+        # handlers of received headers wake up threads waiting for acknowledgements, route replies and registrations
+        self.waiters = waiters.WaiterRegistry()
+        # sends frames ordered by priority, so processing received frames does not wait for the LoRa module
+        self.transmit_scheduler = transmit_scheduler.TransmitScheduler(self.transmit_header,
+                                                                       name=f'transmit-{self.my_address}')
+
+    @property
+    def my_address(self):
+        """
+        :return: address of the LoRa module used by this protocol object
+        """
+        if self.address is None:
+            return variables.MY_ADDRESS
+        return self.address
 
     def start_protocol_thread(self):
         """
-        starts new thread which processes incoming messages in background
+        starts new thread which processes incoming messages in background and the thread of the transmit scheduler
         """
+        self.transmit_scheduler.start()
         receiving_thread = threading.Thread(target=self.process_incoming_message)
         receiving_thread.start()
 
     def send_header(self, header_str):
         """
-        sends a string to LoRa network
+        sends a string originated by this node to LoRa network and waits until it was sent; if the transmit scheduler is
+        running, it is sent after all queued frames of higher priority
         @param header_str: message to send
+        @return: True if the LoRa module has confirmed sending the header, else False
+        """
+        if self.transmit_scheduler.is_running():
+            return self.transmit_scheduler.submit(header_str, transmit_scheduler.LOCAL).result()
+        return self.transmit_header(header_str)
+
+    def queue_header(self, header_str, priority):
+        """
+        sends a string to LoRa network without waiting for the LoRa module; used by the handlers of received frames
+        @param header_str: message to send
+        @param priority: priority class of the message (e.g. transmit_scheduler.REPLY)
+        """
+        if self.transmit_scheduler.is_running():
+            self.transmit_scheduler.submit(header_str, priority)
+        else:
+            self.send_header(header_str)
+
+    def transmit_header(self, header_str):
+        """
+        sends a string to LoRa network after a random time; blocks until the LoRa module has sent it
+        @param header_str: message to send
+        @return: True if the LoRa module has confirmed sending the header, else False
         """
         wait_random_time()
-        serial_connection.writing_q.put(('AT+SEND={}'.format(str(len(header_str))), ['AT,OK']))
-        if serial_connection.status_q.get(timeout=self.VERIFICATION_TIMEOUT):
-            serial_connection.writing_q.put((header_str, ['AT,SENDING', 'AT,SENDED']))
-            if serial_connection.status_q.get(timeout=self.VERIFICATION_TIMEOUT):
+        try:
+            if self.driver.send_frame(header_str).result(timeout=2 * self.VERIFICATION_TIMEOUT):
                 logging.debug("sent header '{}'.".format(header_str))
-                return
+                return True
+        except concurrent.futures.TimeoutError:
+            pass
         logging.debug("could not send header '{}', because got invalid status from lora module".format(header_str))
+        return False
+
+    def get_transmit_statistics(self):
+        """
+        :return: number of queued and sent frames and waiting times per priority class of the transmit scheduler as dict
+        """
+        return self.transmit_scheduler.get_statistics()
 
     def process_incoming_message(self):
         """
-        get messages from LoRa module, create header object and call appropriate method to process the received message
+        get messages from LoRa module, create header object and call appropriate method to process the received message;
+        blocks on response_q of the driver instead of polling it
         """
         while self.PROCESS_INCOMING_MESSAGES:
-            if not serial_connection.response_q.empty() and not self.PAUSE_PROCESSING_INCOMING_MESSAGES:
-                raw_message = serial_connection.response_q.get()
-                logging.debug(f'process: {raw_message}')
-                try:
-                    header_obj = header.create_header_obj_from_raw_message(raw_message)
-                    if header_obj.ttl > 1:
-                        self.routing_table.add_neighbor_to_routing_table(header_obj)
-                        if header_obj.flag == header.RouteRequestHeader.HEADER_TYPE:
-                            self.process_route_request(header_obj)
-                        elif header_obj.flag == header.MessageHeader.HEADER_TYPE:
-                            self.process_message_header(header_obj)
-                        elif header_obj.flag == header.RouteReplyHeader.HEADER_TYPE:
-                            self.process_route_reply_header(header_obj)
-                        elif header_obj.flag == header.RouteErrorHeader.HEADER_TYPE:
-                            self.process_route_error_header(header_obj)
-                        elif header_obj.flag == header.MessageAcknowledgeHeader.HEADER_TYPE:
-                            self.process_ack_header(header_obj)
-                        elif header_obj.flag == header.RegistrationHeader.HEADER_TYPE:
-                            self.process_registration_header(header_obj)
-                        elif header_obj.flag == header.ConnectRequestHeader.HEADER_TYPE:
-                            self.process_connect_request_header(header_obj)
-                        elif header_obj.flag == header.DisconnectRequestHeader.HEADER_TYPE:
-                            self.process_disconnect_request_header(header_obj)
-                except ValueError as e:
-                    logging.warning(str(e))
-                    traceback.print_exc()
-                    try:
-                        logging.debug('try to add received signal to unsupported devices list...')
-                        addr = header.get_received_from_value(raw_message)
-                        self.routing_table.add_neighbor_with_unsupported_protocol(addr)
-                    except ValueError as e:
-                        logging.warning(str(e))
+            if self.PAUSE_PROCESSING_INCOMING_MESSAGES:
+                time.sleep(variables.SERIAL_READ_TIMEOUT)
+                continue
+            try:
+                raw_message = self.driver.response_q.get(timeout=variables.SERIAL_READ_TIMEOUT)
+            except Empty:
+                continue
+            self.process_raw_message(raw_message)
+
+    def process_raw_message(self, raw_message):
+        """
+        parses a message received from the LoRa module and calls the handler of its header type
+        :param raw_message: received message as str
+        """
+        logging.debug(f'process: {raw_message}')
+        try:
+            header_obj = header.create_header_obj_from_raw_message(raw_message)
+            if header_obj.ttl > 1:
+                self.routing_table.add_neighbor_to_routing_table(header_obj)
+                # a route request for a neighbor is answered by every frame of the neighbor
+                self.waiters.complete(waiters.ROUTE_REPLY, header_obj.received_from)
+                if header_obj.flag == header.RouteRequestHeader.HEADER_TYPE:
+                    self.process_route_request(header_obj)
+                elif header_obj.flag == header.MessageHeader.HEADER_TYPE:
+                    self.process_message_header(header_obj)
+                elif header_obj.flag == header.RouteReplyHeader.HEADER_TYPE:
+                    self.process_route_reply_header(header_obj)
+                elif header_obj.flag == header.RouteErrorHeader.HEADER_TYPE:
+                    self.process_route_error_header(header_obj)
+                elif header_obj.flag == header.MessageAcknowledgeHeader.HEADER_TYPE or \
+                        header_obj.flag == header.CumulativeAcknowledgeHeader.HEADER_TYPE:
+                    self.process_ack_header(header_obj)
+                elif header_obj.flag == header.RegistrationHeader.HEADER_TYPE:
+                    self.process_registration_header(header_obj)
+                elif header_obj.flag == header.ConnectRequestHeader.HEADER_TYPE:
+                    self.process_connect_request_header(header_obj)
+                elif header_obj.flag == header.DisconnectRequestHeader.HEADER_TYPE:
+                    self.process_disconnect_request_header(header_obj)
+        except ValueError as e:
+            logging.warning(str(e))
+            traceback.print_exc()
+            try:
+                logging.debug('try to add received signal to unsupported devices list...')
+                addr = header.get_received_from_value(raw_message)
+                self.routing_table.add_neighbor_with_unsupported_protocol(addr)
+            except ValueError as e:
+                logging.warning(str(e))
 
     def send_message(self, payload):
         """
-        send message to currently connected peer
+        send message to currently connected peer; if variables.SEND_WINDOW_SIZE is 1 the function blocks until the
+        message was acknowledged, else it only blocks while the window of unacknowledged messages is full; messages
+        which do not fit into one frame are split into fragments
         @param payload: message to send as bytes
         """
         if self.connected_node is not None:
             destination = self.connected_node
-            best_route = self.routing_table.get_best_route_for_destination(destination)
+            best_route = self.find_route(destination)
             if len(best_route) == 0:
-                logging.info('could not find a route to {}. Sending route request...'.format(destination))
-                if self.send_route_request_message(destination):
-                    best_route = self.routing_table.get_best_route_for_destination(destination)
-                else:
-                    logging.info('Got no answer on route requested.'.format(destination))
+                return
+            for encoded_payload in self.encode_payload(payload, destination):
+                if not self.send_message_payload(destination, best_route['next_node'], encoded_payload):
+                    # the datagram can not be reassembled by the receiver, if one fragment is missing
                     return
-            self.message_counter += 1
-            header_obj = header.MessageHeader(None, variables.MY_ADDRESS, variables.DEFAULT_TTL, destination,
-                                              best_route['next_node'], self.message_counter,
-                                              base64.b64encode(payload).decode(variables.ENCODING))
-            attempt = 0
-            self.add_message_to_waiting_acknowledgement_list(header_obj)
-            message_confirmed = False
-            while attempt < 3 and not message_confirmed:
-                logging.debug(f'attempt: {attempt}')
-                self.send_header(header_obj.get_header_str())
-                attempt_count_received_ack = 0
-                while attempt_count_received_ack < 10:
-                    if header_obj.message_id not in self.MESSAGES_ACKNOWLEDGMENT:
-                        message_confirmed = True
-                        break
-                    else:
-                        time.sleep(0.5)
-                        attempt_count_received_ack += 1
-                if message_confirmed:
-                    break
-                else:
-                    attempt += 1
-            if message_confirmed:
-                print('*******************message was acknowledged by receiver*******************')
+
+    def encode_payload(self, payload, destination):
+        """
+        encodes a message as payloads of message headers; the message is compressed if variables.COMPRESSION is True
+        and split into fragments, if it does not fit into one frame of the LoRa module; compressed messages are always
+        sent as fragments, because the flag is part of the fragment header
+        :param payload: message as bytes
+        :param destination: address of destination node
+        :return: list of payloads as str
+        """
+        compressed = False
+        if variables.COMPRESSION:
+            payload, compressed = self.compressor.compress(payload)
+        encoding = self.get_payload_encoding(destination)
+        max_payload_length = self.driver.get_max_frame_length() - self.get_message_header_length(destination)
+        if not compressed and encoding.get_max_data_length(payload, max_payload_length - len(encoding.PREFIX)) == \
+                len(payload):
+            return [payload_encoding.encode(payload, encoding)]
+        max_fragment_length = max_payload_length - len(fragmentation.FRAGMENT_MARKER) - len(encoding.PREFIX)
+        return [fragment.encode(encoding) for fragment in
+                self.fragmenter.fragment(payload, max_fragment_length, compressed, encoding)]
+
+    def get_payload_encoding(self, destination):
+        """
+        :param destination: address of destination node
+        :return: payload encoding object used for messages to the destination (see payload_encoding)
+        """
+        return payload_encoding.ENCODINGS[self.payload_encodings.get(destination, payload_encoding.BASE64)]
+
+    def set_payload_encoding(self, node, encoding_name):
+        """
+        sets the encoding requested by a node for the messages it receives; unknown encodings fall back to base64
+        :param node: address of the node
+        :param encoding_name: name of the encoding or None for base64
+        """
+        if encoding_name not in payload_encoding.ENCODINGS:
+            if encoding_name is not None:
+                logging.debug(f'node {node} requested unknown payload encoding {encoding_name}, use base64')
+            encoding_name = payload_encoding.BASE64
+        logging.debug(f'use payload encoding {encoding_name} for messages to node {node}')
+        self.payload_encodings[node] = encoding_name
+
+    def get_compression_statistics(self):
+        """
+        :return: number of compressed and uncompressed sent messages and achieved compression ratio as dict
+        """
+        return self.compressor.get_statistics()
+
+    def get_rtt_estimator(self, destination, initial_timeout=None):
+        """
+        returns the estimator of the round-trip time to a destination
+        :param destination: address of destination node
+        :param initial_timeout: ack timeout in seconds until the first round-trip time was measured; None uses
+        variables.ACK_TIMEOUT
+        :return: object of class reliable_delivery.RttEstimator
+        """
+        estimator = self.rtt_estimators.get(destination)
+        if estimator is None:
+            estimator = RttEstimator(initial_timeout=variables.ACK_TIMEOUT if initial_timeout is None
+                                     else initial_timeout, min_timeout=variables.MIN_ACK_TIMEOUT,
+                                     max_timeout=variables.MAX_ACK_TIMEOUT)
+            self.rtt_estimators[destination] = estimator
+        return estimator
+
+    def get_rtt_statistics(self):
+        """
+        :return: dict with address of destination node as key and round-trip time estimation as value
+        """
+        return {destination: estimator.get_statistics() for destination, estimator in self.rtt_estimators.items()}
+
+    def get_message_header_length(self, destination):
+        """
+        :param destination: address of destination node
+        :return: max length of a message header without payload in bytes (in the binary format the length depends on
+        the message id)
+        """
+        return header.get_frame_length(header.MessageHeader(None, self.my_address, variables.DEFAULT_TTL, destination,
+                                                            destination, header.MAX_MESSAGE_ID, '').get_frame_str())
+
+    def get_max_message_size(self):
+        """
+        :return: max number of bytes of a message which is sent in one frame without fragmentation
+        """
+        return fragmentation.get_max_payload_length(self.driver.get_max_frame_length(),
+                                                    self.get_message_header_length(self.my_address))
+
+    def send_message_payload(self, destination, next_node, payload):
+        """
+        sends one message header to a destination
+        :param destination: address of destination node
+        :param next_node: address of next hop
+        :param payload: payload of the message header as str
+        :return: False if the message was not acknowledged (stop-and-wait) or the sender was stopped, else True
+        """
+        header_obj = header.MessageHeader(None, self.my_address, variables.DEFAULT_TTL, destination, next_node,
+                                          self.get_next_message_id(destination), payload)
+        if variables.SEND_WINDOW_SIZE > 1:
+            return self.get_sender(destination).send(header_obj)
+        rtt_estimator = self.get_rtt_estimator(destination)
+        attempt = 0
+        self.add_message_to_waiting_acknowledgement_list(header_obj)
+        message_confirmed = False
+        while attempt < variables.MAX_SEND_ATTEMPTS and not message_confirmed:
+            logging.debug(f'attempt: {attempt}')
+            self.send_header(header_obj.get_frame_str())
+            sent_at = time.monotonic()
+            # the waiter is completed by process_ack_header; no waiter means the message was already acknowledged
+            waiter = self.waiters.get(waiters.ACKNOWLEDGEMENT, header_obj.message_id)
+            message_confirmed = waiter is None or waiter.wait(rtt_estimator.get_timeout())
+            if not message_confirmed:
+                rtt_estimator.back_off()
+            elif attempt == 0 and waiter is not None:
+                # acknowledgements of retransmitted messages are ambiguous and not measured (Karn's rule)
+                rtt_estimator.add_sample(time.monotonic() - sent_at)
+            attempt += 1
+        if message_confirmed:
+            print('*******************message was acknowledged by receiver*******************')
+        else:
+            self.process_unacknowledged_message(header_obj)
+        return message_confirmed
+
+    def get_next_message_id(self, destination):
+        """
+        message ids are counted per destination, so the receiver can deliver the messages in order
+        :param destination: address of destination node
+        :return: message id for the next message to the destination
+        """
+        message_id = self.message_counters.get(destination, 0) + 1
+        self.message_counters[destination] = message_id
+        return message_id
+
+    def get_sender(self, destination):
+        """
+        returns the sender which keeps the window of unacknowledged messages for a destination
+        :param destination: address of destination node
+        :return: object of class reliable_delivery.WindowedSender
+        """
+        sender = self.senders.get(destination)
+        if sender is None:
+            sender = WindowedSender(self.send_message_header, self.process_unacknowledged_message,
+                                    window_size=variables.SEND_WINDOW_SIZE, ack_timeout=variables.ACK_TIMEOUT,
+                                    max_attempts=variables.MAX_SEND_ATTEMPTS, name=f'sender-{destination}',
+                                    rtt_estimator=self.get_rtt_estimator(destination))
+            self.senders[destination] = sender
+        return sender
+
+    def send_message_header(self, header_obj):
+        """
+        sends (or retransmits) a message header using the current best route to its destination
+        :param header_obj: object of class header.MessageHeader
+        """
+        best_route = self.routing_table.get_best_route_for_destination(header_obj.destination)
+        if len(best_route) != 0:
+            header_obj.next_node = best_route['next_node']
+        self.send_header(header_obj.get_frame_str())
+
+    def process_unacknowledged_message(self, header_obj):
+        """
+        deletes route to the destination of a message which was not acknowledged and sends route error message
+        :param header_obj: object of class header.MessageHeader
+        """
+        logging.debug(
+            f'message was not acknowledged by receiver. Current ack_list: {self.messages_acknowledgment}'
+            f'\nSending route error message')
+        self.routing_table.delete_all_entries_of_destination(header_obj.destination)
+        self.delete_from_ack_list(header_obj.message_id)
+        route_error_header_obj = header.RouteErrorHeader(None, self.my_address, variables.DEFAULT_TTL,
+                                                         header_obj.destination)
+        self.queue_header(route_error_header_obj.get_frame_str(), transmit_scheduler.ROUTE_ERROR)
+
+    def find_route(self, end_node):
+        """
+        returns best route to passed node; sends a route request if there is no routing table entry for the node
+        :param end_node: address of destination node
+        :return: routing table entry as dict or empty dict if no route was found
+        """
+        route = self.routing_table.get_best_route_for_destination(end_node)
+        if len(route) == 0:
+            logging.info(f'could not find a route to {end_node}. Sending route request...')
+            if self.send_route_request_message(end_node):
+                route = self.routing_table.get_best_route_for_destination(end_node)
             else:
-                logging.debug(
-                    f'message was not acknowledged by receiver. Current ack_list: {self.MESSAGES_ACKNOWLEDGMENT}'
-                    f'\nSending route error message')
-                self.routing_table.delete_all_entries_of_destination(destination)
-                self.delete_from_ack_list(header_obj.message_id)
-                self.send_header(header.RouteErrorHeader(None, variables.MY_ADDRESS, variables.DEFAULT_TTL,
-                                                         header_obj.destination).get_header_str())
+                logging.info(f'Got no answer on route requested for end node: {end_node}')
+        return route
 
     def send_route_request_message(self, end_node):
         """
@@ -145,28 +388,23 @@ class Protocol:
         @param end_node: node for which a route is required
         @return: True, if route request was confirmed, else False
         """
-        route_request_header_obj = header.RouteRequestHeader(None, variables.MY_ADDRESS, variables.DEFAULT_TTL, 0,
+        route_request_header_obj = header.RouteRequestHeader(None, self.my_address, variables.DEFAULT_TTL, 0,
                                                              end_node)
         attempt = 0
-        message_confirmed = False
-        while attempt < 3 and not message_confirmed:
+        while attempt < 3:
             logging.debug('attempt: {}'.format(attempt))
-            self.send_header(route_request_header_obj.get_header_str())
-            check_request_attempt_count = 0
-            while check_request_attempt_count < 10:
-                if len(self.routing_table.get_best_route_for_destination(end_node)) != 0:
-                    logging.debug('new route for {} found'.format(end_node))
-                    message_confirmed = True
-                    break
-                else:
-                    time.sleep(0.5)
-                    check_request_attempt_count += 1
+            # the waiter is completed by a route reply or by any frame received from the requested node
+            waiter = self.waiters.register(waiters.ROUTE_REPLY, end_node)
+            self.send_header(route_request_header_obj.get_frame_str())
+            if len(self.routing_table.get_best_route_for_destination(end_node)) == 0:
+                waiter.wait(self.ROUTE_REPLY_TIMEOUT)
+            if len(self.routing_table.get_best_route_for_destination(end_node)) != 0:
+                logging.debug('new route for {} found'.format(end_node))
+                self.waiters.unregister(waiters.ROUTE_REPLY, end_node)
+                return True
             attempt += 1
-            if message_confirmed:
-                return message_confirmed
-            else:
-                attempt += 1
-        return message_confirmed
+        self.waiters.unregister(waiters.ROUTE_REPLY, end_node)
+        return False
 
     def process_route_request(self, header_obj):
         """
@@ -174,9 +412,9 @@ class Protocol:
         @param header_obj: route request header object
         """
         # first of all check whether source of route request is myself (to prevent cycle)
-        if header_obj.source != variables.MY_ADDRESS:
+        if header_obj.source != self.my_address:
             # look whether requested node is myself
-            if header_obj.end_node == variables.MY_ADDRESS:
+            if header_obj.end_node == self.my_address:
                 logging.debug('add new routing table entry before sending route reply')
                 self.routing_table.add_routing_table_entry(header_obj.source, header_obj.received_from,
                                                            header_obj.hops + 1)
@@ -193,7 +431,7 @@ class Protocol:
                 if not self.routing_table.check_route_request_already_processed(header_obj.end_node):
                     logging.debug('forward route request message')
                     self.routing_table.add_address_to_processed_requests_list(header_obj.end_node)
-                    self.send_header(header_obj.get_header_str())
+                    self.queue_header(header_obj.get_frame_str(), transmit_scheduler.FORWARD)
                 else:
                     logging.debug('route request was already processed')
 
@@ -203,9 +441,9 @@ class Protocol:
         @param next_node: next receiver of the message, which should forward the message to the destination node
         @param end_node: node which sent the route request
         """
-        route_reply_header_obj = header.RouteReplyHeader(None, variables.MY_ADDRESS, variables.DEFAULT_TTL, 0, end_node,
+        route_reply_header_obj = header.RouteReplyHeader(None, self.my_address, variables.DEFAULT_TTL, 0, end_node,
                                                          next_node)
-        self.send_header(route_reply_header_obj.get_header_str())
+        self.queue_header(route_reply_header_obj.get_frame_str(), transmit_scheduler.REPLY)
 
     def process_message_header(self, header_obj):
         """
@@ -214,19 +452,37 @@ class Protocol:
         forwarded to the next_node
         @param header_obj: message header object
         """
-        if header_obj.destination == variables.MY_ADDRESS and header_obj.source == self.connected_node:
-            ack_header_str = header.MessageAcknowledgeHeader(None, variables.MY_ADDRESS, variables.TTL_START_VALUE,
-                                                             header_obj.source, header_obj.message_id).get_header_str()
-            if self.routing_table.check_message_already_received(header_obj.source, header_obj.message_id):
-                self.send_header(ack_header_str)
+        if header_obj.destination == self.my_address and header_obj.source == self.connected_node:
+            receive_buffer = self.receive_buffers.get(header_obj.source)
+            if receive_buffer is None:
+                receive_buffer = ReorderBuffer()
+                self.receive_buffers[header_obj.source] = receive_buffer
+            logging.debug(f'payload: {str(header_obj.payload)}')
+            duplicates = receive_buffer.duplicates
+            # duplicates are dropped and messages are delivered in order of their message ids
+            deliverable_payloads = receive_buffer.add(header_obj.message_id, header_obj.decode_payload())
+            for payload in deliverable_payloads:
+                if isinstance(payload, fragmentation.Fragment):
+                    fragment = payload
+                    payload = self.get_reassembler(header_obj.source).add(fragment)
+                    if payload is None:
+                        continue
+                    if fragment.compressed:
+                        payload = self.compressor.decompress(payload)
+                self.received_messages_queue.put(payload)
+            # send acknowledge message (also for duplicates, because the first acknowledgement could be lost)
+            logging.debug('sending acknowledgement')
+            if variables.ACK_DELAY is None:
+                self.queue_header(header.MessageAcknowledgeHeader(None, self.my_address, variables.TTL_START_VALUE,
+                                                                  header_obj.source,
+                                                                  header_obj.message_id).get_frame_str(),
+                                  transmit_scheduler.REPLY)
             else:
-                logging.debug(f'payload: {str(header_obj.payload)}')
-                self.received_messages_queue.put(base64.b64decode(header_obj.payload))
-                # send acknowledge message
-                logging.debug('sending acknowledgement')
-                self.send_header(ack_header_str)
+                # duplicates and messages which can not be delivered yet (gap) are acknowledged without delay
+                self.get_ack_aggregator(header_obj.source).add(
+                    immediately=receive_buffer.duplicates != duplicates or len(deliverable_payloads) == 0)
 
-        elif header_obj.next_node == variables.MY_ADDRESS and header_obj.destination != variables.MY_ADDRESS:
+        elif header_obj.next_node == self.my_address and header_obj.destination != self.my_address:
             best_route = self.routing_table.get_best_route_for_destination(header_obj.destination)
             if len(best_route) == 0:
                 logging.info('no routing table entry for {} to forward message found'.format(header_obj.next_node))
@@ -235,10 +491,55 @@ class Protocol:
                 logging.info('forwarding message from {source} to {destination} over hop {next_node}'.format(
                     source=header_obj.source, destination=header_obj.destination, next_node=header_obj.next_node))
                 header_obj.ttl = header_obj.ttl - 1
-                self.send_header(header_obj.get_header_str())
+                self.queue_header(header_obj.get_frame_str(), transmit_scheduler.FORWARD)
         else:
             logging.debug('ignoring message: {}'.format(str(header_obj)))
 
+    def get_reassembler(self, source):
+        """
+        returns the object which reassembles the fragmented messages received from a node
+        :param source: address of the node which sent the fragments
+        :return: object of class fragmentation.Reassembler
+        """
+        reassembler = self.reassemblers.get(source)
+        if reassembler is None:
+            reassembler = fragmentation.Reassembler()
+            self.reassemblers[source] = reassembler
+        return reassembler
+
+    def get_ack_aggregator(self, source):
+        """
+        returns the object which delays the acknowledgements of messages received from a node
+        :param source: address of the node which sent the messages
+        :return: object of class reliable_delivery.AckAggregator
+        """
+        ack_aggregator = self.ack_aggregators.get(source)
+        if ack_aggregator is None:
+            ack_aggregator = AckAggregator(lambda: self.send_cumulative_acknowledgement(source),
+                                           delay=variables.ACK_DELAY, batch_size=variables.ACK_BATCH_SIZE,
+                                           schedule_function=self.schedule)
+            self.ack_aggregators[source] = ack_aggregator
+        return ack_aggregator
+
+    def send_cumulative_acknowledgement(self, destination):
+        """
+        acknowledges all messages received from a node using one cumulative acknowledgement header
+        :param destination: address of the node which sent the messages
+        """
+        message_id, bitmap = self.receive_buffers[destination].get_acknowledgement()
+        self.queue_header(header.CumulativeAcknowledgeHeader(None, self.my_address, variables.TTL_START_VALUE,
+                                                             destination, message_id, bitmap).get_frame_str(),
+                          transmit_scheduler.REPLY)
+
+    def schedule(self, delay, callback):
+        """
+        calls a function after a delay
+        :param delay: delay in seconds
+        :param callback: function without parameters
+        :return: object with method cancel
+        """
+        return start_timer(delay, callback)
+
     def process_route_reply_header(self, header_obj):
         """
         processes route reply header; if the source address is equal to the own address the message will be rejected;
@@ -246,13 +547,16 @@ class Protocol:
         the message will be forwarded to the address mentioned in the next_node field
         @param header_obj: route reply header object
         """
-        if header_obj.source == variables.MY_ADDRESS:
+        if header_obj.source == self.my_address:
             return
-        if header_obj.end_node == variables.MY_ADDRESS:
+        if header_obj.end_node == self.my_address:
             # add entry to routing table
             self.routing_table.add_routing_table_entry(header_obj.source, header_obj.received_from, header_obj.hops + 1)
-        elif header_obj.next_node == variables.MY_ADDRESS:
-            if len(self.routing_table.get_best_route_for_destination(header_obj.source)) != 0:
+            self.waiters.complete(waiters.ROUTE_REPLY, header_obj.source)
+        elif header_obj.next_node == self.my_address:
+            # the route reply is forwarded on the reverse path of the route request, which was stored while forwarding
+            # the route request
+            if len(self.routing_table.get_best_route_for_destination(header_obj.end_node)) != 0:
                 # forward route reply message
                 # add routing table entry
                 logging.debug("add routing table entry before forwarding route reply message")
@@ -263,7 +567,7 @@ class Protocol:
                     'next_node']
                 header_obj.hops = header_obj.hops + 1
                 header_obj.ttl = header_obj.ttl - 1
-                self.send_header(header_obj.get_header_str())
+                self.queue_header(header_obj.get_frame_str(), transmit_scheduler.REPLY)
 
     def process_route_error_header(self, header_obj):
         """
@@ -277,7 +581,7 @@ class Protocol:
             logging.debug(
                 f'broken node is not in available nodes: {self.routing_table.get_list_of_all_available_destinations()}')
         header_obj.ttl -= 1
-        self.send_header(header_obj.get_header_str())
+        self.queue_header(header_obj.get_frame_str(), transmit_scheduler.ROUTE_ERROR)
 
     def process_ack_header(self, header_obj):
         """
@@ -285,12 +589,22 @@ class Protocol:
         object will be added to the message_acknowledgement_list, else the message will be forwarded
         @param header_obj: message acknowledgement header object
         """
-        if header_obj.destination == variables.MY_ADDRESS:
-            self.delete_from_ack_list(header_obj.message_id)
+        if header_obj.destination == self.my_address:
+            sender = self.senders.get(header_obj.source)
+            if header_obj.flag == header.CumulativeAcknowledgeHeader.HEADER_TYPE:
+                for message_id in [message_id for message_id in self.messages_acknowledgment
+                                   if header_obj.is_acknowledged(message_id)]:
+                    self.delete_from_ack_list(message_id)
+                if sender is not None:
+                    sender.acknowledge_cumulative(header_obj.message_id, header_obj.bitmap)
+            else:
+                self.delete_from_ack_list(header_obj.message_id)
+                if sender is not None:
+                    sender.acknowledge(header_obj.message_id)
         header_obj.ttl -= 1
         logging.debug('forward ack message')
-        if header_obj.destination != variables.MY_ADDRESS:
-            self.send_header(header_obj.get_header_str())
+        if header_obj.destination != self.my_address:
+            self.queue_header(header_obj.get_frame_str(), transmit_scheduler.REPLY)
         else:
             logging.debug(f'do not forward ack message, because end node was my address')
 
@@ -299,7 +613,7 @@ class Protocol:
         processes registration message header
         :param header_obj: object of class RegistrationMessageHeader
         """
-        if header_obj.source != variables.MY_ADDRESS:
+        if header_obj.source != self.my_address:
             header_obj.ttl -= 1
             self.routing_table.add_address_to_processed_registration_messages_list(header_obj.source)
             if header_obj.subscribe:
@@ -309,30 +623,32 @@ class Protocol:
                 logging.debug('unregistered peer')
                 self.routing_table.delete_peer(header_obj.peer_id, header_obj.source)
             logging.debug('forward registration message')
-            self.send_header(header_obj.get_header_str())
+            self.queue_header(header_obj.get_frame_str(), transmit_scheduler.FORWARD)
         else:
             self.received_own_registration_message = True
+            self.waiters.complete(waiters.REGISTRATION, header_obj.peer_id)
 
     def process_connect_request_header(self, header_obj):
         """
         processes connect request header
         :param header_obj: object of class ConnectRequestHeader
         """
-        if header_obj.received_from != variables.MY_ADDRESS:
-            if header_obj.end_node == variables.MY_ADDRESS:
+        if header_obj.received_from != self.my_address:
+            if header_obj.end_node == self.my_address:
                 self.connected_node = header_obj.source
+                self.set_payload_encoding(header_obj.source, header_obj.payload_encoding)
                 # send connect request to java side
                 logging.debug("send connect request to java side")
                 self.sending_queue.put(
                     ipc.create_connect_request_message(header_obj.source_peer_id, header_obj.target_peer_id,
                                                        header_obj.timeout))
-            elif header_obj.next_node == variables.MY_ADDRESS:
+            elif header_obj.next_node == self.my_address:
                 logging.debug('forward connect request header')
                 route = self.routing_table.get_best_route_for_destination(header_obj.end_node)
                 if len(route) > 0:
                     header_obj.next_node = route['next_node']
                     header_obj.ttl -= 1
-                    self.send_header(header_obj.get_header_str())
+                    self.queue_header(header_obj.get_frame_str(), transmit_scheduler.FORWARD)
                 else:
                     logging.debug(f'could not forward connect request header, because there is no routing table entry '
                                   f'for destination address {header_obj.end_node}')
@@ -342,20 +658,21 @@ class Protocol:
         processes disconnect request header
         :param header_obj: object of class DisconnectRequestHeader
         """
-        if header_obj.received_from != variables.MY_ADDRESS:
-            if header_obj.end_node == variables.MY_ADDRESS:
+        if header_obj.received_from != self.my_address:
+            if header_obj.end_node == self.my_address:
                 self.connected_node = header_obj.source
+                self.set_payload_encoding(header_obj.source, header_obj.payload_encoding)
                 # send connect request to java side
                 logging.debug("send disconnect request to java side")
                 self.sending_queue.put(
                     ipc.create_disconnect_request_message(header_obj.source_peer_id, header_obj.target_peer_id))
-            elif header_obj.next_node == variables.MY_ADDRESS:
+            elif header_obj.next_node == self.my_address:
                 logging.debug('forward disconnect request header')
                 route = self.routing_table.get_best_route_for_destination(header_obj.end_node)
                 if len(route) > 0:
                     header_obj.next_node = route['next_node']
                     header_obj.ttl -= 1
-                    self.send_header(header_obj.get_header_str())
+                    self.queue_header(header_obj.get_frame_str(), transmit_scheduler.FORWARD)
                 else:
                     logging.debug(f'could not forward connect request header, because there is no routing table entry '
                                   f'for destination address {header_obj.end_node}')
@@ -373,18 +690,12 @@ class Protocol:
         if not self.routing_table.check_connect_request_entry_already_exists(source_peer_id, target_peer_id):
             self.routing_table.add_connect_request(source_peer_id, target_peer_id)
             end_node = self.routing_table.get_address_of_peer(target_peer_id)
-            route = self.routing_table.get_best_route_for_destination(end_node)
+            route = self.find_route(end_node)
             if len(route) == 0:
-                logging.info(
-                    'could not find a route to {}. Sending route request...'.format(end_node))
-                if self.send_route_request_message(end_node):
-                    route = self.routing_table.get_best_route_for_destination(end_node)
-                else:
-                    logging.info('Got no answer on route requested.'.format(end_node))
-                    return
-            self.send_header(ConnectRequestHeader(None, variables.MY_ADDRESS, variables.DEFAULT_TTL, end_node,
+                return
+            self.send_header(ConnectRequestHeader(None, self.my_address, variables.DEFAULT_TTL, end_node,
                                                   route['next_node'], source_peer_id, target_peer_id,
-                                                  timeout_in_sec).get_header_str())
+                                                  timeout_in_sec, get_requested_payload_encoding()).get_frame_str())
 
     def send_disconnect_request_header(self, source_peer_id, target_peer_id):
         """
@@ -394,16 +705,11 @@ class Protocol:
         """
         self.check_peers(source_peer_id, target_peer_id)
         end_node = self.routing_table.get_address_of_peer(target_peer_id)
-        route = self.routing_table.get_best_route_for_destination(end_node)
+        route = self.find_route(end_node)
         if len(route) == 0:
-            logging.info(f'could not find a route to {end_node}. Sending route request...')
-            if self.send_route_request_message(end_node):
-                route = self.routing_table.get_best_route_for_destination(end_node)
-            else:
-                logging.info(f'Got no answer on route requested for end node: {end_node}')
-                return
-        self.send_header(DisconnectRequestHeader(None, variables.MY_ADDRESS, variables.DEFAULT_TTL, end_node,
-                                                 route['next_node'], source_peer_id, target_peer_id).get_header_str())
+            return
+        self.send_header(DisconnectRequestHeader(None, self.my_address, variables.DEFAULT_TTL, end_node,
+                                                 route['next_node'], source_peer_id, target_peer_id).get_frame_str())
 
     def check_peers(self, source_peer_id, target_peer_id):
         """
@@ -415,7 +721,7 @@ class Protocol:
             raise ValueError(f"source peer '{source_peer_id}' is not registered")
         elif not self.routing_table.check_peer_is_already_registered(target_peer_id):
             raise ValueError(f"target peer '{target_peer_id}' is not registered")
-        elif self.routing_table.get_address_of_peer(source_peer_id) != variables.MY_ADDRESS:
+        elif self.routing_table.get_address_of_peer(source_peer_id) != self.my_address:
             raise ValueError('source peer is not registered on this node')
 
     def send_registration_message(self, subscribe, peer_id):
@@ -425,27 +731,20 @@ class Protocol:
         :param peer_id: id of peer
         """
         if subscribe:
-            self.routing_table.add_peer(peer_id, variables.MY_ADDRESS)
+            self.routing_table.add_peer(peer_id, self.my_address)
         else:
-            self.routing_table.delete_peer(peer_id, variables.MY_ADDRESS)
+            self.routing_table.delete_peer(peer_id, self.my_address)
         attempts = 0
-        received_own_request = False
         self.received_own_registration_message = False
-
+        # the waiter is completed when a neighbor forwards the own registration message
+        waiter = self.waiters.register(waiters.REGISTRATION, peer_id)
         while attempts < 3:
-            self.send_header(RegistrationHeader(None, variables.MY_ADDRESS, variables.DEFAULT_TTL, subscribe,
-                                                peer_id).get_header_str())
-            check_attempt_count = 0
-            while check_attempt_count < 5:
-                if self.received_own_registration_message:
-                    received_own_request = True
-                    break
-                else:
-                    check_attempt_count += 1
-                    time.sleep(0.5)
-            attempts += 1
-            if received_own_request:
+            self.send_header(RegistrationHeader(None, self.my_address, variables.DEFAULT_TTL, subscribe,
+                                                peer_id).get_frame_str())
+            if waiter.wait(self.REGISTRATION_TIMEOUT):
                 return
+            attempts += 1
+        self.waiters.unregister(waiters.REGISTRATION, peer_id)
 
     def stop(self):
         """
@@ -456,8 +755,12 @@ class Protocol:
         thread for processing received header messages
         """
         self.PROCESS_INCOMING_MESSAGES = False
-        serial_connection.WRITING_THREAD_ACTIVE = False
-        serial_connection.READING_THREAD_ACTIVE = False
+        self.transmit_scheduler.stop()
+        for sender in self.senders.values():
+            sender.stop()
+        for ack_aggregator in self.ack_aggregators.values():
+            ack_aggregator.stop()
+        self.driver.stop()
 
     def add_message_to_waiting_acknowledgement_list(self, message_header_obj):
         """
@@ -466,7 +769,8 @@ class Protocol:
         """
         message_id = message_header_obj.message_id
         logging.debug(f"adding '{message_id}' to ack list")
-        self.MESSAGES_ACKNOWLEDGMENT.append(message_id)
+        self.messages_acknowledgment.append(message_id)
+        self.waiters.register(waiters.ACKNOWLEDGEMENT, message_id)
 
     def delete_from_ack_list(self, ack_id):
         """
@@ -474,10 +778,11 @@ class Protocol:
         :param ack_id: message id which should be deleted
         """
         logging.debug(f'remove {ack_id} from ack list')
+        self.waiters.complete(waiters.ACKNOWLEDGEMENT, int(ack_id))
         try:
-            self.MESSAGES_ACKNOWLEDGMENT.remove(int(ack_id))
+            self.messages_acknowledgment.remove(int(ack_id))
         except ValueError:
-            logging.debug(f'ack is not in list. Current ack list: {self.MESSAGES_ACKNOWLEDGMENT}')
+            logging.debug(f'ack is not in list. Current ack list: {self.messages_acknowledgment}')
 
 
 @contextmanager
@@ -508,6 +813,16 @@ def raise_timeout(signum, frame):
     raise TimeoutError
 
 
+def get_requested_payload_encoding():
+    """
+    :return: name of the encoding other nodes should use for messages to this node (variables.PAYLOAD_ENCODING) or
+    None for base64; base64 is not sent, so connect requests can be processed by nodes without payload encodings
+    """
+    if variables.PAYLOAD_ENCODING == payload_encoding.BASE64:
+        return None
+    return variables.PAYLOAD_ENCODING
+
+
 def wait_random_time():
     """
     sleep for a random time; timespan is between 0 and variables.MAX_SLEEP_TIME seconds
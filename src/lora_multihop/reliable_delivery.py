@@ -0,0 +1,418 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from lora_multihop import variables
+
+__author__ = "Marvin Rausch"
+
+
+class OutstandingMessage:
+
+    def __init__(self, header_obj):
+        """
+        constructor of OutstandingMessage class
+        :param header_obj: object of class header.MessageHeader which waits for its acknowledgement
+        """
+        self.header_obj = header_obj
+        self.attempts = 0
+        self.deadline = None
+        self.sent_at = None
+
+
+class RttEstimator:
+    """
+    estimates the round-trip time to one destination with smoothed rtt and rtt variance (like TCP, RFC 6298) and
+    derives the ack timeout from it; the timeout is doubled after every expired acknowledgement (exponential backoff);
+    round-trip times of retransmitted messages must not be added, because the acknowledgement can not be assigned to
+    one of the transmissions (Karn's rule)
+    """
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __init__(self, initial_timeout=variables.ACK_TIMEOUT, min_timeout=variables.MIN_ACK_TIMEOUT,
+                 max_timeout=variables.MAX_ACK_TIMEOUT):
+        """
+        constructor of RttEstimator class
+        :param initial_timeout: ack timeout in seconds until the first round-trip time was measured
+        :param min_timeout: lower bound of the timeout computed from measured round-trip times
+        :param max_timeout: upper bound of the timeout including backoff
+        """
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.smoothed_rtt = None
+        self.rtt_variance = None
+        self.timeout = min(initial_timeout, max_timeout)
+        self.samples = 0
+        self.backoffs = 0
+        self.lock = threading.Lock()
+
+    def add_sample(self, rtt):
+        """
+        adds a measured round-trip time and resets the backoff
+        :param rtt: time in seconds between sending a message (not retransmitted) and receiving its acknowledgement
+        """
+        with self.lock:
+            if self.smoothed_rtt is None:
+                self.smoothed_rtt = rtt
+                self.rtt_variance = rtt / 2
+            else:
+                self.rtt_variance = (1 - self.BETA) * self.rtt_variance + self.BETA * abs(self.smoothed_rtt - rtt)
+                self.smoothed_rtt = (1 - self.ALPHA) * self.smoothed_rtt + self.ALPHA * rtt
+            self.timeout = min(max(self.smoothed_rtt + self.K * self.rtt_variance, self.min_timeout),
+                               self.max_timeout)
+            self.samples += 1
+
+    def back_off(self):
+        """
+        doubles the timeout after an acknowledgement did not arrive in time
+        """
+        with self.lock:
+            self.timeout = min(self.timeout * 2, self.max_timeout)
+            self.backoffs += 1
+
+    def get_timeout(self):
+        """
+        :return: current ack timeout in seconds
+        """
+        with self.lock:
+            return self.timeout
+
+    def get_statistics(self):
+        """
+        :return: smoothed rtt, rtt variance, timeout (all in seconds) and number of samples and backoffs as dict
+        """
+        with self.lock:
+            return {'smoothed_rtt': self.smoothed_rtt, 'rtt_variance': self.rtt_variance, 'timeout': self.timeout,
+                    'samples': self.samples, 'backoffs': self.backoffs}
+
+
+class WindowedSender:
+    """
+    sends messages to one destination with up to window_size unacknowledged messages in flight; every message is
+    retransmitted on its own if its acknowledgement does not arrive in time (selective retransmission)
+    """
+
+    def __init__(self, send_function, failure_function, window_size=variables.SEND_WINDOW_SIZE,
+                 ack_timeout=variables.ACK_TIMEOUT, max_attempts=variables.MAX_SEND_ATTEMPTS, name='sender',
+                 rtt_estimator=None):
+        """
+        constructor of WindowedSender class
+        :param send_function: function which sends a message header object over the LoRa network; is called with the
+        header object as parameter (the next node can be updated by the function)
+        :param failure_function: function which is called with the header object of a message which was not
+        acknowledged after max_attempts transmissions
+        :param window_size: max number of unacknowledged messages
+        :param ack_timeout: time in seconds to wait for the acknowledgement of a transmission
+        :param max_attempts: max number of transmissions of a message
+        :param name: name of the retransmission thread
+        :param rtt_estimator: object of class RttEstimator which provides the ack timeout instead of ack_timeout; is
+        updated with the round-trip times of acknowledged messages
+        """
+        self.send_function = send_function
+        self.failure_function = failure_function
+        self.window_size = window_size
+        self.ack_timeout = ack_timeout
+        self.max_attempts = max_attempts
+        self.rtt_estimator = rtt_estimator
+        self.outstanding_messages = OrderedDict()
+        self.condition = threading.Condition()
+        self.active = True
+        self.sent_messages = 0
+        self.retransmissions = 0
+        self.failed_messages = 0
+        self.retransmission_thread = threading.Thread(target=self.process_timeouts, name=name, daemon=True)
+        self.retransmission_thread.start()
+
+    def send(self, header_obj):
+        """
+        sends a message; blocks while the window is full
+        :param header_obj: object of class header.MessageHeader
+        :return: True if the message was sent, False if the sender was stopped
+        """
+        message = OutstandingMessage(header_obj)
+        with self.condition:
+            while self.active and len(self.outstanding_messages) >= self.window_size:
+                self.condition.wait()
+            if not self.active:
+                return False
+            self.outstanding_messages[header_obj.message_id] = message
+            self.sent_messages += 1
+        self._transmit(message)
+        return True
+
+    def acknowledge(self, message_id):
+        """
+        removes an acknowledged message from the window
+        :param message_id: id of the acknowledged message
+        :return: True if the message was waiting for its acknowledgement, else False
+        """
+        with self.condition:
+            message = self.outstanding_messages.pop(int(message_id), None)
+            self.condition.notify_all()
+        if message is not None:
+            self._add_rtt_sample([message])
+        return message is not None
+
+    def acknowledge_cumulative(self, message_id, bitmap=0):
+        """
+        removes all messages acknowledged by a cumulative acknowledgement from the window
+        :param message_id: highest message id up to which all messages were received
+        :param bitmap: int containing one bit for every received message following message_id
+        :return: number of messages which were waiting for their acknowledgement
+        """
+        with self.condition:
+            acknowledged_ids = [outstanding_id for outstanding_id in self.outstanding_messages
+                                if outstanding_id <= message_id or bitmap >> (outstanding_id - message_id - 1) & 1]
+            acknowledged_messages = [self.outstanding_messages.pop(acknowledged_id)
+                                     for acknowledged_id in acknowledged_ids]
+            self.condition.notify_all()
+        self._add_rtt_sample(acknowledged_messages)
+        return len(acknowledged_messages)
+
+    def wait_until_all_acknowledged(self, timeout=None):
+        """
+        blocks until all sent messages were acknowledged or given up
+        :param timeout: max time to wait in seconds
+        :return: True if no message is outstanding, else False
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: len(self.outstanding_messages) == 0, timeout)
+
+    def get_statistics(self):
+        """
+        :return: counters of the sender as dict
+        """
+        with self.condition:
+            return {'outstanding_messages': len(self.outstanding_messages), 'sent_messages': self.sent_messages,
+                    'retransmissions': self.retransmissions, 'failed_messages': self.failed_messages}
+
+    def stop(self):
+        """
+        stops the retransmission thread and wakes up waiting callers
+        """
+        with self.condition:
+            self.active = False
+            self.condition.notify_all()
+
+    def process_timeouts(self):
+        """
+        loop of the retransmission thread; retransmits every message whose acknowledgement timed out and gives up
+        messages which reached max_attempts
+        """
+        while True:
+            with self.condition:
+                if not self.active:
+                    return
+                now = time.monotonic()
+                expired_messages = [message for message in self.outstanding_messages.values()
+                                    if message.deadline is not None and message.deadline <= now]
+                if len(expired_messages) == 0:
+                    deadlines = [message.deadline for message in self.outstanding_messages.values()
+                                 if message.deadline is not None]
+                    self.condition.wait(min(deadlines) - now if len(deadlines) > 0 else None)
+                    continue
+                if self.rtt_estimator is not None:
+                    self.rtt_estimator.back_off()
+                given_up_messages = []
+                for message in expired_messages:
+                    if message.attempts >= self.max_attempts:
+                        del self.outstanding_messages[message.header_obj.message_id]
+                        self.failed_messages += 1
+                        given_up_messages.append(message)
+                    else:
+                        # prevents a second retransmission before the current one is sent
+                        message.deadline = None
+                        self.retransmissions += 1
+                self.condition.notify_all()
+            for message in given_up_messages:
+                logging.debug(f'message {message.header_obj.message_id} was not acknowledged by receiver')
+                self.failure_function(message.header_obj)
+            for message in expired_messages:
+                if message not in given_up_messages:
+                    logging.debug(f'retransmit message {message.header_obj.message_id}, attempt: {message.attempts}')
+                    self._transmit(message)
+
+    def _transmit(self, message):
+        """
+        sends a message and starts the timer for its acknowledgement
+        :param message: object of class OutstandingMessage
+        """
+        self.send_function(message.header_obj)
+        ack_timeout = self.ack_timeout if self.rtt_estimator is None else self.rtt_estimator.get_timeout()
+        with self.condition:
+            message.attempts += 1
+            message.sent_at = time.monotonic()
+            if message.header_obj.message_id in self.outstanding_messages:
+                message.deadline = message.sent_at + ack_timeout
+            self.condition.notify_all()
+
+    def _add_rtt_sample(self, acknowledged_messages):
+        """
+        passes the round-trip time of the last sent message of an acknowledgement to the rtt estimator; retransmitted
+        messages are ignored (Karn's rule)
+        :param acknowledged_messages: list of objects of class OutstandingMessage
+        """
+        if self.rtt_estimator is None:
+            return
+        sent_times = [message.sent_at for message in acknowledged_messages
+                      if message.attempts == 1 and message.sent_at is not None]
+        if len(sent_times) > 0:
+            self.rtt_estimator.add_sample(time.monotonic() - max(sent_times))
+
+
+class ReorderBuffer:
+    """
+    receiver side of the reliable delivery for one source; messages are delivered in the order of their message ids,
+    duplicates are dropped
+    """
+
+    def __init__(self, buffer_size=variables.REORDER_BUFFER_SIZE, timeout=variables.REORDER_TIMEOUT):
+        """
+        constructor of ReorderBuffer class
+        :param buffer_size: max number of buffered messages; message ids more than buffer_size below the next expected
+        id are treated as start of a new stream (e.g. after the sender was restarted)
+        :param timeout: time in seconds after which a gap in the message ids is skipped (the sender gave up the
+        missing message)
+        """
+        self.buffer_size = buffer_size
+        self.timeout = timeout
+        self.next_message_id = None
+        self.buffered_messages = {}
+        self.gap_since = None
+        self.duplicates = 0
+
+    def add(self, message_id, payload):
+        """
+        adds a received message
+        :param message_id: message id as int
+        :param payload: payload of the message
+        :return: list of payloads which can be delivered in order
+        """
+        now = time.monotonic()
+        if self.next_message_id is None or message_id < self.next_message_id - self.buffer_size:
+            self.next_message_id = message_id
+            self.buffered_messages = {}
+        if message_id < self.next_message_id or message_id in self.buffered_messages:
+            self.duplicates += 1
+            return []
+        if message_id >= self.next_message_id + self.buffer_size:
+            # sender is too far ahead; the missing messages will not arrive anymore
+            self.next_message_id = message_id - self.buffer_size + 1
+            self.buffered_messages = {key: value for key, value in self.buffered_messages.items()
+                                      if key >= self.next_message_id}
+        self.buffered_messages[message_id] = payload
+        deliverable_payloads = self._pop_deliverable_messages()
+        if len(self.buffered_messages) == 0:
+            self.gap_since = None
+        elif len(deliverable_payloads) > 0 or self.gap_since is None:
+            self.gap_since = now
+        elif now - self.gap_since >= self.timeout:
+            logging.debug(f'skip missing message {self.next_message_id}')
+            self.next_message_id = min(self.buffered_messages)
+            deliverable_payloads = self._pop_deliverable_messages()
+            self.gap_since = now if len(self.buffered_messages) > 0 else None
+        return deliverable_payloads
+
+    def get_acknowledgement(self):
+        """
+        returns state of the buffer for a cumulative acknowledgement
+        :return: tuple (highest message id up to which all messages were received, bitmap); bit i of the bitmap stands
+        for message id + 1 + i
+        """
+        if self.next_message_id is None:
+            return 0, 0
+        cumulative_id = self.next_message_id - 1
+        bitmap = 0
+        for message_id in self.buffered_messages:
+            bitmap |= 1 << (message_id - cumulative_id - 1)
+        return cumulative_id, bitmap
+
+    def _pop_deliverable_messages(self):
+        """
+        removes messages following the last delivered message without gap from the buffer
+        :return: list of payloads
+        """
+        payloads = []
+        while self.next_message_id in self.buffered_messages:
+            payloads.append(self.buffered_messages.pop(self.next_message_id))
+            self.next_message_id += 1
+        return payloads
+
+
+def start_timer(delay, callback):
+    """
+    calls a function after a delay in a separate thread
+    :param delay: delay in seconds
+    :param callback: function without parameters
+    :return: object with method cancel (threading.Timer)
+    """
+    timer = threading.Timer(delay, callback)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+class AckAggregator:
+    """
+    delays the acknowledgements of received messages of one source, so one cumulative acknowledgement confirms several
+    messages; the acknowledgement is sent after delay seconds, after batch_size messages or immediately if requested
+    (e.g. for duplicates whose first acknowledgement was probably lost)
+    """
+
+    def __init__(self, send_function, delay=variables.ACK_DELAY, batch_size=variables.ACK_BATCH_SIZE,
+                 schedule_function=start_timer):
+        """
+        constructor of AckAggregator class
+        :param send_function: function without parameters which sends the cumulative acknowledgement
+        :param delay: max time in seconds an acknowledgement is delayed
+        :param batch_size: number of received messages which are acknowledged without further delay
+        :param schedule_function: function (delay, callback) which returns an object with method cancel; can be
+        replaced to run the timer in an event loop
+        """
+        self.send_function = send_function
+        self.delay = delay
+        self.batch_size = batch_size
+        self.schedule_function = schedule_function
+        self.pending_messages = 0
+        self.timer = None
+        self.sent_acknowledgements = 0
+        self.lock = threading.Lock()
+
+    def add(self, immediately=False):
+        """
+        registers a received message
+        :param immediately: True to send the acknowledgement without delay
+        """
+        with self.lock:
+            self.pending_messages += 1
+            if not immediately and self.pending_messages < self.batch_size:
+                if self.timer is None:
+                    self.timer = self.schedule_function(self.delay, self.flush)
+                return
+        self.flush()
+
+    def flush(self):
+        """
+        sends the acknowledgement for all pending messages
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.pending_messages == 0:
+                return
+            self.pending_messages = 0
+            self.sent_acknowledgements += 1
+        self.send_function()
+
+    def stop(self):
+        """
+        cancels the timer without sending the pending acknowledgement
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
@@ -1,25 +1,20 @@
+import io
+import selectors
 import threading
 import queue
 import time
 import logging
 
-from lora_multihop import variables
+from lora_multihop import variables, airtime
+from lora_multihop.command_engine import CommandEngine
+from lora_multihop.command_statistics import CommandStatistics
+from lora_multihop.frame_demultiplexer import FrameDemultiplexer
 
 __author__ = "Marvin Rausch"
 
-ser = None
-
 logging.basicConfig(level=logging.DEBUG, format='(%(threadName)-9s) %(message)s', )
 
-BUF_SIZE = 100
-writing_q = queue.Queue(BUF_SIZE)
-BUF_SIZE = 1000
-response_q = queue.Queue(BUF_SIZE)
 BUF_SIZE = 1000
-status_q = queue.Queue(BUF_SIZE)
-WRITE_DATA = False
-READING_THREAD_ACTIVE = True
-WRITING_THREAD_ACTIVE = True
 
 
 def bytes_to_str(message_in_bytes):
@@ -33,120 +28,289 @@ def bytes_to_str(message_in_bytes):
 
 def str_to_bytes(string_to_convert):
     """
-    encodes string to bytes
+    encodes string to bytes; surrogates are converted back to the bytes they stand for (e.g. binary headers, see
+    header.Header.get_frame_str)
     :param string_to_convert: string which should be encoded
     :return: encoded string as bytes using encoding defined under variables.ENCODING
     """
-    return bytes(string_to_convert, variables.ENCODING)
+    return bytes(string_to_convert, variables.ENCODING, 'surrogateescape')
+
+
+def create_selector(serial_conn):
+    """
+    creates a selector which can be used to wait for incoming data on the file descriptor of the serial connection
+    :param serial_conn: object for serial connection from pyserial library
+    :return: selector object or None if the serial connection does not provide a file descriptor (e.g. pyserial url
+    handlers like 'loop://')
+    """
+    try:
+        selector = selectors.DefaultSelector()
+        selector.register(serial_conn.fileno(), selectors.EVENT_READ)
+        return selector
+    except (AttributeError, TypeError, ValueError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def wait_for_incoming_data(serial_conn, selector, timeout):
+    """
+    blocks until data can be read from serial port or timeout is reached
+    :param serial_conn: object for serial connection from pyserial library
+    :param selector: selector created by create_selector; if None in_waiting is polled every
+    variables.SERIAL_POLL_INTERVAL seconds
+    :param timeout: max time in seconds to wait for incoming data
+    :return: True if data is available, else False
+    """
+    if serial_conn.in_waiting:
+        return True
+    if selector is not None:
+        return len(selector.select(timeout)) > 0
+    time.sleep(min(timeout, variables.SERIAL_POLL_INTERVAL))
+    return bool(serial_conn.in_waiting)
+
+
+class ModemDriver:
+    """
+    driver for one LoRa module; every object owns its serial connection, queues and threads, so one process can
+    drive several LoRa modules
+    """
+
+    def __init__(self, serial_conn=None, name='modem'):
+        """
+        constructor of ModemDriver class
+        :param serial_conn: object for serial connection from pyserial library; can also be passed to start
+        :param name: name of the driver; used as prefix for the names of its threads
+        """
+        self.ser = serial_conn
+        self.name = name
+        self.response_q = queue.Queue(BUF_SIZE)
+        self.command_statistics = CommandStatistics()
+        self.lora_configuration = airtime.parse_module_config(variables.MODULE_CONFIG)
+        self.transmit_scheduler = airtime.DutyCycleScheduler()
+        self.command_engine = CommandEngine(statistics=self.command_statistics,
+                                            transmit_scheduler=self.transmit_scheduler)
+        self.frame_demultiplexer = FrameDemultiplexer(self.command_engine.process_response, self.response_q.put,
+                                                      self.command_engine.is_waiting_for_response)
+        self.reading_thread_active = True
+        self.writing_thread_active = True
+        self.reading_thread = None
+        self.writing_thread = None
+
+    def start(self, serial_conn=None):
+        """
+        starts threads for communication with serial port
+        :param serial_conn: object for serial connection from pyserial library; if None the connection passed to the
+        constructor is used
+        """
+        if serial_conn is not None:
+            self.ser = serial_conn
+        self.reading_thread_active = True
+        self.writing_thread_active = True
+        self.reading_thread = ReadingThread(name=f'{self.name}-producer', driver=self)
+        self.writing_thread = WritingThread(name=f'{self.name}-consumer', driver=self)
+        self.reading_thread.start()
+        self.writing_thread.start()
+
+    def stop(self):
+        """
+        stops threads for reading from and writing to serial port
+        """
+        self.reading_thread_active = False
+        self.writing_thread_active = False
+
+    def execute_command(self, command_as_str, verification_list=None):
+        """
+        helper function to send AT-command to serial port
+        :param command_as_str: command which should be sent
+        :param verification_list: list of expected results; can also be empty if result of command should not be
+        verified
+        :return: True if expected results equal to results received from serial port, else False
+        """
+        if verification_list is None:
+            verification_list = []
+        command = self.command_engine.submit(command_as_str, verification_list)
+        if len(verification_list) != 0:
+            return command.future.result(timeout=variables.COMMAND_VERIFICATION_TIMEOUT)
+
+    def query(self, command_as_str):
+        """
+        sends AT-command which reads a value from the LoRa module and waits for the answer
+        :param command_as_str: command which should be sent (e.g. 'AT+ADDR?')
+        :return: answer of the LoRa module as str (e.g. 'AT,0137,OK') or None if the LoRa module did not answer or
+        answered with an error
+        """
+        answer = self.command_engine.submit_query(command_as_str).future.result(
+            timeout=variables.COMMAND_VERIFICATION_TIMEOUT + 1)
+        if answer is False:
+            return None
+        return answer
+
+    def send_frame(self, payload):
+        """
+        sends a message over the LoRa network; the payload is written to the LoRa module immediately after the
+        module has confirmed the 'AT+SEND' command
+        :param payload: message which should be sent as str
+        :return: future which resolves to True if the LoRa module has confirmed sending the message, else to False
+        """
+        payload_length = len(str_to_bytes(payload))
+        commands = self.command_engine.submit_sequence(
+            [(f'AT+SEND={payload_length}', [variables.STATUS_OK]),
+             (payload, ['AT,SENDING', 'AT,SENDED'])], airtime=self.get_time_on_air(payload_length))
+        return commands[-1].future
+
+    def set_lora_configuration(self, configuration):
+        """
+        sets the radio parameters used to compute the time on air of frames; is called after the LoRa module was
+        configured
+        :param configuration: AT+CFG command as str
+        """
+        self.lora_configuration = airtime.parse_module_config(configuration)
+
+    def get_time_on_air(self, payload_length):
+        """
+        :param payload_length: length of payload in bytes
+        :return: time on air in seconds of a frame using the current configuration of the LoRa module
+        """
+        return self.lora_configuration.get_time_on_air(payload_length)
+
+    def get_max_frame_length(self):
+        """
+        :return: max payload length in bytes of a frame using the current configuration of the LoRa module
+        """
+        return self.lora_configuration.get_max_frame_length()
+
+    def get_remaining_airtime_budget(self):
+        """
+        :return: time on air in seconds which can be used now without violating the duty cycle (variables.DUTY_CYCLE)
+        or None if the duty cycle is not limited; callers can use it to defer or drop frames
+        """
+        return self.transmit_scheduler.get_remaining_budget()
+
+    def get_frame_statistics(self):
+        """
+        :return: counters of the parser used by the reading thread (e.g. number of frames which were received while
+        verifying a command) as dict
+        """
+        return self.frame_demultiplexer.get_statistics()
+
+    def get_command_statistics(self):
+        """
+        :return: counters and latency percentiles (in seconds) per command type as dict; queue wait, time until the
+        LoRa module answered and time on air of sent payloads are reported separately
+        """
+        return self.command_statistics.get_statistics()
+
+    def dump_command_statistics(self, file_path):
+        """
+        writes command statistics to a JSON file
+        :param file_path: path of the file
+        """
+        self.command_statistics.dump_json(file_path)
 
 
 class ReadingThread(threading.Thread):
-    def __init__(self, name):
+    def __init__(self, name, driver):
         super(ReadingThread, self).__init__()
         self.name = name
+        self.driver = driver
 
     def run(self):
         """
-        starts a thread for reading messages from serial port
+        starts a thread for reading messages from serial port; the thread blocks on the file descriptor of the serial
+        port and only wakes up if data arrives or variables.SERIAL_READ_TIMEOUT is reached; status lines of commands
+        are passed to the command engine, all other messages are put into response_q
         """
-        global READING_THREAD_ACTIVE
-        while READING_THREAD_ACTIVE:
-            global WRITE_DATA
-            if writing_q.empty() and not WRITE_DATA:
-                if ser.in_waiting:
-                    received_raw_message = ser.readline()
-                    logging.debug('received: {}'.format(received_raw_message))
-                    try:
-                        received_raw_message = bytes_to_str(received_raw_message)
-                        response_q.put(received_raw_message)
-                    except UnicodeDecodeError:
-                        logging.debug(f"message '{received_raw_message}' dumped. because it is not encoded in UTF-8")
+        ser = self.driver.ser
+        selector = create_selector(ser)
+        try:
+            while self.driver.reading_thread_active:
+                if not wait_for_incoming_data(ser, selector, variables.SERIAL_READ_TIMEOUT):
+                    continue
+                received_data = ser.read(max(ser.in_waiting, 1))
+                logging.debug('received: {}'.format(received_data))
+                self.driver.frame_demultiplexer.feed(received_data)
+        finally:
+            if selector is not None:
+                selector.close()
 
 
 class WritingThread(threading.Thread):
-    def __init__(self, name):
+    def __init__(self, name, driver):
         super(WritingThread, self).__init__()
         self.name = name
-        return
+        self.driver = driver
 
     def run(self):
         """
-        starts a thread for writing messages to a serial port
-        """
-        global WRITING_THREAD_ACTIVE
-        while WRITING_THREAD_ACTIVE:
-            if not writing_q.empty():
-                global WRITE_DATA
-                WRITE_DATA = True
-                command_tuple = writing_q.get()
-                command = command_tuple[0]
-                command = command + '\r\n'
-                command = str_to_bytes(command)
-                verify_list = command_tuple[1]
-                logging.debug("sending command '{}'".format(command))
-                ser.write(command)
-                successful = True
-                if len(verify_list) > 0:
-                    for entry in verify_list:
-                        status = bytes_to_str(ser.readline())
-                        status = status.strip()
-                        if 'LR' in status:
-                            logging.warning('got message while verifying command: {}. Message dumped.'.format(status))
-                            #  dump message, if receiving message while verifying status of command
-                            status = bytes_to_str(ser.readline())
-                            status = status.strip()
-                        if entry != status:
-                            logging.warning(
-                                'could not verify {expected} != {status}'.format(expected=entry, status=status))
-                            successful = False
-                        else:
-                            logging.debug('verified {status}'.format(status=status))
-                    status_q.put(successful)
-
-                time.sleep(0.2)
-                WRITE_DATA = False
+        starts a thread for writing messages to a serial port; the next command is written as soon as the command
+        engine has received all expected responses of the previous command
+        """
+        command_engine = self.driver.command_engine
+        while self.driver.writing_thread_active:
+            command = command_engine.next_command(timeout=variables.SERIAL_READ_TIMEOUT)
+            if command is None:
+                continue
+            logging.debug("sending command '{}'".format(command))
+            self.driver.ser.write(command.get_bytes())
+            command_engine.command_written(command)
+
+
+default_driver = ModemDriver()
+# module level access to the default driver, which is used if no driver is passed to Protocol, IPC or module_config
+response_q = default_driver.response_q
+command_engine = default_driver.command_engine
 
 
 def start_send_receive_threads(serial_conn):
     """
-    starts threads for communication with serial port
+    starts threads of the default driver for communication with serial port
     :param serial_conn: object for serial connection from pyserial library
     """
-    global ser
-    ser = serial_conn
-    t1 = ReadingThread(name='producer')
-    t2 = WritingThread(name='consumer')
+    default_driver.start(serial_conn)
 
-    t1.start()
-    time.sleep(0.5)
-    t2.start()
-    time.sleep(0.5)
+
+def get_frame_statistics():
+    """
+    :return: counters of the parser used by the reading thread of the default driver as dict
+    """
+    return default_driver.get_frame_statistics()
+
+
+def get_command_statistics():
+    """
+    :return: latency statistics of the commands handled by the default driver as dict
+    """
+    return default_driver.get_command_statistics()
+
+
+def dump_command_statistics(file_path):
+    """
+    writes latency statistics of the commands handled by the default driver to a JSON file
+    :param file_path: path of the file
+    """
+    default_driver.dump_command_statistics(file_path)
+
+
+def get_remaining_airtime_budget():
+    """
+    :return: time on air in seconds which the default driver can use now or None if the duty cycle is not limited
+    """
+    return default_driver.get_remaining_airtime_budget()
 
 
 def execute_command(command_as_str, verification_list=None):
     """
-    helper function to send AT-command to serial port
+    helper function to send AT-command to serial port using the default driver
     :param command_as_str: command which should be sent
     :param verification_list: list of expected results; can also be empty if result of command should not be verified
     :return: True if expected results equal to results received from serial port, else False
     """
-    if verification_list is None:
-        verification_list = []
-    writing_q.put((command_as_str, verification_list))
-    if len(verification_list) != 0:
-        return status_q.get(timeout=variables.COMMAND_VERIFICATION_TIMEOUT)
+    return default_driver.execute_command(command_as_str, verification_list)
 
 
-if __name__ == '__main__':
-    p = ReadingThread(name='producer')
-    c = WritingThread(name='consumer')
-
-    p.start()
-    time.sleep(0.5)
-    c.start()
-    time.sleep(0.5)
-    writing_q.put(('AT', ['AT,OK']))
-    writing_q.put(('AT', []))
-
-    time.sleep(2)
-    print(response_q.get())
+def send_frame(payload):
+    """
+    sends a message over the LoRa network using the default driver
+    :param payload: message which should be sent as str
+    :return: future which resolves to True if the LoRa module has confirmed sending the message, else to False
+    """
+    return default_driver.send_frame(payload)
@@ -0,0 +1,124 @@
+import concurrent.futures
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+__author__ = "Marvin Rausch"
+
+# priority classes of sent frames; frames of a lower class are sent first
+REPLY = 0  # acknowledgements and route replies
+ROUTE_ERROR = 1
+FORWARD = 2  # frames of other nodes which are forwarded by this node
+LOCAL = 3  # frames originated by this node
+PRIORITY_NAMES = {REPLY: 'reply', ROUTE_ERROR: 'route_error', FORWARD: 'forward', LOCAL: 'local'}
+
+
+class TransmitScheduler:
+    """
+    sends frames in a thread of its own ordered by priority class (in order of submission within a class), so the
+    thread processing received frames only enqueues acknowledgements and forwarded frames instead of waiting until the
+    LoRa module has sent them
+    """
+
+    def __init__(self, send_function, name='transmit-scheduler'):
+        """
+        constructor of TransmitScheduler class
+        :param send_function: function which sends a frame (str) and returns True if the LoRa module confirmed sending
+        :param name: name of the thread
+        """
+        self.send_function = send_function
+        self.name = name
+        self.condition = threading.Condition()
+        # (priority, sequence number, enqueue time, frame, future)
+        self.queue = []
+        self.sequence_numbers = itertools.count()
+        self.running = False
+        self.thread = None
+        self.statistics = {priority: {'queued': 0, 'sent': 0, 'total_wait': 0, 'max_wait': 0}
+                           for priority in PRIORITY_NAMES}
+
+    def start(self):
+        """
+        starts the thread which sends the queued frames
+        """
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._send_queued_frames, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        stops the thread; frames which are not sent yet are discarded
+        """
+        with self.condition:
+            self.running = False
+            discarded_frames = self.queue
+            self.queue = []
+            for priority, _, _, _, _ in discarded_frames:
+                self.statistics[priority]['queued'] -= 1
+            self.condition.notify_all()
+        for _, _, _, frame, future in discarded_frames:
+            logging.debug(f"discard frame '{frame}', because transmit scheduler was stopped")
+            future.set_result(False)
+
+    def is_running(self):
+        """
+        :return: True if the thread was started and not stopped yet
+        """
+        return self.running
+
+    def submit(self, frame, priority=LOCAL):
+        """
+        adds a frame to the queue of its priority class
+        :param frame: frame as str
+        :param priority: priority class (REPLY, ROUTE_ERROR, FORWARD or LOCAL)
+        :return: concurrent.futures.Future with result True if the LoRa module confirmed sending the frame, else False
+        """
+        future = concurrent.futures.Future()
+        with self.condition:
+            if not self.running:
+                future.set_result(False)
+                return future
+            heapq.heappush(self.queue, (priority, next(self.sequence_numbers), time.monotonic(), frame, future))
+            self.statistics[priority]['queued'] += 1
+            self.condition.notify_all()
+        return future
+
+    def get_statistics(self):
+        """
+        :return: dict with name of the priority class as key and number of queued frames, number of sent frames, mean
+        and max time in seconds the frames waited in the queue as value
+        """
+        with self.condition:
+            return {PRIORITY_NAMES[priority]: {'queued': statistics['queued'], 'sent': statistics['sent'],
+                                               'mean_wait': statistics['total_wait'] / statistics['sent']
+                                               if statistics['sent'] > 0 else 0,
+                                               'max_wait': statistics['max_wait']}
+                    for priority, statistics in self.statistics.items()}
+
+    def _send_queued_frames(self):
+        """
+        sends the queued frame with the highest priority until the scheduler is stopped
+        """
+        while True:
+            with self.condition:
+                while self.running and len(self.queue) == 0:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                priority, _, enqueued_at, frame, future = heapq.heappop(self.queue)
+                wait_time = time.monotonic() - enqueued_at
+                statistics = self.statistics[priority]
+                statistics['queued'] -= 1
+                statistics['sent'] += 1
+                statistics['total_wait'] += wait_time
+                statistics['max_wait'] = max(statistics['max_wait'], wait_time)
+            try:
+                future.set_result(bool(self.send_function(frame)))
+            except Exception as e:
+                logging.warning(f"could not send frame '{frame}': {e}")
+                future.set_result(False)
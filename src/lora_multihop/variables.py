@@ -7,6 +7,7 @@ SAVE_COMMAND = 'AT+SAVE'
 STATUS_OK = 'AT,OK'
 SOURCE_ADDRESS = '0137'
 GET_ADDR = 'AT+ADDR?'
+GET_CONFIG = 'AT+CFG?'
 MY_ADDRESS = SOURCE_ADDRESS
 ENCODING = 'utf-8'
 TERMINATOR = '\r\n'
@@ -21,3 +22,37 @@ JAVA_IPC_MESSAGE_VALUES_DELIMITER = ','
 COMMAND_VERIFICATION_TIMEOUT = 25
 TTL_START_VALUE = 5
 MAX_SLEEP_TIME = 0
+SERIAL_READ_TIMEOUT = 0.5  # max time in seconds the serial threads block before checking whether they should stop
+SERIAL_POLL_INTERVAL = 0.01  # used if the serial connection does not provide a file descriptor
+MAX_FRAME_LENGTH = 240  # max payload length in bytes of a frame sent or received by the LoRa module
+STATISTICS_WINDOW_SIZE = 500  # number of recent commands per command type used to compute latency percentiles
+DUTY_CYCLE = None  # max share of time on air (e.g. 0.01 for 1 % in the 868 MHz band); None disables the limitation
+DUTY_CYCLE_WINDOW = 3600  # length in seconds of the sliding window used to check the duty cycle
+SEND_WINDOW_SIZE = 1  # max number of unacknowledged messages per destination; 1 sends stop-and-wait
+ACK_TIMEOUT = 5  # time in seconds to wait for the acknowledgement of a message before it is sent again
+# the ack timeout of every destination adapts to the measured round-trip times within these bounds (in seconds);
+# ACK_TIMEOUT is used until the first round-trip time was measured
+MIN_ACK_TIMEOUT = 0.5
+MAX_ACK_TIMEOUT = 60
+MAX_SEND_ATTEMPTS = 3  # max number of transmissions of a message
+REORDER_BUFFER_SIZE = 32  # max number of messages buffered per source to deliver them in order
+# time in seconds after which a missing message is skipped; covers all transmissions with doubled ack timeouts
+REORDER_TIMEOUT = ACK_TIMEOUT * (2 ** MAX_SEND_ATTEMPTS - 1)
+# max time in seconds acknowledgements are delayed to confirm several messages with one cumulative acknowledgement;
+# None sends one acknowledgement per message
+ACK_DELAY = None
+ACK_BATCH_SIZE = 8  # number of received messages after which a delayed acknowledgement is sent immediately
+MESSAGE_READ_SIZE = 4096  # max number of bytes read from the TCP socket for data exchange and sent as one datagram
+REASSEMBLY_BUFFER_SIZE = 4  # max number of incomplete datagrams per source
+REASSEMBLY_TIMEOUT = 60  # time in seconds after which an incomplete datagram is dropped
+COALESCING_DELAY = 0.2  # max time in seconds small writes of the application are buffered to fill a frame
+COALESCING_NO_DELAY = False  # True sends every write of the application immediately
+COMPRESSION = False  # True compresses messages with zlib if it saves at least COMPRESSION_MIN_SAVING bytes
+COMPRESSION_LEVEL = 9  # zlib compression level (1 - 9)
+COMPRESSION_MIN_SAVING = 8  # min number of saved bytes to send a message compressed (covers the fragment header)
+# file with typical payloads used as preset dictionary; must be the same on all nodes; None uses no dictionary
+COMPRESSION_DICTIONARY_FILE = None
+# encoding this node wants to receive messages with; proposed to other nodes in connect requests ('base64', 'ascii85'
+# or 'escape', see payload_encoding)
+PAYLOAD_ENCODING = 'base64'
+HEADER_FORMAT = 'ascii'  # format of sent headers: 'ascii' (pipe-delimited) or 'binary'; all nodes decode both
@@ -0,0 +1,75 @@
+import threading
+
+__author__ = "Marvin Rausch"
+
+# kinds of responses a thread can wait for
+ACKNOWLEDGEMENT = 'acknowledgement'  # key: message id
+ROUTE_REPLY = 'route_reply'  # key: address of the requested node
+REGISTRATION = 'registration'  # key: peer id of the own registration message
+
+
+class WaiterRegistry:
+    """
+    lets threads wait for responses of the LoRa network; a waiter is registered before the request is sent and
+    completed by the handler which processes the response, so the waiting thread wakes up immediately instead of
+    polling the protocol state
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (kind, key) -> threading.Event
+        self.waiters = {}
+
+    def register(self, kind, key):
+        """
+        registers a waiter; threads waiting for the same response share the waiter
+        :param kind: kind of the response (e.g. ACKNOWLEDGEMENT)
+        :param key: id of the response (e.g. message id)
+        :return: threading.Event which is set when the response was processed
+        """
+        with self.lock:
+            waiter = self.waiters.get((kind, key))
+            if waiter is None:
+                waiter = threading.Event()
+                self.waiters[(kind, key)] = waiter
+            return waiter
+
+    def get(self, kind, key):
+        """
+        :param kind: kind of the response
+        :param key: id of the response
+        :return: registered threading.Event or None if no waiter is registered (e.g. it was already completed)
+        """
+        with self.lock:
+            return self.waiters.get((kind, key))
+
+    def complete(self, kind, key):
+        """
+        wakes up the threads waiting for a response and removes the waiter
+        :param kind: kind of the response
+        :param key: id of the response
+        :return: True if a waiter was registered, else False
+        """
+        with self.lock:
+            waiter = self.waiters.pop((kind, key), None)
+        if waiter is None:
+            return False
+        waiter.set()
+        return True
+
+    def unregister(self, kind, key):
+        """
+        removes a waiter without waking up waiting threads (e.g. after a timeout)
+        :param kind: kind of the response
+        :param key: id of the response
+        """
+        with self.lock:
+            self.waiters.pop((kind, key), None)
+
+    def get_keys(self, kind):
+        """
+        :param kind: kind of the response
+        :return: list of keys of registered waiters of the passed kind
+        """
+        with self.lock:
+            return [key for waiter_kind, key in self.waiters if waiter_kind == kind]
@@ -1,11 +1,33 @@
+import asyncio
 import logging
 import time
 
 import serial
 
-from lora_multihop import serial_connection, module_config
+from lora_multihop import serial_connection, module_config, async_transport
 from lora_multihop.ipc import IPC
 
+# if True the node runs in a single thread using asyncio (see lora_multihop.async_transport)
+USE_ASYNCIO = False
+# if True configuration and address are only written if the LoRa module uses other values; the TCP sockets are started
+# while the LoRa module is checked
+FAST_STARTUP = True
+# if True changed settings are persisted on the LoRa module (AT+SAVE), so the next start does not need to write them
+SAVE_MODULE_SETTINGS = False
+
+
+async def start_async_node(ser, config_str, address):
+    """
+    configures LoRa module and starts node in asyncio mode
+    """
+    driver = async_transport.AsyncModemDriver(ser, loop=asyncio.get_event_loop())
+    driver.start()
+    await async_transport.config_module(driver, config_str)
+    await async_transport.set_address(driver, address)
+    async_ipc = async_transport.AsyncIPC(6000, 6100, async_transport.AsyncProtocol(driver, address=address))
+    await async_ipc.start_ipc()
+
+
 if __name__ == '__main__':
     config_str = 'AT+CFG=433500000,20,9,7,1,1,0,0,0,0,3000,8,4'
 
@@ -14,14 +36,25 @@ if __name__ == '__main__':
 
     ser = serial.serial_for_url('/dev/ttyS0', baudrate=115200, timeout=20)
 
-    serial_connection.start_send_receive_threads(ser)
-
-    time.sleep(1)
-    module_config.config_module(config_str)
-    time.sleep(1)
-    module_config.set_address('0200')  # set address of LoRa modem
-    time.sleep(2)
-
-    ipc = IPC(ipc_port=6000, message_port=6100)  # set ports for both TCP sockets
-    ipc.start_ipc()  # start application
-
+    if USE_ASYNCIO:
+        event_loop = asyncio.get_event_loop()
+        event_loop.run_until_complete(start_async_node(ser, config_str, '0200'))
+        event_loop.run_forever()
+    elif FAST_STARTUP:
+        serial_connection.start_send_receive_threads(ser)
+        ipc = IPC(ipc_port=6000, message_port=6100, module_setup=lambda: module_config.fast_config_module(
+            config_str, '0200', save=SAVE_MODULE_SETTINGS)['address'])
+        ipc.start_ipc()  # start application
+        ipc.ready.wait()
+        print(f'node ready after {ipc.time_to_ready:.3f}s')
+    else:
+        serial_connection.start_send_receive_threads(ser)
+
+        time.sleep(1)
+        module_config.config_module(config_str)
+        time.sleep(1)
+        module_config.set_address('0200')  # set address of LoRa modem
+        time.sleep(2)
+
+        ipc = IPC(ipc_port=6000, message_port=6100)  # set ports for both TCP sockets
+        ipc.start_ipc()  # start application
@@ -65,16 +65,27 @@ class LocalNetwork:
 
     def start_sending(self):
         while self.tcp_communication_running:
-            while not serial_connection.writing_q.empty():
-                payload = serial_connection.writing_q.get()[0]
+            command = serial_connection.command_engine.next_command(timeout=0.5)
+            if command is not None:
+                payload = command.command
                 if 'AT' not in payload:
                     message_to_send = serial_connection.str_to_bytes(f'LR,{self.module_address},10,'+ payload)
                     for connection in self.connection_list:
                         connection.send(message_to_send)
-                serial_connection.status_q.put(True)
+                confirm_command(command)
                 time.sleep(0.5)
         print('sending thread stopped')
 
     def stop_local_consumer_producer(self):
         self.tcp_communication_running = False
         self.socket.close()
+
+
+def confirm_command(command):
+    """
+    answers a command taken from the command engine with the expected responses of the LoRa module
+    :param command: object of class Command
+    """
+    serial_connection.command_engine.command_written(command)
+    for response in command.expected_responses:
+        serial_connection.command_engine.process_response(response)
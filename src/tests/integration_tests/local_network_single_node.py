@@ -4,6 +4,7 @@ import time
 from queue import Queue
 
 from lora_multihop import serial_connection
+from tests.integration_tests.local_network import confirm_command
 
 
 class LocalNetwork:
@@ -47,11 +48,13 @@ class LocalNetwork:
                     serial_connection.response_q.put(data.decode())
             except socket.error:
                 time.sleep(0.5)
-            while not serial_connection.writing_q.empty():
-                payload = serial_connection.writing_q.get()[0]
+            command = serial_connection.command_engine.next_command(timeout=0)
+            while command is not None:
+                payload = command.command
                 if 'AT' not in payload:
                     connection.sendall(serial_connection.str_to_bytes(f'LR,{self.module_address},10,'+ payload))
-                serial_connection.status_q.put(True)
+                confirm_command(command)
+                command = serial_connection.command_engine.next_command(timeout=0)
 
     def stop_local_consumer_producer(self):
         self.tcp_communication_running = False
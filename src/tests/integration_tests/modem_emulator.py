@@ -0,0 +1,330 @@
+import logging
+import os
+import random
+import selectors
+import threading
+import time
+import tty
+
+from lora_multihop import airtime, variables
+
+__author__ = "Marvin Rausch"
+
+STATUS_ERROR_COMMAND = 'AT,ERR:CMD'
+STATUS_ERROR_PARAMETER = 'AT,ERR:PARA'
+POLL_TIMEOUT = 0.05  # max time in seconds the thread of an emulated module blocks before checking whether to stop
+
+
+class Air:
+    """
+    radio medium shared by emulated LoRa modules; decides which modules receive a frame
+    """
+
+    def __init__(self, loss_probability=0.0, time_scale=1.0, seed=None):
+        """
+        constructor of Air class
+        :param loss_probability: probability that a frame is not received by a module in range
+        :param time_scale: factor applied to the time on air of every frame (e.g. 0 to send without delay)
+        :param seed: seed for the random number generator which decides about lost frames
+        """
+        self.loss_probability = loss_probability
+        self.time_scale = time_scale
+        self.random = random.Random(seed)
+        self.modems = []
+        self.links = None
+        self.lock = threading.Lock()
+
+    def add_modem(self, modem):
+        """
+        adds an emulated LoRa module to the medium
+        :param modem: object of class EmulatedModem
+        """
+        with self.lock:
+            self.modems.append(modem)
+
+    def set_topology(self, links):
+        """
+        restricts which modules can hear each other; without topology every module receives every frame
+        :param links: list of tuples (address, address); links are bidirectional
+        """
+        with self.lock:
+            self.links = set()
+            for first_address, second_address in links:
+                self.links.add((first_address, second_address))
+                self.links.add((second_address, first_address))
+
+    def is_in_range(self, sender_address, receiver_address):
+        """
+        :param sender_address: address of sending module
+        :param receiver_address: address of receiving module
+        :return: True if the receiver can hear the sender, else False
+        """
+        return self.links is None or (sender_address, receiver_address) in self.links
+
+    def transmit(self, sender, payload):
+        """
+        delivers a frame to all modules which are in range of the sender
+        :param sender: object of class EmulatedModem which sent the frame
+        :param payload: payload of the frame as bytes
+        """
+        with self.lock:
+            receivers = [modem for modem in self.modems if modem is not sender and
+                         self.is_in_range(sender.address, modem.address)]
+            lost = [self.random.random() < self.loss_probability for _ in receivers]
+        for receiver, is_lost in zip(receivers, lost):
+            if is_lost:
+                receiver.lost_frames += 1
+            else:
+                receiver.receive_frame(sender.address, payload)
+
+
+class EmulatedModem:
+    """
+    emulates a HIMO-01M LoRa module on a pseudo terminal; the path of the terminal (port) can be opened with
+    serial.serial_for_url like the UART of a real module
+    """
+
+    def __init__(self, air, address='0000', configuration=variables.MODULE_CONFIG):
+        """
+        constructor of EmulatedModem class
+        :param air: object of class Air
+        :param address: initial address of the module
+        :param configuration: initial AT+CFG command of the module
+        """
+        self.air = air
+        self.address = address
+        self.configuration = configuration
+        self.saved_settings = None
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.master_fd)
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+        self.buffer = bytearray()
+        self.payload_length = None
+        self.write_lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.received_commands = []
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.received_frames = 0
+        self.lost_frames = 0
+        air.add_modem(self)
+
+    def start(self):
+        """
+        starts thread which answers the commands written to the pseudo terminal
+        """
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f'emulator-{self.address}', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        stops thread and closes the pseudo terminal
+        """
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+    def receive_frame(self, sender_address, payload):
+        """
+        writes a frame received over the air to the serial port
+        :param sender_address: address of the sending module
+        :param payload: payload as bytes
+        """
+        self.received_frames += 1
+        self._write(f'LR,{sender_address},{len(payload):02x},'.encode(variables.ENCODING) + payload +
+                    variables.TERMINATOR.encode(variables.ENCODING))
+
+    def get_time_on_air(self, payload_length):
+        """
+        :param payload_length: length of payload in bytes
+        :return: time on air in seconds using the current configuration
+        """
+        return airtime.parse_module_config(self.configuration).get_time_on_air(payload_length) * self.air.time_scale
+
+    def _run(self):
+        """
+        answers commands until stop is called
+        """
+        selector = selectors.DefaultSelector()
+        selector.register(self.master_fd, selectors.EVENT_READ)
+        try:
+            while self.running:
+                if len(selector.select(POLL_TIMEOUT)) == 0:
+                    continue
+                try:
+                    self.buffer.extend(os.read(self.master_fd, 1024))
+                except OSError:
+                    break
+                self._process_buffer()
+        finally:
+            selector.close()
+
+    def _process_buffer(self):
+        """
+        processes all complete commands and payloads in the buffer
+        """
+        terminator = variables.TERMINATOR.encode(variables.ENCODING)
+        while True:
+            if self.payload_length is not None:
+                if len(self.buffer) < self.payload_length + len(terminator):
+                    return
+                payload = bytes(self.buffer[:self.payload_length])
+                del self.buffer[:self.payload_length + len(terminator)]
+                self.payload_length = None
+                self._send_payload(payload)
+                continue
+            line_end = self.buffer.find(terminator)
+            if line_end == -1:
+                return
+            line = bytes(self.buffer[:line_end]).decode(variables.ENCODING, errors='replace')
+            del self.buffer[:line_end + len(terminator)]
+            self._process_command(line)
+
+    def _process_command(self, command):
+        """
+        answers an AT-command like the HIMO-01M
+        :param command: command without terminator as str
+        """
+        logging.debug(f'emulator {self.address} received: {command}')
+        self.received_commands.append(command)
+        if command == 'AT' or command == 'AT+RX':
+            self._write_status(variables.STATUS_OK)
+        elif command.startswith('AT+CFG='):
+            try:
+                airtime.parse_module_config(command)
+                self.configuration = command
+                self._write_status(variables.STATUS_OK)
+            except ValueError:
+                self._write_status(STATUS_ERROR_PARAMETER)
+        elif command == variables.GET_CONFIG:
+            self._write_status(f"AT,{self.configuration[len('AT+CFG='):]},OK")
+        elif command.startswith('AT+ADDR='):
+            address = command[len('AT+ADDR='):]
+            if len(address) == 4:
+                self.address = address
+                self._write_status(variables.STATUS_OK)
+            else:
+                self._write_status(STATUS_ERROR_PARAMETER)
+        elif command == variables.GET_ADDR:
+            self._write_status(f'AT,{self.address},OK')
+        elif command.startswith('AT+SEND='):
+            try:
+                payload_length = int(command[len('AT+SEND='):])
+            except ValueError:
+                payload_length = 0
+            if 0 < payload_length <= variables.MAX_FRAME_LENGTH:
+                self.payload_length = payload_length
+                self._write_status(variables.STATUS_OK)
+            else:
+                self._write_status(STATUS_ERROR_PARAMETER)
+        elif command == variables.SAVE_COMMAND:
+            self.saved_settings = (self.configuration, self.address)
+            self._write_status(variables.STATUS_OK)
+        else:
+            self._write_status(STATUS_ERROR_COMMAND)
+
+    def _send_payload(self, payload):
+        """
+        sends a payload over the air; the status 'AT,SENDED' is written after the time on air, when the frame was
+        delivered to the receivers
+        :param payload: payload as bytes
+        """
+        self._write_status('AT,SENDING')
+        time.sleep(self.get_time_on_air(len(payload)))
+        self.sent_frames += 1
+        self.sent_bytes += len(payload)
+        self.air.transmit(self, payload)
+        self._write_status('AT,SENDED')
+
+    def _write_status(self, status):
+        """
+        :param status: status line without terminator as str
+        """
+        self._write((status + variables.TERMINATOR).encode(variables.ENCODING))
+
+    def _write(self, data):
+        """
+        writes bytes to the pseudo terminal; is called by the thread of this module and by the threads of other
+        modules delivering frames
+        :param data: bytes to write
+        """
+        with self.write_lock:
+            try:
+                os.write(self.master_fd, data)
+            except OSError:
+                logging.debug(f'emulator {self.address} could not write to pseudo terminal')
+
+
+class EmulatedNetwork:
+    """
+    network of nodes consisting of an emulated LoRa module, a ModemDriver and a Protocol object each; used to run the
+    complete stack without hardware
+    """
+
+    def __init__(self, addresses, links=None, loss_probability=0.0, time_scale=1.0, seed=None):
+        """
+        constructor of EmulatedNetwork class
+        :param addresses: list of addresses of the nodes
+        :param links: list of tuples (address, address) of nodes which can hear each other; None for a full mesh
+        :param loss_probability: probability that a frame is not received by a node in range
+        :param time_scale: factor applied to the time on air of every frame
+        :param seed: seed for the random number generator which decides about lost frames
+        """
+        self.air = Air(loss_probability, time_scale, seed)
+        if links is not None:
+            self.air.set_topology(links)
+        self.modems = {}
+        self.drivers = {}
+        self.protocols = {}
+        for address in addresses:
+            self.modems[address] = EmulatedModem(self.air, address)
+
+    def start(self):
+        """
+        starts emulated modules, drivers and protocol threads
+        """
+        # imported here, so the emulator itself can be used without the protocol stack
+        import serial
+        from lora_multihop import serial_connection
+        from lora_multihop.protocol import Protocol
+
+        for address, modem in self.modems.items():
+            modem.start()
+            driver = serial_connection.ModemDriver(serial.serial_for_url(modem.port, baudrate=115200, timeout=0),
+                                                   name=address)
+            driver.start()
+            self.drivers[address] = driver
+            self.protocols[address] = Protocol(driver=driver, address=address)
+            self.protocols[address].start_protocol_thread()
+
+    def get_sent_frames(self):
+        """
+        :return: number of frames sent by all nodes
+        """
+        return sum(modem.sent_frames for modem in self.modems.values())
+
+    def stop(self):
+        """
+        stops all threads and closes the pseudo terminals
+        """
+        for protocol_obj in self.protocols.values():
+            protocol_obj.stop()
+        for driver in self.drivers.values():
+            driver.reading_thread.join()
+            driver.writing_thread.join()
+            driver.ser.close()
+        for modem in self.modems.values():
+            modem.stop()
+
+
+def create_line_topology(addresses):
+    """
+    :param addresses: list of addresses
+    :return: list of links connecting every node only with its predecessor and successor
+    """
+    return [(addresses[i], addresses[i + 1]) for i in range(len(addresses) - 1)]
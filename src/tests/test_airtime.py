@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+from lora_multihop import airtime, serial_connection, variables
+from lora_multihop.airtime import LoRaConfiguration, DutyCycleScheduler
+from lora_multihop.command_engine import CommandEngine
+
+__author__ = "Marvin Rausch"
+
+
+class AirtimeTest(unittest.TestCase):
+
+    def test_get_time_on_air_sf7_bw125(self):
+        configuration = LoRaConfiguration(125000, 7, 1)
+        self.assertAlmostEqual(0.056576, configuration.get_time_on_air(20), places=6)
+
+    def test_get_time_on_air_low_data_rate_optimize(self):
+        # symbol time of SF12 at 125 kHz is 32.768 ms
+        configuration = LoRaConfiguration(125000, 12, 1)
+        self.assertAlmostEqual(1.318912, configuration.get_time_on_air(20), places=6)
+
+    def test_parse_module_config(self):
+        configuration = airtime.parse_module_config(variables.MODULE_CONFIG)
+        self.assertEqual(500000, configuration.bandwidth)
+        self.assertEqual(7, configuration.spreading_factor)
+        self.assertEqual(1, configuration.coding_rate)
+        self.assertTrue(configuration.crc)
+        self.assertFalse(configuration.implicit_header)
+        self.assertEqual(4, configuration.preamble_length)
+
+    def test_get_max_frame_length(self):
+        self.assertEqual(variables.MAX_FRAME_LENGTH,
+                         airtime.parse_module_config(variables.MODULE_CONFIG).get_max_frame_length())
+        implicit_header_configuration = airtime.parse_module_config('AT+CFG=433500000,20,9,7,1,1,1,0,0,0,3000,64,4')
+        self.assertEqual(64, implicit_header_configuration.get_max_frame_length())
+
+    def test_parse_module_config_bad_values(self):
+        with self.assertRaises(ValueError):
+            airtime.parse_module_config('AT+ADDR=0137')
+        with self.assertRaises(ValueError):
+            airtime.parse_module_config('AT+CFG=433500000,20,9,7')
+        with self.assertRaises(ValueError):
+            airtime.parse_module_config('AT+CFG=433500000,20,10,7,1,1,0,0,0,0,3000,8,4')
+
+    def test_duty_cycle_scheduler_disabled(self):
+        scheduler = DutyCycleScheduler(duty_cycle=None)
+        scheduler.record_transmission(100)
+        self.assertEqual(0, scheduler.get_delay(100))
+        self.assertIsNone(scheduler.get_remaining_budget())
+
+    def test_duty_cycle_scheduler_defers_frame_until_budget_is_free(self):
+        scheduler = DutyCycleScheduler(duty_cycle=0.1, window=10)
+        with patch.object(airtime.time, 'monotonic') as monotonic_mocked:
+            monotonic_mocked.return_value = 0
+            scheduler.record_transmission(0.4)
+            monotonic_mocked.return_value = 2
+            scheduler.record_transmission(0.4)
+            monotonic_mocked.return_value = 3
+            self.assertAlmostEqual(0.2, scheduler.get_remaining_budget())
+            self.assertEqual(0, scheduler.get_delay(0.2))
+            self.assertEqual(7, scheduler.get_delay(0.3))
+            self.assertEqual(9, scheduler.get_delay(0.7))
+            monotonic_mocked.return_value = 10
+            self.assertAlmostEqual(0.6, scheduler.get_remaining_budget())
+            self.assertEqual(0, scheduler.get_delay(0.3))
+
+    def test_command_engine_defers_frame(self):
+        scheduler = DutyCycleScheduler(duty_cycle=0.1, window=10)
+        command_engine = CommandEngine(timeout=10, transmit_scheduler=scheduler)
+        command_engine.submit_sequence([('AT+SEND=1', ['AT,OK']), ('a', [])], airtime=1)
+        at_send_command = command_engine.next_command(timeout=0)
+        self.assertEqual(1, at_send_command.airtime)
+        self.assertEqual(0, scheduler.get_remaining_budget())
+        command_engine.process_response('AT,OK')
+        command_engine.command_written(command_engine.next_command(timeout=0))
+        command_engine.submit_sequence([('AT+SEND=1', ['AT,OK']), ('a', [])], airtime=1)
+        self.assertIsNone(command_engine.next_command(timeout=0))
+        self.assertGreater(command_engine.get_transmit_delay(), 9)
+
+    def test_driver_send_frame_uses_time_on_air_of_configuration(self):
+        driver = serial_connection.ModemDriver(MagicMock())
+        driver.set_lora_configuration('AT+CFG=433500000,20,7,7,1,1,0,0,0,0,3000,8,8')
+        driver.send_frame('a' * 20)
+        self.assertAlmostEqual(0.056576, driver.command_engine.next_command(timeout=0).airtime, places=6)
+        self.assertIsNone(driver.get_remaining_airtime_budget())
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import tty
+import unittest
+from unittest.mock import patch
+
+import serial
+
+from lora_multihop import async_transport, variables
+
+__author__ = "Marvin Rausch"
+
+
+class FakeModem:
+    """
+    answers the commands written to the master side of a pseudo terminal like a LoRa module
+    """
+
+    def __init__(self, fd, address='0131'):
+        self.fd = fd
+        self.address = address
+        self.buffer = b''
+        self.payload_length = None
+        self.sent_payloads = []
+
+    def read(self):
+        self.buffer += os.read(self.fd, 1024)
+        while True:
+            if self.payload_length is not None:
+                if len(self.buffer) < self.payload_length + 2:
+                    return
+                self.sent_payloads.append(self.buffer[:self.payload_length].decode())
+                self.buffer = self.buffer[self.payload_length + 2:]
+                self.payload_length = None
+                os.write(self.fd, b'AT,SENDING\r\nAT,SENDED\r\n')
+                continue
+            line_end = self.buffer.find(b'\r\n')
+            if line_end == -1:
+                return
+            line = self.buffer[:line_end].decode()
+            self.buffer = self.buffer[line_end + 2:]
+            if line.startswith('AT+SEND='):
+                self.payload_length = int(line[len('AT+SEND='):])
+                os.write(self.fd, b'AT,OK\r\n')
+            elif line == variables.GET_ADDR:
+                os.write(self.fd, f'AT,{self.address},OK\r\n'.encode())
+            else:
+                os.write(self.fd, b'AT,OK\r\n')
+
+    def receive_frame(self, sender, payload):
+        os.write(self.fd, f'LR,{sender},{len(payload):02x},{payload}\r\n'.encode())
+
+
+class AsyncTransportTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.master, slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(slave)
+        self.ser = serial.Serial(os.ttyname(slave), timeout=0)
+        os.close(slave)
+        self.modem = FakeModem(self.master)
+        self.loop.add_reader(self.master, self.modem.read)
+        self.driver = async_transport.AsyncModemDriver(self.ser, name='test', loop=self.loop)
+        self.driver.start()
+        self.protocol = async_transport.AsyncProtocol(self.driver, address='0131')
+        self.protocol.start_protocol_thread()
+
+    def tearDown(self) -> None:
+        self.protocol.stop()
+        self.loop.remove_reader(self.master)
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        self.ser.close()
+        os.close(self.master)
+
+    def run_coroutine(self, coroutine):
+        return self.loop.run_until_complete(asyncio.wait_for(coroutine, 5))
+
+    def test_send_frame_async(self):
+        self.assertTrue(self.run_coroutine(self.driver.send_frame_async('hello')))
+        self.assertEqual(['hello'], self.modem.sent_payloads)
+
+    def test_execute_command_async_edge_no_response(self):
+        self.modem.read = lambda: os.read(self.master, 1024)
+        self.loop.remove_reader(self.master)
+        self.loop.add_reader(self.master, self.modem.read)
+        self.driver.command_engine.timeout = 0.1
+        self.assertFalse(self.run_coroutine(self.driver.execute_command_async('AT', [variables.STATUS_OK])))
+
+    def test_get_current_address(self):
+        self.assertEqual('0131', self.run_coroutine(async_transport.get_current_address(self.driver)))
+
+    def test_received_message_is_processed_by_event_loop(self):
+        self.protocol.connected_node = '0132'
+        self.modem.receive_frame('0132', '|0132|1|5|0131|0131|000001|aGVsbG8=|')
+        message = self.run_coroutine(self.protocol.received_messages_queue.get())
+        self.assertEqual(b'hello', message)
+        self.run_coroutine(asyncio.gather(*self.protocol.sending_tasks))
+        self.assertEqual(['|0131|2|5|0132|1|'], self.modem.sent_payloads)
+
+    def test_send_message_async_acknowledged(self):
+        self.protocol.connected_node = '0132'
+        self.protocol.routing_table.add_routing_table_entry('0132', '0132', 1)
+
+        async def acknowledge():
+            await asyncio.sleep(0.05)
+            self.modem.receive_frame('0132', '|0132|2|5|0131|000001|')
+
+        result, _ = self.run_coroutine(asyncio.gather(self.protocol.send_message_async(b'hello'), acknowledge()))
+        self.assertTrue(result)
+        self.assertEqual([], self.protocol.messages_acknowledgment)
+
+    def test_send_message_async_edge_no_ack(self):
+        self.protocol.connected_node = '0132'
+        self.protocol.routing_table.add_routing_table_entry('0132', '0132', 1)
+        with patch.object(async_transport.AsyncProtocol, 'ACK_TIMEOUT', 0.05):
+            self.assertFalse(self.run_coroutine(self.protocol.send_message_async(b'hello')))
+        self.assertEqual(4, len(self.modem.sent_payloads))
+        self.assertEqual({}, self.protocol.routing_table.get_best_route_for_destination('0132'))
+
+    def test_send_route_request_message_async(self):
+        async def reply():
+            await asyncio.sleep(0.05)
+            self.modem.receive_frame('0133', '|0132|4|5|1|0131|0133|')
+
+        result, _ = self.run_coroutine(asyncio.gather(self.protocol.send_route_request_message_async('0132'),
+                                                      reply()))
+        self.assertTrue(result)
+        self.assertEqual('0133', self.protocol.routing_table.get_best_route_for_destination('0132')['next_node'])
+
+    def test_wait_until_edge_timeout(self):
+        self.assertFalse(self.run_coroutine(self.protocol.wait_until(lambda: False, 0.05)))
@@ -0,0 +1,39 @@
+import time
+import unittest
+
+from lora_multihop.coalescing import Coalescer
+
+__author__ = "Marvin Rausch"
+
+
+class CoalescerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.coalescer = Coalescer(max_size=10, delay=0.05)
+
+    def test_add_edge_frame_full(self):
+        self.assertIsNone(self.coalescer.add(b'hello'))
+        self.assertEqual(b'hello world', self.coalescer.add(b' world'))
+        self.assertIsNone(self.coalescer.get_timeout())
+
+    def test_poll_latency_bound(self):
+        self.coalescer.add(b'a')
+        self.coalescer.add(b'b')
+        self.assertIsNone(self.coalescer.poll())
+        self.assertLessEqual(self.coalescer.get_timeout(), 0.05)
+        time.sleep(0.06)
+        self.assertEqual(b'ab', self.coalescer.poll())
+        self.assertIsNone(self.coalescer.poll())
+        self.assertEqual({'writes': 2, 'flushes': 1}, self.coalescer.get_statistics())
+
+    def test_add_edge_no_delay(self):
+        self.coalescer.no_delay = True
+        self.assertEqual(b'a', self.coalescer.add(b'a'))
+
+    def test_set_no_delay_flushes_buffer(self):
+        self.coalescer.add(b'a')
+        self.assertEqual(b'a', self.coalescer.set_no_delay(True))
+        self.assertIsNone(self.coalescer.set_no_delay(False))
+
+    def test_flush_edge_empty(self):
+        self.assertIsNone(self.coalescer.flush())
@@ -0,0 +1,104 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from lora_multihop.command_engine import CommandEngine
+
+__author__ = "Marvin Rausch"
+
+
+class CommandEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.command_engine = CommandEngine(timeout=10)
+
+    def test_next_command_good(self):
+        command = self.command_engine.submit('AT+RX', ['AT,OK'])
+        self.assertIs(command, self.command_engine.next_command(timeout=0))
+        self.assertTrue(self.command_engine.is_waiting_for_response())
+
+    def test_next_command_edge_no_command(self):
+        self.assertIsNone(self.command_engine.next_command(timeout=0))
+
+    def test_next_command_edge_waiting_for_response_of_previous_command(self):
+        self.command_engine.submit('AT', ['AT,OK'])
+        self.command_engine.submit('AT+RX', ['AT,OK'])
+        self.command_engine.next_command(timeout=0)
+        self.assertIsNone(self.command_engine.next_command(timeout=0))
+        self.command_engine.process_response('AT,OK')
+        self.assertEqual('AT+RX', self.command_engine.next_command(timeout=0).command)
+
+    def test_command_written_without_expected_responses(self):
+        command = self.command_engine.submit('AT+RX')
+        self.command_engine.next_command(timeout=0)
+        self.command_engine.command_written(command)
+        self.assertTrue(command.future.result(timeout=0))
+        self.assertFalse(self.command_engine.is_waiting_for_response())
+
+    def test_process_response_good(self):
+        command = self.command_engine.submit('test', ['AT,SENDING', 'AT,SENDED'])
+        self.command_engine.next_command(timeout=0)
+        self.assertTrue(self.command_engine.process_response('AT,SENDING\r\n'))
+        self.assertFalse(command.future.done())
+        self.assertTrue(self.command_engine.process_response('AT,SENDED\r\n'))
+        self.assertTrue(command.future.result(timeout=0))
+
+    def test_process_response_bad_unexpected_status(self):
+        command = self.command_engine.submit('test', ['AT,SENDING', 'AT,SENDED'])
+        self.command_engine.next_command(timeout=0)
+        self.command_engine.process_response('AT,ERR:CMD')
+        self.assertFalse(command.future.result(timeout=0))
+        self.assertFalse(self.command_engine.is_waiting_for_response())
+
+    def test_process_response_edge_received_message_while_verifying(self):
+        command = self.command_engine.submit('test', ['AT,SENDING', 'AT,SENDED'])
+        self.command_engine.next_command(timeout=0)
+        self.command_engine.process_response('AT,SENDING')
+        self.assertFalse(self.command_engine.process_response('LR,0136,10,|0137|3|8|4|0138|'))
+        self.command_engine.process_response('AT,SENDED')
+        self.assertTrue(command.future.result(timeout=0))
+
+    def test_process_response_edge_engine_idle(self):
+        self.assertFalse(self.command_engine.process_response('AT,0137,OK'))
+
+    def test_submit_sequence_bad_first_command_failed(self):
+        commands = self.command_engine.submit_sequence([('AT+SEND=4', ['AT,OK']),
+                                                        ('test', ['AT,SENDING', 'AT,SENDED'])])
+        self.command_engine.next_command(timeout=0)
+        self.command_engine.process_response('AT,ERR:PARA')
+        self.assertIsNone(self.command_engine.next_command(timeout=0))
+        self.assertFalse(commands[1].future.result(timeout=0))
+
+    def test_next_command_bad_timeout_of_current_command(self):
+        command = self.command_engine.submit('AT', ['AT,OK'])
+        self.command_engine.submit('AT+RX', ['AT,OK'])
+        self.command_engine.next_command(timeout=0)
+        with patch.object(time, 'monotonic', return_value=time.monotonic() + 11):
+            self.assertEqual('AT+RX', self.command_engine.next_command(timeout=0).command)
+        self.assertFalse(command.future.result(timeout=0))
+
+    def test_get_bytes(self):
+        self.assertEqual(b'AT+ADDR=0137\r\n', self.command_engine.submit(b'AT+ADDR=0137').get_bytes())
+
+    def test_process_response_edge_command_without_expected_responses(self):
+        command = self.command_engine.submit(b'AT+ADDR?')
+        self.command_engine.next_command(timeout=0)
+        self.assertFalse(self.command_engine.process_response('AT,0137,OK'))
+        self.command_engine.command_written(command)
+        self.assertTrue(command.future.result(timeout=0))
+
+    def test_submit_query_captures_answer(self):
+        command = self.command_engine.submit_query('AT+ADDR?')
+        self.command_engine.next_command(timeout=0)
+        self.command_engine.command_written(command)
+        self.assertFalse(command.future.done())
+        self.assertTrue(self.command_engine.process_response('AT,0137,OK'))
+        self.assertEqual('AT,0137,OK', command.future.result(timeout=0))
+        self.assertFalse(self.command_engine.is_waiting_for_response())
+
+    def test_submit_query_bad_error_answer(self):
+        command = self.command_engine.submit_query('AT+CFG?')
+        self.command_engine.next_command(timeout=0)
+        self.command_engine.command_written(command)
+        self.command_engine.process_response('AT,ERR:CMD')
+        self.assertFalse(command.future.result(timeout=0))
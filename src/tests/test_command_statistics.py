@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from lora_multihop import command_engine, command_statistics
+from lora_multihop.command_engine import CommandEngine
+from lora_multihop.command_statistics import CommandStatistics, RollingHistogram
+
+__author__ = "Marvin Rausch"
+
+
+class CommandStatisticsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.statistics = CommandStatistics(window_size=10)
+        self.command_engine = CommandEngine(timeout=10, statistics=self.statistics)
+
+    def test_get_command_type(self):
+        self.assertEqual('AT+SEND', command_statistics.get_command_type('AT+SEND=12'))
+        self.assertEqual('AT+ADDR?', command_statistics.get_command_type(b'AT+ADDR?'))
+        self.assertEqual('payload', command_statistics.get_command_type('|0137|3|8|4|0138|'))
+
+    def test_rolling_histogram_percentiles(self):
+        histogram = RollingHistogram(window_size=100)
+        for value in range(1, 101):
+            histogram.add(value)
+        summary = histogram.get_summary()
+        self.assertEqual(50, summary['p50'])
+        self.assertEqual(95, summary['p95'])
+        self.assertEqual(99, summary['p99'])
+        self.assertEqual(100, summary['max'])
+
+    def test_rolling_histogram_keeps_only_window(self):
+        histogram = RollingHistogram(window_size=2)
+        for value in (100, 1, 2):
+            histogram.add(value)
+        self.assertEqual(2, histogram.get_percentile(99))
+        self.assertEqual(3, histogram.get_summary()['count'])
+
+    def test_rolling_histogram_edge_no_samples(self):
+        self.assertIsNone(RollingHistogram(window_size=2).get_percentile(50))
+        self.assertEqual({'count': 0}, RollingHistogram(window_size=2).get_summary())
+
+    def test_record_payload_separates_queue_wait_modem_time_and_airtime(self):
+        with patch.object(command_engine.time, 'monotonic') as monotonic_mocked:
+            monotonic_mocked.side_effect = [0, 1, 1.5, 2, 3, 5]
+            command = self.command_engine.submit('payload', ['AT,SENDING', 'AT,SENDED'])
+            self.command_engine.next_command(timeout=None)
+            self.command_engine.command_written(command)
+            self.command_engine.process_response('AT,SENDING')
+            self.command_engine.process_response('AT,SENDED')
+        entry = self.statistics.get_statistics()['payload']
+        self.assertEqual(1, entry['successful'])
+        self.assertEqual(1, entry['queue_wait']['p50'])
+        self.assertEqual(0.5, entry['first_response']['p50'])
+        self.assertEqual(1, entry['airtime']['p50'])
+        self.assertEqual(3.5, entry['modem_time']['p50'])
+
+    def test_record_failed_and_skipped_commands(self):
+        commands = self.command_engine.submit_sequence([('AT+SEND=4', ['AT,OK']),
+                                                        ('test', ['AT,SENDING', 'AT,SENDED'])])
+        self.command_engine.next_command(timeout=0)
+        self.command_engine.command_written(commands[0])
+        self.command_engine.process_response('AT,ERR:PARA')
+        self.command_engine.next_command(timeout=0)
+        statistics = self.statistics.get_statistics()
+        self.assertEqual(1, statistics['AT+SEND']['failed'])
+        self.assertEqual({'count': 0}, statistics['AT+SEND']['modem_time'])
+        self.assertEqual(1, statistics['payload']['skipped'])
+
+    def test_dump_json(self):
+        command = self.command_engine.submit('AT+RX')
+        self.command_engine.next_command(timeout=0)
+        self.command_engine.command_written(command)
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'statistics.json')
+            self.statistics.dump_json(file_path)
+            with open(file_path) as json_file:
+                self.assertEqual(1, json.load(json_file)['AT+RX']['successful'])
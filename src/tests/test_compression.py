@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+
+from lora_multihop import compression
+
+__author__ = "Marvin Rausch"
+
+MESSAGE = b'{"sensor": "temperature", "value": 21.5, "unit": "celsius", "sensor_id": "node-0131"}'
+
+
+class CompressorTest(unittest.TestCase):
+
+    def test_compress_decompress(self):
+        compressor = compression.Compressor()
+        data, compressed = compressor.compress(MESSAGE * 3)
+        self.assertTrue(compressed)
+        self.assertLess(len(data), len(MESSAGE * 3))
+        self.assertEqual(MESSAGE * 3, compressor.decompress(data))
+
+    def test_compress_edge_does_not_pay_off(self):
+        compressor = compression.Compressor()
+        self.assertEqual((b'hello', False), compressor.compress(b'hello'))
+        self.assertEqual(1, compressor.get_statistics()['skipped_messages'])
+        self.assertEqual(1, compressor.get_statistics()['ratio'])
+
+    def test_compress_with_dictionary(self):
+        compressor = compression.Compressor()
+        dictionary_compressor = compression.Compressor(dictionary=MESSAGE)
+        data, compressed = dictionary_compressor.compress(MESSAGE)
+        self.assertTrue(compressed)
+        self.assertLess(len(data), len(compressor.compress(MESSAGE)[0]))
+        self.assertEqual(MESSAGE, dictionary_compressor.decompress(data))
+        self.assertAlmostEqual(len(data) / len(MESSAGE), dictionary_compressor.get_statistics()['ratio'])
+
+    def test_decompress_bad_invalid_data(self):
+        self.assertRaises(ValueError, compression.Compressor().decompress, b'\xff\xff\xff')
+
+    def test_decompress_bad_too_long(self):
+        compressor = compression.Compressor(max_length=100)
+        data, _ = compressor.compress(b'a' * 1000)
+        self.assertRaises(ValueError, compressor.decompress, data)
+
+    def test_load_dictionary(self):
+        with tempfile.NamedTemporaryFile(delete=False) as dictionary_file:
+            dictionary_file.write(MESSAGE)
+        try:
+            self.assertEqual(MESSAGE, compression.load_dictionary(dictionary_file.name))
+        finally:
+            os.remove(dictionary_file.name)
@@ -0,0 +1,103 @@
+import time
+import unittest
+
+from lora_multihop import fragmentation, header, payload_encoding
+
+__author__ = "Marvin Rausch"
+
+
+class FragmentationTest(unittest.TestCase):
+
+    def test_encode_decode_fragment(self):
+        fragment = fragmentation.Fragment(7, 300, True, b'hello')
+        payload = fragment.encode()
+        self.assertTrue(fragmentation.is_fragment(payload))
+        decoded_fragment = fragmentation.decode_payload(payload)
+        self.assertEqual((7, 300, True, b'hello'), (decoded_fragment.datagram_id, decoded_fragment.offset,
+                                                    decoded_fragment.more_fragments, decoded_fragment.data))
+
+    def test_encode_decode_fragment_good_compressed(self):
+        fragment = fragmentation.Fragment(7, 0, False, b'hello', compressed=True)
+        decoded_fragment = fragmentation.decode_payload(fragment.encode())
+        self.assertTrue(decoded_fragment.compressed)
+        self.assertFalse(decoded_fragment.more_fragments)
+
+    def test_decode_payload_good_not_fragmented(self):
+        self.assertEqual(b'hello', fragmentation.decode_payload('aGVsbG8='))
+
+    def test_decode_fragment_bad_too_short(self):
+        self.assertRaises(ValueError, fragmentation.decode_fragment, '#AAE=')
+
+    def test_decode_fragment_bad_invalid_base64(self):
+        self.assertRaises(ValueError, fragmentation.decode_fragment, '#AA?=')
+
+    def test_get_fragment_size_fits_into_frame(self):
+        header_length = len(header.MessageHeader(None, '0131', 5, '0132', '0133', 1, '').get_header_str())
+        fragment_size = fragmentation.get_fragment_size(240, header_length)
+        fragment = fragmentation.Fragment(0, 0, True, b'x' * fragment_size)
+        header_str = header.MessageHeader(None, '0131', 5, '0132', '0133', 1, fragment.encode()).get_header_str()
+        self.assertLessEqual(len(header_str), 240)
+        self.assertGreater(len(header_str), 236)
+
+    def test_fragment_good_escape_encoding_fills_fragments(self):
+        encoding = payload_encoding.get_encoding(payload_encoding.ESCAPE)
+        data = b'a' * 40 + bytes(range(128, 168))
+        fragments = fragmentation.Fragmenter().fragment(data, 30, encoding=encoding)
+        self.assertEqual(data, b''.join(fragment.data for fragment in fragments))
+        self.assertEqual(25, len(fragments[0].data))
+        for fragment in fragments:
+            encoded_fragment = fragment.encode(encoding)
+            self.assertLessEqual(len(encoded_fragment.encode()), 30 + len(fragmentation.FRAGMENT_MARKER) +
+                                 len(encoding.PREFIX))
+            self.assertEqual(fragment.data, fragmentation.decode_payload(encoded_fragment).data)
+
+    def test_get_fragment_size_bad_frame_too_small(self):
+        self.assertRaises(ValueError, fragmentation.get_fragment_size, 30, 28)
+
+    def test_fragment(self):
+        fragments = fragmentation.Fragmenter().fragment(b'0123456789', 4)
+        self.assertEqual([(0, True, b'0123'), (4, True, b'4567'), (8, False, b'89')],
+                         [(fragment.offset, fragment.more_fragments, fragment.data) for fragment in fragments])
+
+    def test_fragment_edge_datagram_id_wraps(self):
+        fragmenter = fragmentation.Fragmenter()
+        fragmenter.next_datagram_id = fragmentation.MAX_DATAGRAM_ID
+        self.assertEqual(fragmentation.MAX_DATAGRAM_ID, fragmenter.fragment(b'a', 4)[0].datagram_id)
+        self.assertEqual(0, fragmenter.fragment(b'a', 4)[0].datagram_id)
+
+
+class ReassemblerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.reassembler = fragmentation.Reassembler(max_datagrams=2, timeout=0.05)
+        self.fragments = fragmentation.Fragmenter().fragment(b'0123456789', 4)
+
+    def test_add_in_order(self):
+        self.assertIsNone(self.reassembler.add(self.fragments[0]))
+        self.assertIsNone(self.reassembler.add(self.fragments[1]))
+        self.assertEqual(b'0123456789', self.reassembler.add(self.fragments[2]))
+        self.assertEqual(0, len(self.reassembler.datagrams))
+
+    def test_add_out_of_order(self):
+        self.assertIsNone(self.reassembler.add(self.fragments[2]))
+        self.assertIsNone(self.reassembler.add(self.fragments[0]))
+        self.assertEqual(b'0123456789', self.reassembler.add(self.fragments[1]))
+
+    def test_add_edge_duplicate(self):
+        self.reassembler.add(self.fragments[0])
+        self.assertIsNone(self.reassembler.add(self.fragments[0]))
+        self.reassembler.add(self.fragments[1])
+        self.assertEqual(b'0123456789', self.reassembler.add(self.fragments[2]))
+
+    def test_add_edge_timeout(self):
+        self.reassembler.add(self.fragments[0])
+        time.sleep(0.06)
+        self.assertIsNone(self.reassembler.add(self.fragments[1]))
+        self.assertIsNone(self.reassembler.add(self.fragments[2]))
+        self.assertEqual(1, self.reassembler.dropped_datagrams)
+
+    def test_add_edge_buffer_full(self):
+        for datagram_id in range(3):
+            self.reassembler.add(fragmentation.Fragment(datagram_id, 0, True, b'a'))
+        self.assertEqual([1, 2], sorted(self.reassembler.datagrams))
+        self.assertEqual(1, self.reassembler.dropped_datagrams)
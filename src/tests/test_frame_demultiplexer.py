@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import MagicMock
+
+from lora_multihop.frame_demultiplexer import FrameDemultiplexer
+
+__author__ = "Marvin Rausch"
+
+
+class FrameDemultiplexerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.status_consumer = MagicMock(return_value=True)
+        self.frame_consumer = MagicMock()
+        self.is_verifying_command = MagicMock(return_value=False)
+        self.frame_demultiplexer = FrameDemultiplexer(self.status_consumer, self.frame_consumer,
+                                                      self.is_verifying_command)
+
+    def test_feed_status_line(self):
+        self.frame_demultiplexer.feed(b'AT,OK\r\n')
+        self.status_consumer.assert_called_once_with('AT,OK')
+        self.frame_consumer.assert_not_called()
+
+    def test_feed_received_frame(self):
+        self.frame_demultiplexer.feed(b'LR,0136,11,|0137|3|8|4|0138|\r\n')
+        self.frame_consumer.assert_called_once_with('LR,0136,11,|0137|3|8|4|0138|')
+        self.status_consumer.assert_not_called()
+
+    def test_feed_edge_message_split_over_several_reads(self):
+        self.frame_demultiplexer.feed(b'LR,0136,1')
+        self.frame_demultiplexer.feed(b'1,|0137|3|8|4|')
+        self.frame_consumer.assert_not_called()
+        self.frame_demultiplexer.feed(b'0138|\r\nAT,SEN')
+        self.frame_consumer.assert_called_once_with('LR,0136,11,|0137|3|8|4|0138|')
+        self.frame_demultiplexer.feed(b'DED\r\n')
+        self.status_consumer.assert_called_once_with('AT,SENDED')
+        self.assertEqual(0, len(self.frame_demultiplexer.buffer))
+
+    def test_feed_edge_terminator_in_payload(self):
+        self.frame_demultiplexer.feed(b'LR,0136,07,ab\r\ncde\r\n')
+        self.frame_consumer.assert_called_once_with('LR,0136,07,ab\r\ncde')
+
+    def test_feed_edge_invalid_length_field(self):
+        self.frame_demultiplexer.feed(b'LR,0136,02,hello\r\nAT,OK\r\n')
+        self.frame_consumer.assert_called_once_with('LR,0136,02,hello')
+        self.status_consumer.assert_called_once_with('AT,OK')
+
+    def test_feed_edge_status_line_not_processed_by_status_consumer(self):
+        self.status_consumer.return_value = False
+        self.frame_demultiplexer.feed(b'AT,0137,OK\r\n')
+        self.frame_consumer.assert_called_once_with('AT,0137,OK')
+
+    def test_feed_bad_not_utf8_encoded(self):
+        self.frame_demultiplexer.feed(b'\xff\xfe\r\n')
+        self.frame_consumer.assert_not_called()
+        self.assertEqual(1, self.frame_demultiplexer.get_statistics()['dumped_messages'])
+
+    def test_feed_good_binary_header(self):
+        self.frame_demultiplexer.feed(b'LR,0136,06,\x81\x35\x01\x37\xff\x01\r\n')
+        self.frame_consumer.assert_called_once_with('LR,0136,06,\udc81\x35\x01\x37\udcff\x01')
+        self.assertEqual(0, self.frame_demultiplexer.dumped_messages)
+
+    def test_rescued_frames_are_counted(self):
+        self.is_verifying_command.return_value = True
+        self.frame_demultiplexer.feed(b'AT,SENDING\r\nLR,0136,11,|0137|3|8|4|0138|\r\nAT,SENDED\r\n')
+        self.frame_consumer.assert_called_once_with('LR,0136,11,|0137|3|8|4|0138|')
+        statistics = self.frame_demultiplexer.get_statistics()
+        self.assertEqual(1, statistics['rescued_frames'])
+        self.assertEqual(2, statistics['received_status_lines'])
+
+    def test_feed_edge_length_field_exceeds_max_frame_length(self):
+        self.frame_demultiplexer.feed(b'LR,0136,ff,|0137|3|8|4|0138|\r\nAT,OK\r\n')
+        self.frame_consumer.assert_called_once_with('LR,0136,ff,|0137|3|8|4|0138|')
+        self.status_consumer.assert_called_once_with('AT,OK')
+        self.assertEqual(0, self.frame_demultiplexer.get_statistics()['buffered_bytes'])
+
+    def test_feed_edge_length_field_too_large_followed_by_status_line(self):
+        self.frame_demultiplexer.feed(b'LR,0136,30,|0137|3|8|4|0138|\r\nAT,OK\r\n')
+        self.frame_consumer.assert_called_once_with('LR,0136,30,|0137|3|8|4|0138|')
+        self.status_consumer.assert_called_once_with('AT,OK')
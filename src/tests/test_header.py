@@ -1,6 +1,7 @@
 import unittest
+from unittest.mock import patch
 
-from lora_multihop import header
+from lora_multihop import header, payload_encoding, variables
 
 __author__ = "Marvin Rausch"
 
@@ -35,6 +36,20 @@ class HeaderTest(unittest.TestCase):
         header_obj = header.create_header_obj_from_raw_message('LR,0137,16,|0137|2|5|0138|8774d3|')
         self.assertEqual(header_obj.flag, 2)
 
+    def test_create_cumulative_ack_header_good(self):
+        header_obj = header.create_header_obj_from_raw_message('LR,0137,11,|0137|9|5|0138|4|a|')
+        self.assertEqual(header_obj.flag, 9)
+        self.assertEqual(4, header_obj.message_id)
+        self.assertEqual(0b1010, header_obj.bitmap)
+
+    def test_create_cumulative_ack_header_bad_invalid_bitmap(self):
+        self.assertRaises(ValueError, header.create_header_obj_from_raw_message, 'LR,0137,11,|0137|9|5|0138|4|x|')
+
+    def test_cumulative_ack_header_is_acknowledged(self):
+        header_obj = header.CumulativeAcknowledgeHeader(None, '0132', 5, '0133', 4, 0b1010)
+        self.assertEqual([True, True, False, True, False, True, False],
+                         [header_obj.is_acknowledged(message_id) for message_id in range(3, 10)])
+
     def test_create_route_reply_header_obj_bad_invalid_flag(self):
         self.assertRaises(ValueError, header.create_header_obj_from_raw_message, 'LR,0136,10,|0137|8|8|3|0139|0140|')
 
@@ -73,6 +88,16 @@ class HeaderTest(unittest.TestCase):
         self.assertEqual(header_obj.received_from, '0136')
         self.assertEqual(header_obj.message_id, 10)
 
+    def test_create_message_header_obj_good_escaped_payload(self):
+        payload = payload_encoding.encode(b'a,|\r\n\x00\xff', payload_encoding.get_encoding(payload_encoding.ESCAPE))
+        header_obj = header.create_header_obj_from_raw_message(f'LR,0136,10,|0135|1|3|0138|0137|000001|{payload}|')
+        self.assertEqual(payload, header_obj.payload)
+        self.assertEqual(b'a,|\r\n\x00\xff', header_obj.decode_payload())
+
+    def test_create_message_header_obj_good_base64_payload(self):
+        header_obj = header.create_header_obj_from_raw_message('LR,0136,10,|0135|1|3|0138|0137|000001|aGVsbG8=|')
+        self.assertEqual(b'hello', header_obj.decode_payload())
+
     def test_create_message_header_obj_bad_payload_missing(self):
         self.assertRaises(ValueError, header.create_header_obj_from_raw_message, 'LR,0136,10,|0135|1|1|0138|0137|')
 
@@ -96,6 +121,10 @@ class HeaderTest(unittest.TestCase):
                                                              destination='0133', message_id='example_hash')
         self.assertEqual('|0132|2|9|0133|example_hash|', message_header_obj.get_header_str())
 
+    def test_get_header_str_cumulative_ack_header_good(self):
+        header_obj = header.CumulativeAcknowledgeHeader(None, '0132', 9, '0133', 12, 0b11010)
+        self.assertEqual('|0132|9|9|0133|12|1a|', header_obj.get_header_str())
+
     def test_create_header_str_route_error_header_good(self):
         route_error_header_obj = header.RouteErrorHeader('0131', '0131', 5, '0132')
         self.assertEqual('|0131|5|5|0132|', route_error_header_obj.get_header_str())
@@ -122,3 +151,53 @@ class HeaderTest(unittest.TestCase):
 
     def test_create_registration_header_from_message_str_bad_empty_peer_id(self):
         self.assertRaises(ValueError, header.create_header_obj_from_raw_message, 'LR,0131,10,|0131|6|4|true||')
+
+    def test_create_connect_request_header_good_payload_encoding(self):
+        header_obj = header.create_header_obj_from_raw_message('LR,0131,10,|0131|7|4|0132|0132|alice|bob|60|ascii85|')
+        self.assertEqual('ascii85', header_obj.payload_encoding)
+        self.assertEqual('|0131|7|4|0132|0132|alice|bob|60|ascii85|', header_obj.get_header_str())
+
+    def test_create_connect_request_header_good_without_payload_encoding(self):
+        header_obj = header.create_header_obj_from_raw_message('LR,0131,10,|0131|7|4|0132|0132|alice|bob|60|')
+        self.assertIsNone(header_obj.payload_encoding)
+        self.assertEqual('|0131|7|4|0132|0132|alice|bob|60|', header_obj.get_header_str())
+
+    def test_encode_decode_binary_header_good_all_header_types(self):
+        header_objects = [header.MessageHeader(None, '0131', 5, '0132', '0133', 300, '!hello|'),
+                          header.MessageAcknowledgeHeader(None, '0131', 5, '0132', 7),
+                          header.CumulativeAcknowledgeHeader(None, '0131', 5, '0132', 7, 0x15),
+                          header.RouteRequestHeader(None, '0131', 5, 2, '0132'),
+                          header.RouteReplyHeader(None, '0131', 5, 2, '0132', 'FFFF'),
+                          header.RouteErrorHeader(None, '0131', 5, '0132'),
+                          header.RegistrationHeader(None, '0131', 5, True, 'alice'),
+                          header.ConnectRequestHeader(None, '0131', 5, '0132', '0133', 'alice', 'bob', '60'),
+                          header.ConnectRequestHeader(None, '0131', 5, '0132', '0133', 'alice', 'bob', '60', 'escape'),
+                          header.DisconnectRequestHeader(None, '0131', 5, '0132', '0133', 'alice', 'bob')]
+        for header_obj in header_objects:
+            frame_str = header_obj.encode().decode('utf-8', 'surrogateescape')
+            decoded_header_obj = header.create_header_obj_from_raw_message(f'LR,0134,10,{frame_str}')
+            self.assertEqual(header_obj.get_header_str(), decoded_header_obj.get_header_str())
+            self.assertEqual('0134', decoded_header_obj.received_from)
+
+    def test_encode_binary_header_good_smaller_than_ascii_header(self):
+        header_obj = header.MessageHeader(None, '0131', 5, '0132', '0133', 300, 'aGVsbG8=')
+        self.assertEqual(b'\x81\x15\x01\x31\x01\x32\x01\x33\xac\x02aGVsbG8=', header_obj.encode())
+        self.assertEqual(36, len(header_obj.get_header_str()))
+
+    def test_encode_binary_header_bad_ttl_too_large(self):
+        self.assertRaises(ValueError, header.RouteErrorHeader(None, '0131', 16, '0132').encode)
+
+    def test_create_header_obj_from_binary_bad_unsupported_version(self):
+        self.assertRaises(ValueError, header.create_header_obj_from_binary, '0134', b'\x82\x55\x01\x31\x01\x32')
+
+    def test_create_header_obj_from_binary_bad_too_short(self):
+        self.assertRaises(ValueError, header.create_header_obj_from_binary, '0134', b'\x81\x25\x01\x31\x01')
+
+    def test_create_header_obj_from_binary_bad_trailing_bytes(self):
+        self.assertRaises(ValueError, header.create_header_obj_from_binary, '0134', b'\x81\x55\x01\x31\x01\x32\x00')
+
+    def test_get_frame_str_good_header_format(self):
+        header_obj = header.RouteErrorHeader(None, '0131', 5, '0132')
+        self.assertEqual('|0131|5|5|0132|', header_obj.get_frame_str())
+        with patch.object(variables, 'HEADER_FORMAT', header.BINARY):
+            self.assertEqual(6, header.get_frame_length(header_obj.get_frame_str()))
@@ -7,7 +7,7 @@ import socket
 
 from unittest.mock import patch, MagicMock
 
-from lora_multihop import protocol, ipc
+from lora_multihop import protocol, ipc, module_config, variables
 
 
 class JavaIPCTest(unittest.TestCase):
@@ -72,6 +72,40 @@ class JavaIPCTest(unittest.TestCase):
             test_ipc.start_tcp_server()
             send_connect_request_mocked.assert_called_with('alice', 'bob', '60')
 
+    def test_process_no_delay_message(self):
+        socket_mock = MagicMock()
+        connection_mock = MagicMock()
+        with patch.object(socket, 'socket', return_value=socket_mock), \
+                patch.object(protocol.Protocol, 'start_protocol_thread'):
+            test_ipc = ipc.IPC(4711, 4712, module_address='0200')
+            test_ipc.listen_for_data = MagicMock()
+            test_ipc.listen_for_data.__bool__.side_effect = [True, False]
+            test_ipc.tcp_server_active = MagicMock()
+            test_ipc.tcp_server_active.__bool__.side_effect = [True, False]
+            socket_mock.accept.return_value = connection_mock, ''
+            data_mock = MagicMock()
+            data_mock.decode.return_value = 'NoDelay,true|'
+            connection_mock.recv.return_value = data_mock
+
+            test_ipc.start_tcp_server()
+            self.assertTrue(test_ipc.no_delay)
+
+    def test_session_messages_are_coalesced(self):
+        socket_mock = MagicMock()
+        connection_mock = MagicMock()
+        with patch.object(socket, 'socket', return_value=socket_mock), \
+                patch.object(protocol.Protocol, 'start_protocol_thread'), \
+                patch.object(protocol.Protocol, 'send_message') as send_message_mocked:
+            test_ipc = ipc.IPC(4711, 4712, module_address='0200')
+            test_ipc.listen_for_data = MagicMock()
+            test_ipc.listen_for_data.__bool__.side_effect = [True, True, True, False]
+
+            socket_mock.accept.return_value = connection_mock, ''
+            connection_mock.recv.side_effect = [b'a', b'b', b'c']
+
+            test_ipc.start_tcp_server_for_message_transfer()
+            send_message_mocked.assert_called_once_with(b'abc')
+
     def test_send_ipc_message_to_java_side(self):
         socket_mock = MagicMock()
         connection_mock = MagicMock()
@@ -200,3 +234,37 @@ class JavaIPCTest(unittest.TestCase):
             self.assertFalse(test_ipc.listen_for_data)
             self.assertFalse(test_ipc.tcp_server_active)
             test_ipc.protocol.stop.assert_called_once()
+
+    def test_ipc_bound_to_driver(self):
+        driver = MagicMock()
+        address_before = variables.MY_ADDRESS
+        with patch.object(protocol.Protocol, 'start_protocol_thread'), \
+                patch.object(module_config, 'get_current_address', return_value='0205') as get_address_mocked:
+            test_ipc = ipc.IPC(4711, 4712, driver=driver)
+            get_address_mocked.assert_called_with(driver)
+            self.assertIs(driver, test_ipc.protocol.driver)
+            self.assertEqual('0205', test_ipc.protocol.my_address)
+            self.assertEqual(address_before, variables.MY_ADDRESS)
+
+    def test_ipc_module_setup_in_background(self):
+        driver = MagicMock()
+        setup_started = threading.Event()
+        finish_setup = threading.Event()
+
+        def module_setup():
+            setup_started.set()
+            finish_setup.wait(5)
+            return '0206'
+
+        with patch.object(protocol.Protocol, 'start_protocol_thread') as start_protocol_thread_mocked, \
+                patch.object(module_config, 'get_current_address') as get_address_mocked:
+            test_ipc = ipc.IPC(4711, 4712, driver=driver, module_setup=module_setup)
+            self.assertTrue(setup_started.wait(5))
+            self.assertFalse(test_ipc.ready.is_set())
+            start_protocol_thread_mocked.assert_not_called()
+            finish_setup.set()
+            self.assertTrue(test_ipc.ready.wait(5))
+            self.assertEqual('0206', test_ipc.protocol.my_address)
+            self.assertIsNotNone(test_ipc.time_to_ready)
+            start_protocol_thread_mocked.assert_called_once()
+            get_address_mocked.assert_not_called()
@@ -0,0 +1,97 @@
+import unittest
+
+import serial
+
+from lora_multihop import header, module_config, serial_connection, variables
+from tests.integration_tests.modem_emulator import Air, EmulatedModem
+
+__author__ = "Marvin Rausch"
+
+
+class ModemEmulatorTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.air = Air(time_scale=0)
+        self.modems = []
+        self.drivers = []
+
+    def tearDown(self) -> None:
+        for driver in self.drivers:
+            driver.stop()
+        for driver in self.drivers:
+            driver.reading_thread.join()
+            driver.writing_thread.join()
+            driver.ser.close()
+        for modem in self.modems:
+            modem.stop()
+
+    def create_node(self, address):
+        modem = EmulatedModem(self.air, address)
+        modem.start()
+        self.modems.append(modem)
+        driver = serial_connection.ModemDriver(serial.serial_for_url(modem.port, baudrate=115200, timeout=0),
+                                               name=address)
+        driver.start()
+        self.drivers.append(driver)
+        return modem, driver
+
+    def test_module_config(self):
+        modem, driver = self.create_node('0131')
+        self.assertTrue(module_config.config_module(variables.MODULE_CONFIG, driver=driver))
+        self.assertTrue(module_config.set_address('0140', driver=driver))
+        self.assertEqual('0140', module_config.get_current_address(driver=driver))
+        self.assertEqual(1, modem.sent_frames)
+
+    def test_bad_command(self):
+        _, driver = self.create_node('0131')
+        self.assertFalse(driver.execute_command('AT+CFG=433500000,20,12,7', [variables.STATUS_OK]))
+        self.assertFalse(driver.execute_command('AT+UNKNOWN', [variables.STATUS_OK]))
+
+    def test_send_frame_is_received_with_length_field(self):
+        _, sender = self.create_node('0131')
+        _, receiver = self.create_node('0132')
+        self.assertTrue(sender.send_frame('|0131|3|5|0|0132|').result(timeout=5))
+        self.assertEqual('LR,0131,11,|0131|3|5|0|0132|', receiver.response_q.get(timeout=5))
+
+    def test_send_frame_good_binary_header(self):
+        _, sender = self.create_node('0131')
+        _, receiver = self.create_node('0132')
+        header_obj = header.MessageAcknowledgeHeader(None, '0131', 5, '0132', 200)
+        self.assertTrue(sender.send_frame(header_obj.encode().decode(variables.ENCODING, 'surrogateescape'))
+                        .result(timeout=5))
+        received_header_obj = header.create_header_obj_from_raw_message(receiver.response_q.get(timeout=5))
+        self.assertEqual(('0131', '0132', 200), (received_header_obj.received_from, received_header_obj.destination,
+                                                 received_header_obj.message_id))
+
+    def test_topology_and_loss(self):
+        _, first = self.create_node('0131')
+        second_modem, second = self.create_node('0132')
+        third_modem, third = self.create_node('0133')
+        self.air.set_topology([('0131', '0132')])
+        self.air.loss_probability = 1
+        self.assertTrue(first.send_frame('hello').result(timeout=5))
+        self.assertEqual(1, second_modem.lost_frames)
+        self.assertEqual(0, third_modem.lost_frames)
+        self.assertTrue(second.response_q.empty())
+        self.assertTrue(third.response_q.empty())
+
+    def test_fast_config_module_writes_only_differing_settings(self):
+        modem, driver = self.create_node('0131')
+        modem.configuration = 'AT+CFG=433500000,5,9,7,1,1,0,0,0,0,3000,8,4'
+        report = module_config.fast_config_module(variables.MODULE_CONFIG, '0140', save=True, driver=driver)
+        self.assertTrue(report['configuration_written'])
+        self.assertTrue(report['address_written'])
+        self.assertTrue(report['saved'])
+        self.assertEqual((variables.MODULE_CONFIG, '0140'), modem.saved_settings)
+        modem.received_commands.clear()
+        report = module_config.fast_config_module(variables.MODULE_CONFIG, '0140', save=True, driver=driver)
+        self.assertEqual('0140', report['address'])
+        self.assertFalse(report['configuration_written'] or report['address_written'] or report['saved'])
+        self.assertEqual([variables.GET_CONFIG, variables.GET_ADDR], modem.received_commands)
+
+    def test_get_current_address_is_not_mixed_up_with_received_frame(self):
+        _, sender = self.create_node('0132')
+        _, driver = self.create_node('0131')
+        sender.send_frame('hello').result(timeout=5)
+        self.assertEqual('0131', module_config.get_current_address(driver=driver))
+        self.assertEqual('LR,0132,05,hello', driver.response_q.get(timeout=5))
@@ -0,0 +1,53 @@
+import unittest
+
+from lora_multihop import payload_encoding
+
+__author__ = "Marvin Rausch"
+
+
+class PayloadEncodingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = bytes(range(256)) + b'hello|world\r\n'
+
+    def test_encode_decode_good_all_encodings(self):
+        for encoding in payload_encoding.ENCODINGS.values():
+            encoded_data = payload_encoding.encode(self.data, encoding)
+            self.assertTrue(encoded_data.startswith(encoding.PREFIX))
+            self.assertEqual(self.data, payload_encoding.decode(encoded_data))
+
+    def test_encode_good_no_reserved_characters(self):
+        for encoding in payload_encoding.ENCODINGS.values():
+            encoded_data = payload_encoding.encode(self.data, encoding)
+            for character in ('|', '\r', '\n'):
+                self.assertNotIn(character, encoded_data)
+
+    def test_encode_good_base64_is_compatible(self):
+        self.assertEqual('aGVsbG8=', payload_encoding.encode(b'hello'))
+        self.assertEqual(b'hello', payload_encoding.decode('aGVsbG8='))
+
+    def test_encode_good_escape_text_without_overhead(self):
+        encoding = payload_encoding.get_encoding(payload_encoding.ESCAPE)
+        self.assertEqual('!{"a": 1}', payload_encoding.encode(b'{"a": 1}', encoding))
+        self.assertEqual('!a\x1b<b', payload_encoding.encode(b'a|b', encoding))
+
+    def test_get_max_data_length_good_matches_encoded_length(self):
+        for encoding in payload_encoding.ENCODINGS.values():
+            for max_encoded_length in range(0, 40):
+                length = encoding.get_max_data_length(self.data, max_encoded_length)
+                self.assertLessEqual(len(encoding.encode(self.data[:length]).encode()), max_encoded_length)
+                self.assertGreater(len(encoding.encode(self.data[:length + 1]).encode()), max_encoded_length)
+
+    def test_decode_bad_invalid_escape_sequence(self):
+        self.assertRaises(ValueError, payload_encoding.decode, '!a\x1bb')
+        self.assertRaises(ValueError, payload_encoding.decode, '!a\x1b')
+
+    def test_decode_bad_invalid_base64(self):
+        self.assertRaises(ValueError, payload_encoding.decode, 'AA?=')
+
+    def test_get_encoding_bad_unknown(self):
+        self.assertRaises(ValueError, payload_encoding.get_encoding, 'base32')
+
+
+if __name__ == '__main__':
+    unittest.main()
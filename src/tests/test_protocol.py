@@ -1,9 +1,13 @@
 import base64
+import concurrent.futures
+import threading
 import time
 import unittest
+from concurrent.futures import Future
+from queue import Queue
 from unittest.mock import patch, call, MagicMock
 
-from lora_multihop import protocol, serial_connection, header, variables
+from lora_multihop import protocol, serial_connection, header, variables, payload_encoding, waiters
 from lora_multihop.header import RegistrationHeader, ConnectRequestHeader
 from lora_multihop.routing_table import RoutingTable
 
@@ -115,24 +119,30 @@ class ProtocolTest(unittest.TestCase):
             send_header_mocked.assert_not_called()
 
     def test_send_header_good(self):
-        with patch.object(protocol, 'wait_random_time') as wait_random_time_mocked:
-            serial_connection.status_q.put(True)
-            serial_connection.status_q.put(True)
-
+        future = Future()
+        future.set_result(True)
+        with patch.object(protocol, 'wait_random_time') as wait_random_time_mocked, \
+                patch.object(serial_connection.default_driver, 'send_frame', return_value=future) as send_frame_mocked:
             self.protocol.send_header('test')
-            self.assertEqual(('AT+SEND=4', ['AT,OK']), serial_connection.writing_q.get())
-            self.assertEqual(('test', ['AT,SENDING', 'AT,SENDED']), serial_connection.writing_q.get())
+            send_frame_mocked.assert_called_with('test')
             wait_random_time_mocked.assert_called_once()
 
     def test_send_header_bad_access_send_mode_false(self):
-        with patch.object(protocol, 'wait_random_time') as wait_random_time_mocked:
-            serial_connection.status_q.put(False)
-
+        future = Future()
+        future.set_result(False)
+        with patch.object(protocol, 'wait_random_time') as wait_random_time_mocked, \
+                patch.object(serial_connection.default_driver, 'send_frame', return_value=future) as send_frame_mocked:
             self.protocol.send_header('test')
-            self.assertEqual(('AT+SEND=4', ['AT,OK']), serial_connection.writing_q.get())
-            self.assertTrue(serial_connection.writing_q.empty())
+            send_frame_mocked.assert_called_once()
             wait_random_time_mocked.assert_called_once()
 
+    def test_send_header_bad_no_response_from_module(self):
+        future = MagicMock()
+        future.result.side_effect = concurrent.futures.TimeoutError
+        with patch.object(protocol, 'wait_random_time'), \
+                patch.object(serial_connection.default_driver, 'send_frame', return_value=future):
+            self.protocol.send_header('test')
+
     def test_process_incoming_route_request(self):
         with patch.object(RoutingTable, 'add_neighbor_to_routing_table') as add_neighbor_mocked, \
                 patch.object(protocol.Protocol, 'process_route_request') as process_route_request_mocked:
@@ -254,12 +264,163 @@ class ProtocolTest(unittest.TestCase):
         with patch.object(RoutingTable, 'get_best_route_for_destination',
                           return_value={'destination': '0100', 'next_node': '0101'}), \
                 patch.object(protocol.Protocol, 'send_header') as send_header_mocked, \
-                patch.object(time, 'sleep'):
+                patch.object(variables, 'ACK_TIMEOUT', 0.01):
             message = b'hello alice!'
             self.protocol.send_message(message)
             # verify route error was sent
             send_header_mocked.assert_called_with('|0130|5|5|alice|')
 
+    def test_send_message_good_woken_up_by_acknowledgement(self):
+        self.protocol.connected_node = 'alice'
+        with patch.object(RoutingTable, 'get_best_route_for_destination',
+                          return_value={'destination': '0100', 'next_node': '0101'}), \
+                patch.object(protocol.Protocol, 'send_header'):
+            threading.Timer(0.05, self.protocol.process_ack_header,
+                            (header.MessageAcknowledgeHeader(None, 'alice', 5, '0130', 1),)).start()
+            start_time = time.monotonic()
+            self.protocol.send_message(b'hello alice!')
+            self.assertLess(time.monotonic() - start_time, 1)
+        self.assertEqual([], self.protocol.messages_acknowledgment)
+        self.assertEqual([], self.protocol.waiters.get_keys(waiters.ACKNOWLEDGEMENT))
+        statistics = self.protocol.get_rtt_statistics()['alice']
+        self.assertEqual(1, statistics['samples'])
+        self.assertLess(statistics['smoothed_rtt'], 1)
+        self.assertEqual(variables.MIN_ACK_TIMEOUT, statistics['timeout'])
+
+    def test_send_message_bad_rtt_backoff(self):
+        self.protocol.connected_node = 'alice'
+        with patch.object(RoutingTable, 'get_best_route_for_destination',
+                          return_value={'destination': '0100', 'next_node': '0101'}), \
+                patch.object(protocol.Protocol, 'send_header'), \
+                patch.object(variables, 'ACK_TIMEOUT', 0.01):
+            self.protocol.send_message(b'hello alice!')
+        statistics = self.protocol.get_rtt_statistics()['alice']
+        self.assertEqual(0, statistics['samples'])
+        self.assertEqual(variables.MAX_SEND_ATTEMPTS, statistics['backoffs'])
+        self.assertAlmostEqual(0.01 * 2 ** variables.MAX_SEND_ATTEMPTS, statistics['timeout'])
+
+    def test_send_registration_message_good_woken_up_by_own_registration(self):
+        with patch.object(protocol.Protocol, 'send_header') as send_header_mocked:
+            threading.Timer(0.05, self.protocol.process_registration_header,
+                            (RegistrationHeader('0131', '0130', 4, True, 'alice'),)).start()
+            start_time = time.monotonic()
+            self.protocol.send_registration_message(True, 'alice')
+            self.assertLess(time.monotonic() - start_time, 1)
+            send_header_mocked.assert_called_once()
+
+    def test_send_message_good_sliding_window(self):
+        self.protocol.connected_node = 'alice'
+        with patch.object(RoutingTable, 'get_best_route_for_destination',
+                          return_value={'destination': '0100', 'next_node': '0101'}), \
+                patch.object(protocol.Protocol, 'send_header') as send_header_mocked, \
+                patch.object(variables, 'SEND_WINDOW_SIZE', 2):
+            self.protocol.send_message(b'first')
+            self.protocol.send_message(b'second')
+            # both messages are sent without waiting for an acknowledgement
+            self.assertEqual(2, send_header_mocked.call_count)
+            self.assertEqual(2, self.protocol.senders['alice'].get_statistics()['outstanding_messages'])
+            self.protocol.process_ack_header(header.MessageAcknowledgeHeader(None, 'alice', 5, '0130', 2))
+            self.assertEqual(1, self.protocol.senders['alice'].get_statistics()['outstanding_messages'])
+            self.protocol.senders['alice'].stop()
+
+    def test_send_message_good_fragmented(self):
+        self.protocol.connected_node = '0131'
+        message = bytes(range(256)) * 2
+        with patch.object(RoutingTable, 'get_best_route_for_destination',
+                          return_value={'destination': '0100', 'next_node': '0101'}), \
+                patch.object(protocol.Protocol, 'add_message_to_waiting_acknowledgement_list'), \
+                patch.object(protocol.Protocol, 'send_header') as send_header_mocked:
+            self.protocol.send_message(message)
+            header_strings = [header_call[0][0] for header_call in send_header_mocked.call_args_list]
+        self.assertEqual(4, len(header_strings))
+        for header_str in header_strings:
+            self.assertLessEqual(len(header_str), variables.MAX_FRAME_LENGTH)
+        receiver = protocol.Protocol(address='0131')
+        receiver.connected_node = '0130'
+        with patch.object(protocol.Protocol, 'send_header'):
+            for header_str in header_strings:
+                receiver.process_message_header(header.create_header_obj_from_raw_message(
+                    f'LR,0101,{len(header_str):02x},{header_str}'))
+        self.assertEqual(message, receiver.received_messages_queue.get(timeout=1))
+
+    def test_send_message_good_compressed(self):
+        self.protocol.connected_node = '0131'
+        message = b'{"value": 1, "unit": "celsius"} ' * 10
+        with patch.object(RoutingTable, 'get_best_route_for_destination',
+                          return_value={'destination': '0100', 'next_node': '0101'}), \
+                patch.object(protocol.Protocol, 'add_message_to_waiting_acknowledgement_list'), \
+                patch.object(protocol.Protocol, 'send_header') as send_header_mocked, \
+                patch.object(variables, 'COMPRESSION', True):
+            self.protocol.send_message(message)
+            header_str = send_header_mocked.call_args[0][0]
+        send_header_mocked.assert_called_once()
+        self.assertLess(len(header_str), len(message))
+        receiver = protocol.Protocol(address='0131')
+        receiver.connected_node = '0130'
+        with patch.object(protocol.Protocol, 'send_header'):
+            receiver.process_message_header(
+                header.create_header_obj_from_raw_message(f'LR,0101,{len(header_str):02x},{header_str}'))
+        self.assertEqual(message, receiver.received_messages_queue.get(timeout=1))
+        self.assertEqual(1, self.protocol.get_compression_statistics()['compressed_messages'])
+
+    def test_send_message_good_escape_encoding(self):
+        self.protocol.connected_node = '0131'
+        self.protocol.set_payload_encoding('0131', payload_encoding.ESCAPE)
+        message = b'{"value": 1}|' * 30 + bytes(range(256))
+        with patch.object(RoutingTable, 'get_best_route_for_destination',
+                          return_value={'destination': '0100', 'next_node': '0101'}), \
+                patch.object(protocol.Protocol, 'add_message_to_waiting_acknowledgement_list'), \
+                patch.object(protocol.Protocol, 'send_header') as send_header_mocked:
+            self.protocol.send_message(message)
+            header_strings = [header_call[0][0] for header_call in send_header_mocked.call_args_list]
+        self.assertEqual(4, len(header_strings))
+        for header_str in header_strings:
+            self.assertLessEqual(len(header_str.encode(variables.ENCODING)), variables.MAX_FRAME_LENGTH)
+        receiver = protocol.Protocol(address='0131')
+        receiver.connected_node = '0130'
+        with patch.object(protocol.Protocol, 'send_header'):
+            for header_str in header_strings:
+                receiver.process_message_header(header.create_header_obj_from_raw_message(
+                    f'LR,0101,{len(header_str.encode(variables.ENCODING)):02x},{header_str}'))
+        self.assertEqual(message, receiver.received_messages_queue.get(timeout=1))
+
+    def test_send_message_good_binary_header(self):
+        self.protocol.connected_node = '0131'
+        message = bytes(range(256))
+        with patch.object(RoutingTable, 'get_best_route_for_destination',
+                          return_value={'destination': '0100', 'next_node': '0101'}), \
+                patch.object(protocol.Protocol, 'add_message_to_waiting_acknowledgement_list'), \
+                patch.object(protocol.Protocol, 'send_header') as send_header_mocked, \
+                patch.object(variables, 'HEADER_FORMAT', header.BINARY):
+            self.protocol.send_message(message)
+            header_strings = [header_call[0][0] for header_call in send_header_mocked.call_args_list]
+        self.assertEqual(2, len(header_strings))
+        receiver = protocol.Protocol(address='0131')
+        receiver.connected_node = '0130'
+        with patch.object(protocol.Protocol, 'send_header'):
+            for header_str in header_strings:
+                self.assertLessEqual(header.get_frame_length(header_str), variables.MAX_FRAME_LENGTH)
+                receiver.process_message_header(header.create_header_obj_from_raw_message(
+                    f'LR,0101,{header.get_frame_length(header_str):02x},{header_str}'))
+        self.assertEqual(message, receiver.received_messages_queue.get(timeout=1))
+
+    def test_encode_payload_good_ascii85_not_fragmented(self):
+        self.protocol.set_payload_encoding('0131', payload_encoding.ASCII85)
+        self.assertEqual(['~BOu!rD]j7BEbo7'], self.protocol.encode_payload(b'hello world', '0131'))
+        self.assertEqual(['aGVsbG8gd29ybGQ='], self.protocol.encode_payload(b'hello world', '0132'))
+
+    def test_process_connect_request_header_good_payload_encoding(self):
+        variables.MY_ADDRESS = '0201'
+        self.protocol.process_connect_request_header(
+            ConnectRequestHeader('0200', '0200', 5, '0201', '0201', 'test1', 'test2', '2', payload_encoding.ESCAPE))
+        self.assertEqual(payload_encoding.ESCAPE, self.protocol.get_payload_encoding('0200').NAME)
+
+    def test_process_connect_request_header_edge_unknown_payload_encoding(self):
+        variables.MY_ADDRESS = '0201'
+        self.protocol.process_connect_request_header(
+            ConnectRequestHeader('0200', '0200', 5, '0201', '0201', 'test1', 'test2', '2', 'base32'))
+        self.assertEqual(payload_encoding.BASE64, self.protocol.get_payload_encoding('0200').NAME)
+
     def test_send_route_request_message_good(self):
         with patch.object(RoutingTable, 'get_best_route_for_destination',
                           return_value={'destination': '0100', 'next_node': '0101'}), \
@@ -271,8 +432,9 @@ class ProtocolTest(unittest.TestCase):
     def test_send_route_request_message_bad_no_answer(self):
         with patch.object(RoutingTable, 'get_best_route_for_destination', return_value={}), \
                 patch.object(protocol.Protocol, 'send_header') as send_header_mocked, \
-                patch.object(time, 'sleep'):
+                patch.object(protocol.Protocol, 'ROUTE_REPLY_TIMEOUT', 0.01):
             self.assertFalse(self.protocol.send_route_request_message('0100'))
+            self.assertEqual(3, send_header_mocked.call_count)
             # verify route request was sent
             send_header_mocked.assert_called_with('|0130|3|5|0|0100|')
 
@@ -298,6 +460,16 @@ class ProtocolTest(unittest.TestCase):
             self.protocol.process_route_request(route_request_header_obj)
             send_header_mocked.assert_not_called()
 
+    def test_process_route_reply_header_good_forwarding(self):
+        with patch.object(protocol.Protocol, 'send_header') as send_header_mocked:
+            variables.MY_ADDRESS = '0132'
+            # reverse path to the source of the route request is known, the end node of the route reply is not
+            self.protocol.routing_table.add_routing_table_entry('0131', '0131', 1)
+            route_reply_header_obj = header.RouteReplyHeader('0133', '0134', 5, 1, '0131', '0132')
+            self.protocol.process_route_reply_header(route_reply_header_obj)
+            send_header_mocked.assert_called_with('|0134|4|4|2|0131|0131|')
+            self.assertEqual('0133', self.protocol.routing_table.get_best_route_for_destination('0134')['next_node'])
+
     def test_send_route_reply_header(self):
         with patch.object(protocol.Protocol, 'send_header') as send_header_mocked:
             self.protocol.send_route_reply('0131', '0132')
@@ -311,6 +483,69 @@ class ProtocolTest(unittest.TestCase):
             self.protocol.process_message_header(message_header_obj)
             send_header_mocked.assert_called_with('|0134|2|5|0130|1|')
 
+    def test_process_message_header_good_transmit_scheduler(self):
+        transmission_allowed = threading.Event()
+        with patch.object(protocol.Protocol, 'transmit_header',
+                          side_effect=lambda header_str: transmission_allowed.wait(1)) as transmit_header_mocked:
+            variables.MY_ADDRESS = '0134'
+            self.protocol.connected_node = '0130'
+            self.protocol.transmit_scheduler.start()
+            try:
+                start_time = time.monotonic()
+                self.protocol.process_message_header(
+                    header.MessageHeader('0131', '0130', 9, '0134', '0132', 1, base64.b64encode(b'hello')))
+                # the acknowledgement is queued, so processing does not wait until the LoRa module has sent it
+                self.assertLess(time.monotonic() - start_time, 0.5)
+                transmission_allowed.set()
+                self.assertTrue(self.protocol.send_header('|0134|1|5|0131|0132|1|aGVsbG8=|'))
+                self.assertEqual([call('|0134|2|5|0130|1|'), call('|0134|1|5|0131|0132|1|aGVsbG8=|')],
+                                 transmit_header_mocked.call_args_list)
+                self.assertEqual(1, self.protocol.get_transmit_statistics()['reply']['sent'])
+            finally:
+                self.protocol.transmit_scheduler.stop()
+
+    def test_process_message_header_edge_duplicate(self):
+        with patch.object(protocol.Protocol, 'send_header') as send_header_mocked:
+            variables.MY_ADDRESS = '0134'
+            self.protocol.connected_node = '0130'
+            message_header_obj = header.MessageHeader('0131', '0130', 9, '0134', '0132', 1, base64.b64encode(b'hello'))
+            self.protocol.process_message_header(message_header_obj)
+            self.protocol.process_message_header(message_header_obj)
+            # acknowledgement is sent again, but message is delivered only once
+            self.assertEqual(2, send_header_mocked.call_count)
+            self.assertEqual(1, self.protocol.received_messages_queue.qsize())
+
+    def test_process_message_header_good_in_order_delivery(self):
+        with patch.object(protocol.Protocol, 'send_header'):
+            variables.MY_ADDRESS = '0134'
+            self.protocol.connected_node = '0130'
+            for message_id, payload in [(1, b'first'), (3, b'third'), (2, b'second')]:
+                self.protocol.process_message_header(
+                    header.MessageHeader('0131', '0130', 9, '0134', '0132', message_id, base64.b64encode(payload)))
+            received_messages = [self.protocol.received_messages_queue.get() for _ in range(3)]
+            self.assertEqual([b'first', b'second', b'third'], received_messages)
+
+    def test_process_message_header_good_cumulative_ack(self):
+        with patch.object(protocol.Protocol, 'send_header') as send_header_mocked, \
+                patch.object(variables, 'ACK_DELAY', 10), patch.object(variables, 'ACK_BATCH_SIZE', 2):
+            variables.MY_ADDRESS = '0134'
+            self.protocol.connected_node = '0130'
+            for message_id in (1, 2):
+                self.protocol.process_message_header(
+                    header.MessageHeader('0131', '0130', 9, '0134', '0132', message_id, base64.b64encode(b'hello')))
+            # one acknowledgement for both messages
+            send_header_mocked.assert_called_once_with('|0134|9|5|0130|2|0|')
+            self.protocol.process_message_header(
+                header.MessageHeader('0131', '0130', 9, '0134', '0132', 4, base64.b64encode(b'hello')))
+            # message 3 is missing, so the acknowledgement is sent without delay
+            send_header_mocked.assert_called_with('|0134|9|5|0130|2|2|')
+            self.protocol.ack_aggregators['0130'].stop()
+
+    def test_process_ack_header_good_cumulative_ack(self):
+        self.protocol.messages_acknowledgment = [1, 2, 3]
+        self.protocol.process_ack_header(header.CumulativeAcknowledgeHeader(None, '0131', 5, '0130', 1, 0b10))
+        self.assertEqual([2], self.protocol.messages_acknowledgment)
+
     def test_process_message_header_good_forward_request(self):
         with patch.object(protocol.Protocol, 'send_header') as send_header_mocked, \
                 patch.object(RoutingTable, 'get_best_route_for_destination',
@@ -320,3 +555,29 @@ class ProtocolTest(unittest.TestCase):
             message_header_obj = header.MessageHeader('0131', '0130', 9, '0132', '0134', 1, message_base64_encoded)
             self.protocol.process_message_header(message_header_obj)
             send_header_mocked.assert_called_with(f'|0130|1|8|0132|0133|000001|{message_base64_encoded}|')
+
+    def test_protocol_bound_to_driver_and_address(self):
+        driver = MagicMock()
+        driver.response_q = Queue()
+        future = Future()
+        future.set_result(True)
+        driver.send_frame.return_value = future
+        bound_protocol = protocol.Protocol(driver=driver, address='0201')
+        with patch.object(protocol, 'wait_random_time'), \
+                patch.object(serial_connection.default_driver, 'send_frame') as default_send_frame_mocked:
+            bound_protocol.send_route_reply('0131', '0132')
+            driver.send_frame.assert_called_with('|0201|4|5|0|0132|0131|')
+            default_send_frame_mocked.assert_not_called()
+
+    def test_protocol_bound_to_driver_reads_from_its_response_q(self):
+        driver = MagicMock()
+        driver.response_q = Queue()
+        bound_protocol = protocol.Protocol(driver=driver, address='0201')
+        with patch.object(RoutingTable, 'add_neighbor_to_routing_table'), \
+                patch.object(protocol.Protocol, 'process_route_request') as process_route_request_mocked:
+            driver.response_q.put('LR,0136,11,|0137|3|8|4|0201|')
+            bound_protocol.PROCESS_INCOMING_MESSAGES = MagicMock()
+            bound_protocol.PROCESS_INCOMING_MESSAGES.__bool__.side_effect = [True, False]
+            bound_protocol.process_incoming_message()
+            process_route_request_mocked.assert_called_once()
+            self.assertEqual('0201', bound_protocol.my_address)
@@ -0,0 +1,191 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from lora_multihop import header
+from lora_multihop.reliable_delivery import WindowedSender, ReorderBuffer, AckAggregator, RttEstimator
+
+__author__ = "Marvin Rausch"
+
+
+def create_message_header(message_id):
+    return header.MessageHeader(None, '0131', 5, '0132', '0132', message_id, 'aGVsbG8=')
+
+
+class WindowedSenderTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.send_function = MagicMock()
+        self.failure_function = MagicMock()
+        self.sender = WindowedSender(self.send_function, self.failure_function, window_size=2, ack_timeout=0.1,
+                                     max_attempts=3)
+
+    def tearDown(self) -> None:
+        self.sender.stop()
+        self.sender.retransmission_thread.join()
+
+    def test_send_edge_window_full(self):
+        self.sender.send(create_message_header(1))
+        self.sender.send(create_message_header(2))
+        sending_thread = threading.Thread(target=self.sender.send, args=(create_message_header(3),))
+        sending_thread.start()
+        time.sleep(0.05)
+        self.assertEqual(2, self.send_function.call_count)
+        self.assertTrue(self.sender.acknowledge(1))
+        sending_thread.join(1)
+        self.assertEqual(3, self.send_function.call_count)
+        self.assertEqual(3, self.send_function.call_args[0][0].message_id)
+
+    def test_selective_retransmission(self):
+        self.sender.send(create_message_header(1))
+        self.sender.send(create_message_header(2))
+        self.sender.acknowledge(2)
+        time.sleep(0.15)
+        self.sender.acknowledge(1)
+        self.assertTrue(self.sender.wait_until_all_acknowledged(1))
+        sent_ids = [call[0][0].message_id for call in self.send_function.call_args_list]
+        self.assertEqual([1, 2, 1], sent_ids)
+        self.assertEqual(1, self.sender.get_statistics()['retransmissions'])
+        self.failure_function.assert_not_called()
+
+    def test_send_edge_no_ack(self):
+        self.sender.send(create_message_header(1))
+        self.assertTrue(self.sender.wait_until_all_acknowledged(1))
+        self.assertEqual(3, self.send_function.call_count)
+        self.failure_function.assert_called_once()
+        self.assertEqual(1, self.sender.get_statistics()['failed_messages'])
+
+    def test_acknowledge_cumulative(self):
+        self.sender.window_size = 5
+        for message_id in range(1, 6):
+            self.sender.send(create_message_header(message_id))
+        # 1 - 2 received, 3 missing, 4 received, 5 missing
+        self.assertEqual(3, self.sender.acknowledge_cumulative(2, 0b10))
+        self.assertEqual([3, 5], list(self.sender.outstanding_messages))
+
+    def test_acknowledge_edge_unknown_id(self):
+        self.assertFalse(self.sender.acknowledge(7))
+
+    def test_send_edge_stopped(self):
+        self.sender.stop()
+        self.assertFalse(self.sender.send(create_message_header(1)))
+        self.send_function.assert_not_called()
+
+    def test_acknowledge_rtt_sample(self):
+        self.sender.rtt_estimator = RttEstimator(initial_timeout=0.1, min_timeout=0.1)
+        self.sender.send(create_message_header(1))
+        self.sender.send(create_message_header(2))
+        self.sender.acknowledge(1)
+        # message 2 is retransmitted, so its acknowledgement is not measured (Karn's rule)
+        time.sleep(0.15)
+        self.sender.acknowledge(2)
+        statistics = self.sender.rtt_estimator.get_statistics()
+        self.assertEqual(1, statistics['samples'])
+        self.assertEqual(1, statistics['backoffs'])
+
+
+class RttEstimatorTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.estimator = RttEstimator(initial_timeout=5, min_timeout=0.5, max_timeout=60)
+
+    def test_add_sample_first(self):
+        self.estimator.add_sample(2)
+        self.assertEqual({'smoothed_rtt': 2, 'rtt_variance': 1, 'timeout': 6, 'samples': 1, 'backoffs': 0},
+                         self.estimator.get_statistics())
+
+    def test_add_sample_smoothed(self):
+        self.estimator.add_sample(2)
+        self.estimator.add_sample(4)
+        self.assertAlmostEqual(2.25, self.estimator.smoothed_rtt)
+        self.assertAlmostEqual(1.25, self.estimator.rtt_variance)
+        self.assertAlmostEqual(7.25, self.estimator.get_timeout())
+
+    def test_add_sample_edge_min_timeout(self):
+        self.estimator.add_sample(0.01)
+        self.assertEqual(0.5, self.estimator.get_timeout())
+
+    def test_back_off(self):
+        self.estimator.back_off()
+        self.assertEqual(10, self.estimator.get_timeout())
+        for _ in range(5):
+            self.estimator.back_off()
+        self.assertEqual(60, self.estimator.get_timeout())
+        # a new measurement resets the backoff
+        self.estimator.add_sample(1)
+        self.assertEqual(3, self.estimator.get_timeout())
+
+
+class ReorderBufferTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.buffer = ReorderBuffer(buffer_size=4, timeout=0.05)
+
+    def test_add_in_order(self):
+        self.assertEqual([b'a'], self.buffer.add(1, b'a'))
+        self.assertEqual([b'b'], self.buffer.add(2, b'b'))
+
+    def test_add_out_of_order(self):
+        self.buffer.add(1, b'a')
+        self.assertEqual([], self.buffer.add(3, b'c'))
+        self.assertEqual([b'b', b'c'], self.buffer.add(2, b'b'))
+
+    def test_add_edge_duplicate(self):
+        self.buffer.add(1, b'a')
+        self.buffer.add(3, b'c')
+        self.assertEqual([], self.buffer.add(1, b'a'))
+        self.assertEqual([], self.buffer.add(3, b'c'))
+        self.assertEqual(2, self.buffer.duplicates)
+
+    def test_add_edge_gap_timeout(self):
+        self.buffer.add(1, b'a')
+        self.buffer.add(3, b'c')
+        time.sleep(0.06)
+        self.assertEqual([b'c', b'd'], self.buffer.add(4, b'd'))
+
+    def test_get_acknowledgement(self):
+        self.assertEqual((0, 0), self.buffer.get_acknowledgement())
+        self.buffer.add(1, b'a')
+        self.buffer.add(3, b'c')
+        self.buffer.add(4, b'd')
+        self.assertEqual((1, 0b110), self.buffer.get_acknowledgement())
+
+    def test_add_edge_sender_restarted(self):
+        self.buffer.add(20, b'a')
+        self.assertEqual([b'b'], self.buffer.add(1, b'b'))
+
+    def test_add_edge_sender_too_far_ahead(self):
+        self.buffer.add(1, b'a')
+        self.buffer.add(3, b'c')
+        self.assertEqual([b'c'], self.buffer.add(6, b'f'))
+        self.assertEqual([], self.buffer.add(5, b'e'))
+
+
+class AckAggregatorTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.send_function = MagicMock()
+        self.ack_aggregator = AckAggregator(self.send_function, delay=0.05, batch_size=3)
+
+    def tearDown(self) -> None:
+        self.ack_aggregator.stop()
+
+    def test_add_delayed(self):
+        self.ack_aggregator.add()
+        self.ack_aggregator.add()
+        self.send_function.assert_not_called()
+        time.sleep(0.1)
+        self.send_function.assert_called_once()
+
+    def test_add_edge_batch_full(self):
+        for _ in range(3):
+            self.ack_aggregator.add()
+        self.send_function.assert_called_once()
+        time.sleep(0.1)
+        self.send_function.assert_called_once()
+
+    def test_add_edge_immediately(self):
+        self.ack_aggregator.add(immediately=True)
+        self.send_function.assert_called_once()
+        self.assertEqual(1, self.ack_aggregator.sent_acknowledgements)
@@ -10,50 +10,79 @@ class SerialConnectionTest(unittest.TestCase):
 
     def setUp(self) -> None:
         self.ser = MagicMock()
-        serial_connection.ser = self.ser
-
-    def test_verify_command_good(self):
-        with patch.object(time, 'sleep', side_effect=InterruptedError):
-            serial_connection.writing_q.put(('AT', ['OK']))
-            self.ser.readline.return_value = serial_connection.str_to_bytes('OK')
-            try:
-                serial_connection.WritingThread('test_receiving').run()
-            except InterruptedError:
-                self.assertFalse(serial_connection.status_q.empty())
-                self.assertTrue(serial_connection.status_q.get())
-
-    def test_verify_command_bad(self):
-        with patch.object(time, 'sleep', side_effect=InterruptedError):
-            serial_connection.writing_q.put(('AT', ['OK']))
-            self.ser.readline.side_effect = [serial_connection.str_to_bytes('LR'), serial_connection.str_to_bytes('OK')]
-            try:
-                serial_connection.WritingThread('test_receiving').run()
-            except InterruptedError:
-                self.assertFalse(serial_connection.status_q.empty())
-                self.assertTrue(serial_connection.status_q.get())
-
-    def test_verify_command_bad2(self):
-        with patch.object(time, 'sleep', side_effect=InterruptedError):
-            serial_connection.writing_q.put(('AT', ['SENDING', 'SENDED']))
-            self.ser.readline.side_effect = [serial_connection.str_to_bytes('SENDING'),
-                                             serial_connection.str_to_bytes('LR'),
-                                             serial_connection.str_to_bytes('SENDED')]
-            try:
-                serial_connection.WritingThread('test_receiving').run()
-            except InterruptedError:
-                self.assertFalse(serial_connection.status_q.empty())
-                self.assertTrue(serial_connection.status_q.get())
-                self.assertEqual(3, self.ser.readline.call_count)  # make sure UART query was cleared
-
-    def test_verify_command_bad_to_many_commands_expected_for_verification(self):
-        with patch.object(time, 'sleep', side_effect=InterruptedError):
-            serial_connection.writing_q.put(('AT', ['SENDING', 'SENDED']))
-            # '' would be returned from ser.readline if timeout is reached
-            self.ser.readline.side_effect = [serial_connection.str_to_bytes('SENDED'),
-                                             serial_connection.str_to_bytes('')]
-            try:
-                serial_connection.WritingThread('test_receiving').run()
-            except InterruptedError:
-                self.assertFalse(serial_connection.status_q.empty())
-                self.assertFalse(serial_connection.status_q.get())
-                self.assertEqual(2, self.ser.readline.call_count)  # make sure UART query was cleared
+        self.driver = serial_connection.ModemDriver(self.ser)
+
+    def test_writing_thread_writes_next_command(self):
+        command = self.driver.command_engine.submit('AT', [])
+        self.driver.writing_thread_active = MagicMock()
+        self.driver.writing_thread_active.__bool__.side_effect = [True, False]
+        serial_connection.WritingThread('test_writing', self.driver).run()
+        self.ser.write.assert_called_with(b'AT\r\n')
+        self.assertTrue(command.future.result(timeout=0))
+
+    def test_send_frame(self):
+        future = self.driver.send_frame('test')
+        at_send_command = self.driver.command_engine.next_command(timeout=0)
+        self.assertEqual('AT+SEND=4', at_send_command.command)
+        self.assertTrue(self.driver.command_engine.process_response('AT,OK'))
+        payload_command = self.driver.command_engine.next_command(timeout=0)
+        self.assertEqual('test', payload_command.command)
+        self.driver.command_engine.process_response('AT,SENDING')
+        self.assertFalse(future.done())
+        self.driver.command_engine.process_response('AT,SENDED')
+        self.assertTrue(future.result(timeout=0))
+
+    def test_send_frame_bad_at_send_failed(self):
+        future = self.driver.send_frame('test')
+        self.driver.command_engine.next_command(timeout=0)
+        self.driver.command_engine.process_response('AT,ERR:PARA')
+        self.assertIsNone(self.driver.command_engine.next_command(timeout=0))
+        self.assertFalse(future.result(timeout=0))
+
+    def test_wait_for_incoming_data_without_selector(self):
+        self.ser.in_waiting = 0
+        with patch.object(time, 'sleep') as sleep_mocked:
+            self.assertFalse(serial_connection.wait_for_incoming_data(self.ser, None, 0.5))
+            sleep_mocked.assert_called_once()
+
+    def test_create_selector_edge_no_file_descriptor(self):
+        self.ser.fileno.side_effect = AttributeError
+        self.assertIsNone(serial_connection.create_selector(self.ser))
+
+    def test_reading_thread_passes_status_to_command_engine(self):
+        command = self.driver.command_engine.submit('AT', ['AT,OK'])
+        self.driver.command_engine.next_command(timeout=0)
+        self.ser.fileno.side_effect = AttributeError
+        self.ser.in_waiting = 1
+        self.ser.read.side_effect = [serial_connection.str_to_bytes('LR,0136,11,|0137|3|8|4|0138|\r\nAT,'),
+                                     serial_connection.str_to_bytes('OK\r\n')]
+        self.driver.reading_thread_active = MagicMock()
+        self.driver.reading_thread_active.__bool__.side_effect = [True, True, False]
+        serial_connection.ReadingThread('test_reading', self.driver).run()
+        self.assertTrue(command.future.result(timeout=0))
+        self.assertEqual('LR,0136,11,|0137|3|8|4|0138|', self.driver.response_q.get_nowait())
+
+    def test_reading_thread_puts_received_message_to_response_q(self):
+        self.ser.fileno.side_effect = AttributeError
+        self.ser.in_waiting = 1
+        self.ser.read.return_value = serial_connection.str_to_bytes('LR,0136,11,|0137|3|8|4|0138|\r\n')
+        self.driver.reading_thread_active = MagicMock()
+        self.driver.reading_thread_active.__bool__.side_effect = [True, False]
+        serial_connection.ReadingThread('test_reading', self.driver).run()
+        self.assertEqual('LR,0136,11,|0137|3|8|4|0138|', self.driver.response_q.get_nowait())
+
+    def test_drivers_are_independent(self):
+        second_driver = serial_connection.ModemDriver(MagicMock())
+        self.driver.send_frame('test')
+        self.assertIsNone(second_driver.command_engine.next_command(timeout=0))
+        self.assertIsNot(self.driver.response_q, second_driver.response_q)
+
+    def test_start_and_stop(self):
+        with patch.object(serial_connection.ReadingThread, 'start') as reading_thread_start_mocked, \
+                patch.object(serial_connection.WritingThread, 'start') as writing_thread_start_mocked:
+            self.driver.start()
+            reading_thread_start_mocked.assert_called_once()
+            writing_thread_start_mocked.assert_called_once()
+            self.driver.stop()
+            self.assertFalse(self.driver.reading_thread_active)
+            self.assertFalse(self.driver.writing_thread_active)
@@ -0,0 +1,71 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from lora_multihop import transmit_scheduler
+from lora_multihop.transmit_scheduler import TransmitScheduler
+
+__author__ = "Marvin Rausch"
+
+
+class TransmitSchedulerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.sent_frames = []
+        self.sending_started = threading.Event()
+        self.sending_allowed = threading.Event()
+        self.scheduler = TransmitScheduler(self.send_frame)
+        self.scheduler.start()
+
+    def tearDown(self) -> None:
+        self.sending_allowed.set()
+        self.scheduler.stop()
+
+    def send_frame(self, frame):
+        self.sending_started.set()
+        self.sending_allowed.wait(1)
+        self.sent_frames.append(frame)
+        return True
+
+    def test_submit_priority_order(self):
+        # the first frame blocks the thread, so the following frames are queued
+        first_future = self.scheduler.submit('local 1', transmit_scheduler.LOCAL)
+        self.sending_started.wait(1)
+        futures = [self.scheduler.submit('local 2', transmit_scheduler.LOCAL),
+                   self.scheduler.submit('forward', transmit_scheduler.FORWARD),
+                   self.scheduler.submit('route error', transmit_scheduler.ROUTE_ERROR),
+                   self.scheduler.submit('ack 1', transmit_scheduler.REPLY),
+                   self.scheduler.submit('ack 2', transmit_scheduler.REPLY)]
+        self.sending_allowed.set()
+        self.assertTrue(first_future.result(1))
+        for future in futures:
+            self.assertTrue(future.result(1))
+        self.assertEqual(['local 1', 'ack 1', 'ack 2', 'route error', 'forward', 'local 2'], self.sent_frames)
+
+    def test_get_statistics(self):
+        self.scheduler.submit('local', transmit_scheduler.LOCAL)
+        self.sending_started.wait(1)
+        self.scheduler.submit('ack', transmit_scheduler.REPLY)
+        statistics = self.scheduler.get_statistics()
+        self.assertEqual(1, statistics['reply']['queued'])
+        self.sending_allowed.set()
+        self.scheduler.submit('forward', transmit_scheduler.FORWARD).result(1)
+        statistics = self.scheduler.get_statistics()
+        self.assertEqual({'queued': 0, 'sent': 1}, {key: statistics['reply'][key] for key in ('queued', 'sent')})
+        self.assertEqual(1, statistics['local']['sent'])
+        self.assertEqual(0, statistics['route_error']['sent'])
+        self.assertGreater(statistics['reply']['max_wait'], 0)
+
+    def test_submit_edge_send_function_fails(self):
+        self.scheduler.send_function = MagicMock(side_effect=OSError('serial port closed'))
+        self.assertFalse(self.scheduler.submit('ack', transmit_scheduler.REPLY).result(1))
+
+    def test_stop_discards_queued_frames(self):
+        self.scheduler.submit('local 1', transmit_scheduler.LOCAL)
+        self.sending_started.wait(1)
+        future = self.scheduler.submit('local 2', transmit_scheduler.LOCAL)
+        self.scheduler.stop()
+        self.assertFalse(future.result(1))
+        self.assertFalse(self.scheduler.submit('ack', transmit_scheduler.REPLY).result(1))
+        self.assertEqual(0, self.scheduler.get_statistics()['local']['queued'])
+
@@ -0,0 +1,42 @@
+import threading
+import unittest
+
+from lora_multihop import waiters
+
+__author__ = "Marvin Rausch"
+
+
+class WaiterRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = waiters.WaiterRegistry()
+
+    def test_complete_wakes_up_waiting_thread(self):
+        waiter = self.registry.register(waiters.ACKNOWLEDGEMENT, 1)
+        threading.Timer(0.05, self.registry.complete, (waiters.ACKNOWLEDGEMENT, 1)).start()
+        self.assertTrue(waiter.wait(5))
+        self.assertIsNone(self.registry.get(waiters.ACKNOWLEDGEMENT, 1))
+
+    def test_register_edge_same_key_shares_waiter(self):
+        waiter = self.registry.register(waiters.ROUTE_REPLY, '0132')
+        self.assertIs(waiter, self.registry.register(waiters.ROUTE_REPLY, '0132'))
+        self.assertIsNot(waiter, self.registry.register(waiters.REGISTRATION, '0132'))
+
+    def test_complete_edge_no_waiter(self):
+        self.assertFalse(self.registry.complete(waiters.ACKNOWLEDGEMENT, 1))
+
+    def test_unregister_does_not_wake_up_waiter(self):
+        waiter = self.registry.register(waiters.ACKNOWLEDGEMENT, 1)
+        self.registry.unregister(waiters.ACKNOWLEDGEMENT, 1)
+        self.assertFalse(waiter.wait(0.01))
+        self.assertFalse(self.registry.complete(waiters.ACKNOWLEDGEMENT, 1))
+
+    def test_get_keys(self):
+        self.registry.register(waiters.ACKNOWLEDGEMENT, 1)
+        self.registry.register(waiters.ACKNOWLEDGEMENT, 2)
+        self.registry.register(waiters.ROUTE_REPLY, '0132')
+        self.assertEqual([1, 2], sorted(self.registry.get_keys(waiters.ACKNOWLEDGEMENT)))
+
+
+if __name__ == '__main__':
+    unittest.main()